@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Register the model signal handlers
+        from . import signals  # noqa: F401
+        # Time serializer .data for the request metrics
+        from .metrics import instrument_serializers
+        instrument_serializers()
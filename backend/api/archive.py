@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import (
+    ArchivedInvoice, ArchivedJobCard, ArchivedPartUsage, ArchivedServiceTask, EarningsEntry, Invoice, JobCard,
+    PartUsage, ServiceTask,
+)
+
+# Live model -> archive model, parents first (the order rows are copied in).
+ARCHIVE_TABLES = (
+    (JobCard, ArchivedJobCard),
+    (ServiceTask, ArchivedServiceTask),
+    (PartUsage, ArchivedPartUsage),
+    (Invoice, ArchivedInvoice),
+)
+
+
+def archivable_jobcards(cutoff):
+    """Done job cards created before `cutoff`: the ones archive_batch() moves."""
+    return JobCard.objects.filter(status='done', created_at__lt=cutoff)
+
+
+def _copy_rows(queryset, archive_model):
+    fields = [field.attname for field in archive_model._meta.concrete_fields if field.attname != 'archived_at']
+    archive_model.objects.bulk_create(
+        [archive_model(**row) for row in queryset.values(*fields)], batch_size=1000
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Moves up to `batch_size` archivable job cards, oldest first, together
+    with their tasks, parts used and invoices, into the archive tables in
+    one transaction. Returns the number of job cards moved (0 when done).
+
+    Earnings entries are re-pointed at the archived invoice. The live rows
+    are removed with plain DELETEs: the per-row delete signals only maintain
+    caches and revisions of rows that no longer exist.
+    """
+    with transaction.atomic():
+        ids = list(
+            archivable_jobcards(cutoff).select_for_update().order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        for live_model, archive_model in ARCHIVE_TABLES:
+            lookup = 'id__in' if live_model is JobCard else 'jobcard_id__in'
+            _copy_rows(live_model.objects.filter(**{lookup: ids}), archive_model)
+
+        EarningsEntry.objects.filter(invoice__jobcard_id__in=ids).update(
+            archived_invoice_id=F('invoice_id'), invoice=None
+        )
+        for live_model, _ in reversed(ARCHIVE_TABLES):
+            lookup = 'id__in' if live_model is JobCard else 'jobcard_id__in'
+            queryset = live_model.objects.filter(**{lookup: ids})
+            queryset._raw_delete(queryset.db)
+    return len(ids)
+
+
+def union_all(querysets):
+    """
+    Combines the same values() / values_list() query over the live and
+    archive tables with UNION ALL. Order and slice the result, not the parts.
+    """
+    first, *rest = querysets
+    return first.union(*rest, all=True) if rest else first
+
+
+def union_ids(querysets):
+    """Ids of the rows matched by live and archive `querysets`, in id order."""
+    return list(union_all([queryset.values_list('id', flat=True).order_by() for queryset in querysets]).order_by('id'))
@@ -0,0 +1,151 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import User
+
+TOKEN_SALT = 'api.session-token'
+
+
+def _token_ttl():
+    return getattr(settings, 'API_TOKEN_TTL', 12 * 60 * 60)
+
+
+def credential_stamp(pin, role):
+    """
+    A keyed hash of the credentials a token was issued against. Changing the
+    user's PIN or role changes it, which revokes every token carrying the
+    old one; being keyed with SECRET_KEY, it gives nothing away about the PIN.
+    """
+    return salted_hmac(TOKEN_SALT, f'{pin}:{role}').hexdigest()[:16]
+
+
+def issue_token(user):
+    """Returns a signed, timestamped token carrying the user's id, role and credential stamp."""
+    payload = {'uid': user.id, 'role': user.role, 'stamp': credential_stamp(user.pin, user.role)}
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    """Returns the token's payload, or raises signing.BadSignature (SignatureExpired when too old)."""
+    return signing.loads(token, salt=TOKEN_SALT, max_age=_token_ttl())
+
+
+class UserProfileCache:
+    """
+    Short-lived, in-process cache of the profile fields the views return
+    (UserResponseSerializer's), keyed by user id, along with the user's
+    credential stamp. Entries expire after API_PROFILE_CACHE_TTL seconds and
+    are dropped when the user is saved.
+    """
+
+    FIELDS = ('id', 'username', 'full_name', 'email', 'phone', 'role')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _ttl(self):
+        return getattr(settings, 'API_PROFILE_CACHE_TTL', 60)
+
+    def _entry(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry
+        row = User.objects.filter(pk=user_id).values(*self.FIELDS, 'pin').first()
+        if row is None:
+            return None
+        return self._store(row)
+
+    def _store(self, row):
+        row = dict(row)
+        stamp = credential_stamp(row.pop('pin'), row['role'])
+        entry = (time.monotonic() + self._ttl(), row, stamp)
+        with self._lock:
+            self._entries[row['id']] = entry
+        return entry
+
+    def get(self, user_id):
+        """Returns the profile dict, or None if the user no longer exists."""
+        entry = self._entry(user_id)
+        return entry[1] if entry is not None else None
+
+    def stamp(self, user_id):
+        """Returns the user's current credential stamp, or None if the user no longer exists."""
+        entry = self._entry(user_id)
+        return entry[2] if entry is not None else None
+
+    def remember(self, user):
+        """Caches a user instance just read anyway (at login), so the next request needs no lookup."""
+        self._store({field: getattr(user, field) for field in (*self.FIELDS, 'pin')})
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+profile_cache = UserProfileCache()
+
+
+class TokenUser:
+    """
+    The identity carried by a verified token. `id` and `role` come from the
+    token itself; the other profile fields are loaded on first use through
+    profile_cache.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, role):
+        self.id = self.pk = user_id
+        self.role = role
+
+    @property
+    def profile(self):
+        return profile_cache.get(self.id)
+
+    def __str__(self):
+        return f"user {self.id} ({self.role})"
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authenticates `Authorization: Bearer <token>` headers issued by LoginView.
+    Besides the signature and expiry, the token's credential stamp must
+    match the user's current one, read through profile_cache: a PIN or role
+    change or a deleted user revokes the token, in this process at once and
+    in other workers within API_PROFILE_CACHE_TTL. Requests without the
+    header stay anonymous.
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            payload = read_token(auth[1].decode())
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        except (signing.BadSignature, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        stamp = profile_cache.stamp(payload['uid'])
+        if stamp is None or not constant_time_compare(stamp, payload.get('stamp', '')):
+            raise exceptions.AuthenticationFailed('Token has been revoked; sign in again.')
+        return TokenUser(payload['uid'], payload['role']), auth[1].decode()
+
+    def authenticate_header(self, request):
+        return self.keyword
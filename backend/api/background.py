@@ -0,0 +1,216 @@
+"""
+A DB-backed queue for work too slow to do inside a request: rendering
+invoice PDFs that are not cached yet, and invoice exports to files.
+
+Views enqueue() a job and answer 202 with its status URL. The
+run_background_worker command claims queued jobs and runs them in a
+process pool, so the request workers stay free for interactive traffic.
+Each job produces one file. Clients poll the status endpoint, then fetch
+the file from the download endpoint once the job is done.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import union_ids
+from .models import ArchivedInvoice, BackgroundJob, Invoice
+from .pdf_cache import pdf_cache
+from .pdf_export import render_combined_pdf, write_invoice_zip
+from .routing import reads_from
+from .streaming_export import stream_csv, stream_ndjson
+from .utils import load_invoice_data
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# Export output -> content type of the result file.
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'zip': 'application/zip',
+    'pdf': 'application/pdf',
+}
+
+# Job kind -> handler(job, **params), returning {'path', 'name', 'content_type'}.
+HANDLERS = {}
+
+
+class JobError(Exception):
+    """An expected failure; the message is shown to the client as the job's error."""
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def job_key(kind, params):
+    encoded = json.dumps([kind, params], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def enqueue(kind, **params):
+    """
+    Queues a `kind` job with JSON-serializable `params` and returns it. When
+    the same work is already queued or running, returns that job instead.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown background job kind: {kind}")
+    key = job_key(kind, params)
+    with reads_from(None):  # A replica may not have seen a job queued moments ago.
+        job = BackgroundJob.objects.filter(key=key, status__in=[QUEUED, RUNNING]).order_by('id').first()
+    if job is None:
+        job = BackgroundJob.objects.create(kind=kind, params=params, key=key)
+    return job
+
+
+def claim_next():
+    """
+    Marks the oldest queued job running and returns its id, or None when
+    the queue is empty. The claim is a conditional UPDATE, so when several
+    workers race for the same job exactly one of them gets it.
+    """
+    while True:
+        job_id = (
+            BackgroundJob.objects.filter(status=QUEUED).order_by('created_at', 'id').values_list('id', flat=True).first()
+        )
+        if job_id is None:
+            return None
+        claimed = BackgroundJob.objects.filter(id=job_id, status=QUEUED).update(
+            status=RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if claimed:
+            return job_id
+
+
+def run_job(job_id):
+    """Runs a claimed job's handler and returns its result."""
+    job = BackgroundJob.objects.get(id=job_id)
+    return HANDLERS[job.kind](job, **job.params)
+
+
+def run_pooled(job_id):
+    """run_job() in a pool process, which closes stale connections around each job like a request does."""
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def mark_done(job_id, result):
+    BackgroundJob.objects.filter(id=job_id).update(
+        status=DONE, result_path=str(result['path']), result_name=result['name'],
+        content_type=result['content_type'], error='', finished_at=timezone.now(),
+    )
+
+
+def mark_failed(job_id, exc):
+    error = str(exc) if isinstance(exc, JobError) else f"{type(exc).__name__}: {exc}"
+    BackgroundJob.objects.filter(id=job_id).update(status=FAILED, error=error, finished_at=timezone.now())
+
+
+def _requeue(jobs, error):
+    """Queues running `jobs` again, failing those that used up BACKGROUND_MAX_ATTEMPTS."""
+    failed = jobs.filter(attempts__gte=settings.BACKGROUND_MAX_ATTEMPTS).update(
+        status=FAILED, error=error, finished_at=timezone.now()
+    )
+    requeued = jobs.update(status=QUEUED, started_at=None)
+    return requeued, failed
+
+
+def release(job_ids, error):
+    """Returns claimed jobs to the queue, e.g. when their worker process died."""
+    return _requeue(BackgroundJob.objects.filter(id__in=job_ids, status=RUNNING), error)
+
+
+def requeue_stale():
+    """
+    Jobs running for longer than BACKGROUND_JOB_TIMEOUT are taken to have
+    died with their worker, and are queued again. Returns (requeued, failed).
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.BACKGROUND_JOB_TIMEOUT)
+    return _requeue(BackgroundJob.objects.filter(status=RUNNING, started_at__lt=cutoff), "Timed out.")
+
+
+def purge_expired():
+    """Deletes jobs finished more than BACKGROUND_RESULT_TTL ago, with their result files."""
+    cutoff = timezone.now() - timedelta(seconds=settings.BACKGROUND_RESULT_TTL)
+    expired = BackgroundJob.objects.filter(status__in=[DONE, FAILED], finished_at__lt=cutoff)
+    results_dir = Path(settings.BACKGROUND_RESULTS_DIR)
+    for path in expired.exclude(result_path='').values_list('result_path', flat=True):
+        path = Path(path)
+        # Invoice PDFs are served from (and evicted by) the PDF cache.
+        if path.parent == results_dir:
+            path.unlink(missing_ok=True)
+    return expired.delete()[0]
+
+
+def encode_filters(filters):
+    """Invoice created_at filters (see InvoiceExportAPIView) as JSON-safe job params."""
+    return {
+        lookup: [value.isoformat() for value in values] if isinstance(values, (list, tuple)) else values.isoformat()
+        for lookup, values in filters.items()
+    }
+
+
+def _decode_filters(filters):
+    return {
+        lookup: [parse_datetime(value) for value in values] if isinstance(values, list) else parse_datetime(values)
+        for lookup, values in filters.items()
+    }
+
+
+def _write_result(path, write):
+    """Calls write(file) on a temporary file, then renames it to `path`, so downloads never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w+b') as tmp:
+            write(tmp)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@handler('invoice_pdf')
+def render_invoice_pdf(job, jobcard_id):
+    data = load_invoice_data(jobcard_id=jobcard_id)
+    if data is None:
+        raise JobError("Invoice not found for this job card.")
+    path, _ = pdf_cache.get_or_render(data)
+    return {'path': path, 'name': f"invoice-{data['id']}.pdf", 'content_type': 'application/pdf'}
+
+
+@handler('invoice_export')
+def export_invoices(job, output, filters, filename):
+    if output not in EXPORT_FORMATS:
+        raise JobError(f"Unknown export output: {output}")
+    filters = _decode_filters(filters)
+    # Live and archived invoices alike (see archive.py)
+    tiers = [Invoice.objects.filter(**filters), ArchivedInvoice.objects.filter(**filters)]
+
+    def write(file):
+        if output in ('csv', 'ndjson'):
+            for chunk in (stream_csv if output == 'csv' else stream_ndjson)(*tiers):
+                file.write(chunk.encode('utf-8'))
+        elif output == 'zip':
+            # Rendered in this process: the job already has a pool worker to itself.
+            write_invoice_zip(union_ids(tiers), file)
+        else:
+            render_combined_pdf(union_ids(tiers), output=file)
+
+    path = Path(settings.BACKGROUND_RESULTS_DIR) / f'job-{job.id}-{filename}.{output}'
+    _write_result(path, write)
+    return {'path': path, 'name': f'{filename}.{output}', 'content_type': EXPORT_FORMATS[output]}
@@ -0,0 +1,79 @@
+import threading
+
+from .models import Part
+from .revisions import PARTS_CATALOG, current
+from .serializers import PartSerializer
+
+
+def _sort_key(row):
+    # Case-insensitive, like the MySQL collation ORDER BY name used.
+    return (row['name'].casefold(), row['id'])
+
+
+class PartsCatalog:
+    """
+    In-process copy of the parts list: PartSerializer rows sorted by name,
+    plus the id -> row map apply() edits them through.
+
+    The copy remembers the parts catalog revision (see revisions.py) it
+    reflects. Readers pass in the current revision, one single-row query,
+    and a mismatch means another worker changed the catalog, so the copy is
+    reloaded. Changes made in this process are written through row by row
+    via apply(), which only accepts them when the copy was current just
+    before the change; otherwise it drops the copy rather than guess.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revision = None
+        self._by_id = {}
+        self._rows = []
+
+    def load(self, revision):
+        rows = PartSerializer(Part.objects.all(), many=True).data
+        by_id = {row['id']: row for row in rows}
+        with self._lock:
+            self._by_id = by_id
+            self._rows = sorted(by_id.values(), key=_sort_key)
+            self._revision = revision
+
+    def rows(self, revision=None):
+        """Returns the serialized parts list as of `revision` (read from the database if omitted)."""
+        if revision is None:
+            revision = current(PARTS_CATALOG)[0]
+        with self._lock:
+            if self._revision == revision:
+                return self._rows
+        self.load(revision)
+        return self._rows
+
+    def apply(self, revision, part_ids):
+        """
+        Writes through the change that moved the catalog to `revision`: the
+        `part_ids` it touched are re-read (ids no longer found are dropped).
+        Call after the bump, as bump_on_commit does: bumps of concurrent
+        changes can land in either order, so rows read inside a change's
+        own transaction may be older than a change already counted in a
+        lower revision. Re-read after the bump, they hold at least every
+        change up to `revision`.
+        """
+        rows = [dict(row) for row in PartSerializer(Part.objects.filter(id__in=part_ids), many=True).data]
+        with self._lock:
+            if self._revision != revision - 1:
+                self._revision = None
+                return
+            by_id = dict(self._by_id)
+            for part_id in part_ids:
+                by_id.pop(part_id, None)
+            for row in rows:
+                by_id[row['id']] = row
+            self._by_id = by_id
+            self._rows = sorted(by_id.values(), key=_sort_key)
+            self._revision = revision
+
+    def invalidate(self):
+        with self._lock:
+            self._revision = None
+
+
+parts_catalog = PartsCatalog()
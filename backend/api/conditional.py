@@ -0,0 +1,27 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def set_validators(response, etag, last_modified=None):
+    """Adds ETag / Last-Modified and makes clients revalidate before reusing their copy."""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Returns a 304 response when the client's If-None-Match / If-Modified-Since
+    says its copy is current, else None. Call it before doing the expensive
+    work, with validators that are cheap to compute.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
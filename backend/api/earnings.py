@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import EarningsEntry, User
+
+CENT = Decimal('0.01')
+
+
+def labor_share():
+    return Decimal(str(getattr(settings, 'MECHANIC_LABOR_SHARE', '0.70')))
+
+
+def record_earning(invoice):
+    """
+    Appends the mechanic's share of an invoice's labour to the earnings
+    ledger. Call inside the transaction that creates the invoice. Returns
+    the entry, or None when the job card has no mechanic.
+    """
+    mechanic_id = invoice.jobcard.assigned_mechanic_id
+    if mechanic_id is None:
+        return None
+    # Lock the mechanic's row so concurrent invoices append one at a time
+    # and each running total builds on the previous one.
+    list(User.objects.select_for_update().filter(pk=mechanic_id).values_list('id', flat=True))
+    previous = (
+        EarningsEntry.objects.filter(mechanic_id=mechanic_id)
+        .order_by('-id').values_list('running_total', flat=True).first()
+    ) or Decimal('0.00')
+    share_rate = labor_share()
+    amount = (invoice.labor_charge * share_rate).quantize(CENT)
+    return EarningsEntry.objects.create(
+        mechanic_id=mechanic_id,
+        invoice=invoice,
+        day=timezone.localdate(invoice.created_at),
+        labor_charge=invoice.labor_charge,
+        share_rate=share_rate,
+        amount=amount,
+        running_total=previous + amount,
+    )
+
+
+def earnings_since(mechanic_id, start_day=None):
+    """
+    A mechanic's earnings from `start_day` (inclusive) until now, or all
+    time when start_day is None. Two indexed single-row lookups, however
+    many invoices the mechanic has.
+    """
+    entries = EarningsEntry.objects.filter(mechanic_id=mechanic_id)
+    total = entries.order_by('-id').values_list('running_total', flat=True).first()
+    if total is None:
+        return Decimal('0.00')
+    if start_day is None:
+        return total
+    before = (
+        entries.filter(day__lt=start_day)
+        .order_by('-day', '-id').values_list('running_total', flat=True).first()
+    )
+    return total - (before or Decimal('0.00'))
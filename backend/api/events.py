@@ -0,0 +1,111 @@
+import asyncio
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+# How many recent events are kept so a reconnecting client can catch up
+# through the Last-Event-ID header.
+REPLAY_BUFFER_SIZE = 200
+
+# Seconds between keep-alive comments on an idle stream.
+HEARTBEAT_INTERVAL = 15
+
+
+class Subscription:
+    """
+    One connected client. Sync subscribers (WSGI) wait on a thread-safe
+    queue; async subscribers (ASGI) get events handed to their event loop.
+    """
+
+    def __init__(self, hub, loop=None):
+        self.hub = hub
+        self.loop = loop
+        self.queue = asyncio.Queue() if loop else queue.Queue()
+
+    def deliver(self, event):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        else:
+            self.queue.put(event)
+
+    def get(self, timeout=None):
+        """Blocks for the next event; returns None on timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout=None):
+        """Awaits the next event; returns None on timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    In-process broadcast hub for live job board events.
+
+    Views publish small change events; every open /api/events/ stream in
+    this process receives them. Events are numbered so a client that
+    reconnects with Last-Event-ID gets whatever it missed from the replay
+    buffer. Each worker process has its own hub, so run the stream behind a
+    single ASGI process (or put a shared broker behind publish()) when
+    scaling out.
+    """
+
+    def __init__(self, replay_size=REPLAY_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, last_event_id=None, loop=None):
+        subscription = Subscription(self, loop=loop)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._recent:
+                    if event['id'] > last_event_id:
+                        subscription.deliver(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = {'id': next(self._ids), 'type': event_type, 'data': data}
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def publish_on_commit(self, event_type, data):
+        """Publishes once the surrounding transaction commits (immediately if none)."""
+        transaction.on_commit(lambda: self.publish(event_type, data))
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_sse(event):
+    """Formats an event as a text/event-stream message."""
+    payload = json.dumps(event['data'], cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+hub = EventHub()
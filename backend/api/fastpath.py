@@ -0,0 +1,117 @@
+"""
+Serialization fast path for the large list endpoints: the job board, my-jobs
+and the invoice export.
+
+Rows are read with values_list() and turned into plain dicts by index, using
+the column lists below, instead of building nested DRF serializers per row.
+The output matches JobCardListSerializer / InvoiceExportSerializer field for
+field (tests compare the two), and FastJSONRenderer encodes it with orjson
+when it is installed.
+"""
+import json
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .archive import union_all
+
+try:
+    import orjson
+except ImportError:  # The fast path still works, just with the stdlib encoder.
+    orjson = None
+
+# JobCardListSerializer, flattened. Paginate values_list(..., named=True)
+# rows: KeysetPagination reads .id and .created_at for the next cursor.
+JOBCARD_LIST_COLUMNS = (
+    'id', 'created_at', 'status',
+    'customer_id', 'customer__name', 'customer__phone', 'customer__email',
+    'vehicle_id', 'vehicle__make', 'vehicle__model', 'vehicle__registration_no', 'vehicle__vehicle_type',
+    'assigned_mechanic__full_name', 'assigned_mechanic__role',
+)
+
+# InvoiceExportSerializer, in its field order.
+INVOICE_EXPORT_COLUMNS = (
+    'id', 'created_at', 'jobcard__customer__name',
+    'parts_total', 'labor_charge', 'tax', 'discount', 'total_amount',
+)
+
+
+def datetime_formatter():
+    """
+    Formats datetimes the way DRF's DateTimeField does: ISO 8601 in the
+    current time zone, with 'Z' for UTC. The zone is looked up once per
+    response rather than per value.
+    """
+    tz = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        text = value.astimezone(tz).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return format_datetime
+
+
+def jobcard_list_rows(rows):
+    """JobCardListSerializer(many=True) output for values_list(*JOBCARD_LIST_COLUMNS) rows."""
+    format_datetime = datetime_formatter()
+    return [
+        {
+            'id': jobcard_id,
+            'customer': {'id': customer_id, 'name': customer_name, 'phone': phone, 'email': email},
+            'vehicle': {
+                'id': vehicle_id, 'make': make, 'model': model,
+                'registration_no': registration_no, 'vehicle_type': vehicle_type,
+            },
+            'status': status,
+            'assigned_mechanic': f'{mechanic_name} ({mechanic_role})' if mechanic_role is not None else None,
+            'created_at': format_datetime(created_at),
+        }
+        for (
+            jobcard_id, created_at, status,
+            customer_id, customer_name, phone, email,
+            vehicle_id, make, model, registration_no, vehicle_type,
+            mechanic_name, mechanic_role,
+        ) in rows
+    ]
+
+
+def invoice_export_rows(*querysets):
+    """
+    InvoiceExportSerializer(many=True) output for invoice querysets (live
+    and archived), in one query, in id order.
+    """
+    format_datetime = datetime_formatter()
+    return [
+        {
+            'id': invoice_id,
+            'created_at': format_datetime(created_at),
+            'customer_name': customer_name,
+            # DRF renders DecimalFields as fixed-point strings.
+            'parts_total': format(parts_total, 'f'),
+            'labor_charge': format(labor_charge, 'f'),
+            'tax': format(tax, 'f'),
+            'discount': format(discount, 'f'),
+            'total_amount': format(total_amount, 'f'),
+        }
+        for (
+            invoice_id, created_at, customer_name, parts_total, labor_charge, tax, discount, total_amount,
+        ) in union_all([queryset.values_list(*INVOICE_EXPORT_COLUMNS) for queryset in querysets]).order_by('id')
+    ]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson. Anything orjson cannot encode natively
+    (Decimal, lazy strings, ...) goes through DRF's encoder, so the output
+    is the same as the stock renderer's.
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None:
+            return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+        return orjson.dumps(data, default=self._encoder.default)
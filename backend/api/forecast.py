@@ -0,0 +1,156 @@
+"""
+Parts demand forecast and reorder suggestions.
+
+The usage history of every part is loaded in one grouped query into a
+parts x days NumPy matrix, and the demand statistics are computed for all
+parts at once: a moving average, an exponentially smoothed daily demand,
+and from it the days of stock left and how much to reorder.
+
+PartUsage rows carry no timestamp of their own, so a part counts as used
+on the day its job card was opened.
+"""
+import math
+import threading
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archive import union_all
+from .models import ArchivedPartUsage, Part, PartUsage
+from .revisions import PARTS_CATALOG, current
+
+try:
+    import numpy as np
+except ImportError:  # The forecast endpoint and command report it as unavailable.
+    np = None
+
+
+def _forecast_settings():
+    return (
+        settings.PARTS_FORECAST_HISTORY_DAYS,
+        settings.PARTS_FORECAST_WINDOW_DAYS,
+        settings.PARTS_FORECAST_SMOOTHING,
+        settings.PARTS_REORDER_LEAD_DAYS,
+        settings.PARTS_REORDER_COVER_DAYS,
+    )
+
+
+def usage_matrix(part_ids, start_day, days):
+    """
+    Quantities used per part (rows, in `part_ids` order, which must be
+    sorted) and day (columns, from `start_day`), over live and archived
+    usage, in one query.
+    """
+    since = timezone.make_aware(datetime.combine(start_day, time.min))
+    tiers = [
+        model.objects.filter(jobcard__created_at__gte=since)
+        .values('part_id', day=TruncDate('jobcard__created_at'))
+        .annotate(quantity=Sum('quantity_used'))
+        .values_list('part_id', 'day', 'quantity')
+        .order_by()
+        for model in (PartUsage, ArchivedPartUsage)
+    ]
+    rows = list(union_all(tiers))
+    usage = np.zeros((len(part_ids), days))
+    if rows:
+        row_parts, row_days, quantities = zip(*rows)
+        day_index = (np.array(row_days, dtype='datetime64[D]') - np.datetime64(start_day, 'D')).astype(np.int64)
+        row_parts = np.array(row_parts, dtype=np.int64)
+        part_index = np.searchsorted(part_ids, row_parts)
+        # Usage of a part missing from part_ids (created after they were
+        # read) would land past the end or on a neighbouring row; drop it.
+        known = part_ids[np.minimum(part_index, len(part_ids) - 1)] == row_parts if len(part_ids) else False
+        # The same part and day can come from both tiers; add.at sums repeats.
+        in_range = known & (day_index >= 0) & (day_index < days)
+        np.add.at(usage, (part_index[in_range], day_index[in_range]), np.array(quantities, dtype=float)[in_range])
+    return usage
+
+
+def smoothing_weights(days, alpha):
+    """
+    Weights whose dot product with a series (oldest first) is its simple
+    exponential smoothing level: l_0 = x_0, l_t = alpha x_t + (1 - alpha) l_(t-1).
+    """
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=float)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights
+
+
+def build_forecast(today):
+    """The forecast payload for every part, most urgent (fewest days of cover) first."""
+    history_days, window_days, alpha, lead_days, cover_days = _forecast_settings()
+    start_day = today - timedelta(days=history_days - 1)
+    parts = list(Part.objects.order_by('id').values_list('id', 'name', 'stock_quantity'))
+    part_ids = np.array([part[0] for part in parts], dtype=np.int64)
+    stock = np.array([part[2] for part in parts], dtype=float)
+
+    usage = usage_matrix(part_ids, start_day, history_days)
+    moving_average = usage[:, -window_days:].mean(axis=1)
+    demand = usage @ smoothing_weights(history_days, alpha)
+    with np.errstate(divide='ignore'):
+        cover = np.where(demand > 0, np.maximum(stock, 0) / demand, np.inf)
+    reorder = cover < lead_days
+    # Enough to last through the supplier lead time and cover_days after it.
+    suggested = np.where(reorder, np.maximum(np.ceil(demand * (lead_days + cover_days)) - stock, 0), 0)
+
+    rows = []
+    for i in np.argsort(cover, kind='stable'):
+        finite = math.isfinite(cover[i])
+        rows.append({
+            'part_id': parts[i][0],
+            'name': parts[i][1],
+            'stock_quantity': parts[i][2],
+            'used_in_history': int(usage[i].sum()),
+            'moving_average': round(float(moving_average[i]), 2),
+            'daily_demand': round(float(demand[i]), 2),
+            'days_of_cover': round(float(cover[i]), 1) if finite else None,
+            'stockout_date': today + timedelta(days=int(cover[i])) if finite else None,
+            'reorder': bool(reorder[i]),
+            'suggested_order_quantity': int(suggested[i]),
+        })
+    return {
+        'as_of': today,
+        'history_days': history_days,
+        'window_days': window_days,
+        'smoothing': alpha,
+        'lead_days': lead_days,
+        'cover_days': cover_days,
+        'parts': rows,
+    }
+
+
+class PartsForecast:
+    """
+    In-process copy of the forecast, keyed by the parts catalog revision
+    (see revisions.py), the day and the forecast settings. Issuing parts
+    and editing stock both bump the revision, so the copy is rebuilt once
+    new usage arrives, and at most once a day otherwise.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._forecast = None
+
+    def get(self, revision=None):
+        if revision is None:
+            revision = current(PARTS_CATALOG)[0]
+        today = timezone.localdate()
+        key = (revision, today, _forecast_settings())
+        with self._lock:
+            if self._key == key:
+                return self._forecast
+        forecast = build_forecast(today)
+        with self._lock:
+            self._key, self._forecast = key, forecast
+        return forecast
+
+    def invalidate(self):
+        with self._lock:
+            self._key = None
+
+
+parts_forecast = PartsForecast()
@@ -0,0 +1,139 @@
+from django.db import connection, transaction
+from django.db.models.functions import Upper
+
+from .models import Customer, JobCard, ServiceTask, User, Vehicle
+from .search import vehicle_index
+from .serializers import JobCardCreateSerializer
+from .workload import workload_cache, workload_cache_enabled
+
+
+def _insert_all(model, objects):
+    """
+    Inserts `objects` and makes sure each one has its primary key set.
+    Uses one multi-row INSERT where the backend returns the new ids
+    (PostgreSQL, SQLite, MariaDB); otherwise, as on MySQL, saves the rows
+    one by one inside the caller's transaction.
+    """
+    if not objects:
+        return objects
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects)
+    for obj in objects:
+        obj.save(force_insert=True)
+    return objects
+
+
+def bulk_create_jobcards(items):
+    """
+    Creates many job cards at once, e.g. for a service camp or a fleet drop-off.
+
+    Each item has the same shape as a JobCardCreateSerializer payload.
+    Customers, vehicles and mechanics referenced by the batch are resolved
+    with one set-based query each; the job cards and their tasks are then
+    inserted in bulk. A bad item (invalid data, an unknown customer, vehicle
+    or mechanic) is reported and skipped without affecting the others.
+
+    Returns (created, errors): created is [{'index', 'id'}], errors is
+    [{'index', 'errors'}], with index pointing into `items`.
+    """
+    errors = []
+    valid = []
+    for index, item in enumerate(items):
+        serializer = JobCardCreateSerializer(data=item)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            # As in JobCardCreateSerializer.create, the ids come from the raw payload.
+            data['customer_id'] = item.get('customer_id')
+            data['vehicle_id'] = item.get('vehicle_id')
+            valid.append((index, data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    # --- Set-based lookups: one query per referenced model ---
+    customers = Customer.objects.in_bulk({data['customer_id'] for _, data in valid if data['customer_id']})
+    vehicles = Vehicle.objects.in_bulk({data['vehicle_id'] for _, data in valid if data['vehicle_id']})
+    mechanic_ids = set(
+        User.objects.filter(
+            id__in={data['assigned_mechanic_id'] for _, data in valid}, role='mechanic'
+        ).values_list('id', flat=True)
+    )
+    new_registrations = {
+        data['vehicle']['registration_no'].upper() for _, data in valid if not data['vehicle_id']
+    }
+    vehicles_by_registration = {
+        vehicle.reg_upper: vehicle
+        for vehicle in Vehicle.objects.annotate(reg_upper=Upper('registration_no'))
+        .filter(reg_upper__in=new_registrations)
+    }
+
+    resolved = []
+    for index, data in valid:
+        problems = {}
+        if data['customer_id'] and data['customer_id'] not in customers:
+            problems['customer_id'] = ["Customer not found."]
+        if data['vehicle_id'] and data['vehicle_id'] not in vehicles:
+            problems['vehicle_id'] = ["Vehicle not found."]
+        if data['assigned_mechanic_id'] not in mechanic_ids:
+            problems['assigned_mechanic_id'] = ["Mechanic not found."]
+        if problems:
+            errors.append({'index': index, 'errors': problems})
+        else:
+            resolved.append((index, data))
+
+    with transaction.atomic():
+        # New customers; identical customer details within one batch become one customer.
+        new_customers = {}
+        for _, data in resolved:
+            if not data['customer_id']:
+                key = tuple(sorted(data['customer'].items()))
+                new_customers.setdefault(key, Customer(**data['customer']))
+        _insert_all(Customer, list(new_customers.values()))
+
+        def customer_for(data):
+            if data['customer_id']:
+                return customers[data['customer_id']]
+            return new_customers[tuple(sorted(data['customer'].items()))]
+
+        # New vehicles, unless the registration number already exists (case-insensitively).
+        new_vehicles = []
+        for _, data in resolved:
+            if data['vehicle_id']:
+                continue
+            registration = data['vehicle']['registration_no'].upper()
+            if registration not in vehicles_by_registration:
+                vehicle = Vehicle(customer=customer_for(data), **data['vehicle'])
+                vehicles_by_registration[registration] = vehicle
+                new_vehicles.append(vehicle)
+        _insert_all(Vehicle, new_vehicles)
+        # bulk_create sends no save signals; re-indexing a vehicle is idempotent either way.
+        transaction.on_commit(lambda: [vehicle_index.vehicle_saved(vehicle) for vehicle in new_vehicles])
+
+        def vehicle_for(data):
+            if data['vehicle_id']:
+                return vehicles[data['vehicle_id']]
+            return vehicles_by_registration[data['vehicle']['registration_no'].upper()]
+
+        jobcards = _insert_all(JobCard, [
+            JobCard(
+                customer=customer_for(data),
+                vehicle=vehicle_for(data),
+                assigned_mechanic_id=data['assigned_mechanic_id'],
+            )
+            for _, data in resolved
+        ])
+        ServiceTask.objects.bulk_create([
+            ServiceTask(jobcard=jobcard, **task_data)
+            for jobcard, (_, data) in zip(jobcards, resolved)
+            for task_data in data['tasks']
+        ])
+
+        if workload_cache_enabled() and connection.features.can_return_rows_from_bulk_insert:
+            # bulk_create sends no save signals, so update the workload cache here.
+            def count_new_jobs():
+                for jobcard in jobcards:
+                    workload_cache.job_changed(None, None, jobcard.assigned_mechanic_id, jobcard.status)
+            transaction.on_commit(count_new_jobs)
+
+    created = [{'index': index, 'id': jobcard.id} for jobcard, (index, _) in zip(jobcards, resolved)]
+    errors.sort(key=lambda error: error['index'])
+    return created, errors
@@ -0,0 +1,72 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .catalog import parts_catalog
+from .events import hub
+from .models import Part, PartUsage
+from .revisions import PARTS_CATALOG, bump_on_commit, touch_jobcard
+from .rollups import record_late_part_usage
+
+
+class IssuePartError(Exception):
+    """Raised when parts cannot be issued; the message is safe to show to the user."""
+
+
+def issue_parts(jobcard, items):
+    """
+    Issues several parts to a job card in one transaction.
+
+    `items` is a list of {'part_id': ..., 'quantity_used': ...} dicts; repeated
+    part ids are merged. Stock is decremented with a conditional UPDATE
+    (`stock_quantity >= qty`), so two requests racing for the last units can
+    never oversell: the loser's UPDATE matches no row and the whole issue is
+    rolled back. Parts are updated in ascending id order so concurrent
+    multi-part issues take row locks in the same order and cannot deadlock.
+
+    Returns the created PartUsage rows. Raises IssuePartError if a part does
+    not exist or lacks stock; nothing is written in that case.
+    """
+    quantities = Counter()
+    for item in items:
+        quantities[item['part_id']] += item['quantity_used']
+    part_ids = sorted(quantities)
+
+    with transaction.atomic():
+        for part_id in part_ids:
+            quantity = quantities[part_id]
+            updated = Part.objects.filter(pk=part_id, stock_quantity__gte=quantity).update(
+                stock_quantity=F('stock_quantity') - quantity
+            )
+            if not updated:
+                part = Part.objects.filter(pk=part_id).values('name', 'stock_quantity').first()
+                if part is None:
+                    raise IssuePartError(f"A part with ID {part_id} does not exist.")
+                raise IssuePartError(
+                    f"Not enough stock for '{part['name']}'. Only {part['stock_quantity']} available."
+                )
+
+        # Prices and stock are read after the updates, inside the same transaction.
+        parts = Part.objects.in_bulk(part_ids)
+        usages = PartUsage.objects.bulk_create([
+            PartUsage(
+                jobcard=jobcard,
+                part=parts[part_id],
+                quantity_used=quantities[part_id],
+                price_at_time_of_use=parts[part_id].unit_price,
+            )
+            for part_id in part_ids
+        ])
+        # Neither update() nor bulk_create() sends signals, so stamp the changes here.
+        touch_jobcard(jobcard.id)
+        record_late_part_usage(jobcard.id, usages)
+        bump_on_commit(PARTS_CATALOG, lambda revision: parts_catalog.apply(revision, part_ids))
+        for part_id in part_ids:
+            hub.publish_on_commit('part.issued', {
+                'jobcard_id': jobcard.id,
+                'part_id': part_id,
+                'quantity_used': quantities[part_id],
+                'stock_quantity': parts[part_id].stock_quantity,
+            })
+    return usages
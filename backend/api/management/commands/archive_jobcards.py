@@ -0,0 +1,56 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.archive import archivable_jobcards, archive_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves done job cards created before the cutoff, with their tasks, parts used and "
+        "invoices, from the live tables into the archive tables, one batch per transaction. "
+        "Reports, exports and invoice PDFs read both tiers; the job board and my-jobs list "
+        "live job cards only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive done job cards created more than this many days ago.",
+        )
+        parser.add_argument('--before', help="Archive done job cards created before this date (YYYY-MM-DD) instead.")
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Only count the job cards that would move.")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            day = parse_date(options['before'])
+            if day is None:
+                raise CommandError("--before must be a date in YYYY-MM-DD form.")
+            cutoff = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        else:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size must be positive.")
+
+        if options['dry_run']:
+            count = archivable_jobcards(cutoff).count()
+            self.stdout.write(f"{count} job card(s) created before {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+
+        started = time.perf_counter()
+        archived = 0
+        while True:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            archived += moved
+            self.stdout.write(f"  {archived} job cards archived")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} job card(s) created before {cutoff:%Y-%m-%d %H:%M} "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,241 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from api import urls as api_urls
+from api.models import BackgroundJob, Invoice, JobCard, Part, ServiceTask, User, Vehicle
+
+# Endpoints that are deliberately not timed, with the reason recorded in the results.
+SKIPPED = {
+    'live-events': "long-lived event stream",
+}
+
+
+class _Rollback(Exception):
+    """Raised inside the timed block to undo a write request."""
+
+
+def _percentile(sorted_values, fraction):
+    index = max(0, min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every endpoint in api/urls.py against the current database (see seed_workshop) "
+        "and records status, query count and p50/p95 latency as JSON. Write requests run in a "
+        "transaction that is rolled back, so the data is unchanged. With --compare, exits with "
+        "an error when an endpoint got slower or issues more queries than in a baseline file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per endpoint first.")
+        parser.add_argument('--only', nargs='*', help="URL names to run (default: all).")
+        parser.add_argument('--output', help="Write the JSON results to this file (default: stdout).")
+        parser.add_argument('--compare', help="Baseline JSON file from an earlier run.")
+        parser.add_argument(
+            '--threshold', type=float, default=1.25,
+            help="With --compare, flag endpoints whose p95 grew by more than this factor."
+        )
+
+    def handle(self, *args, **options):
+        fixtures = self.fixtures()
+        specs = self.specs(fixtures)
+        names = [pattern.name for pattern in api_urls.urlpatterns]
+        unknown = set(options['only'] or []) - set(names)
+        if unknown:
+            raise CommandError(f"Unknown URL name(s): {', '.join(sorted(unknown))}")
+
+        results = {}
+        for name in names:
+            if options['only'] and name not in options['only']:
+                continue
+            if name in SKIPPED:
+                results[name] = {'skipped': SKIPPED[name]}
+            elif name not in specs:
+                # A new endpoint without a spec shows up in the results instead of silently passing.
+                results[name] = {'skipped': "no benchmark spec; add one to benchmark_endpoints.specs()"}
+                self.stderr.write(self.style.WARNING(f"{name}: no benchmark spec"))
+            else:
+                results[name] = self.measure(specs[name], options['iterations'], options['warmup'])
+                self.stderr.write(
+                    f"{name:28} {results[name]['status']} {results[name]['queries']:>4} queries  "
+                    f"p50 {results[name]['p50_ms']:8.2f} ms  p95 {results[name]['p95_ms']:8.2f} ms"
+                )
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'iterations': options['iterations'],
+                'rows': {
+                    model.__name__: model.objects.count()
+                    for model in (JobCard, Invoice, Vehicle, Part, ServiceTask)
+                },
+            },
+            'results': results,
+        }
+        encoded = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(encoded + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(encoded)
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def fixtures(self):
+        """Picks the rows the endpoint specs point at."""
+        mechanic = User.objects.filter(role='mechanic').order_by('id').first()
+        invoiced = JobCard.objects.filter(invoice__isnull=False).order_by('-id').first()
+        open_jobcard = JobCard.objects.filter(invoice__isnull=True).exclude(status='done').order_by('-id').first()
+        part = Part.objects.filter(stock_quantity__gt=10).order_by('id').first()
+        if not all([mechanic, invoiced, open_jobcard, part]):
+            raise CommandError("The database needs mechanics, parts, invoiced and open job cards; run seed_workshop first.")
+        return {
+            'mechanic': mechanic,
+            'invoiced': invoiced,
+            'open': open_jobcard,
+            'part': part,
+            'task': ServiceTask.objects.filter(jobcard=open_jobcard).first(),
+            'vehicle': invoiced.vehicle,
+            'background_job': BackgroundJob.objects.filter(status='done').order_by('-id').first(),
+        }
+
+    def specs(self, f):
+        """URL name -> request to time. Each spec is (method, path, payload)."""
+        jobcard_payload = {
+            'customer_id': f['vehicle'].customer_id, 'vehicle_id': f['vehicle'].id,
+            'customer': {'name': 'x', 'phone': 1}, 'vehicle': {'make': 'x', 'model': 'x', 'registration_no': 'x', 'vehicle_type': 'bike'},
+            'assigned_mechanic_id': f['mechanic'].id, 'tasks': [{'description': 'General service'}],
+        }
+        specs = {
+            'login': ('post', reverse('login'), {'username': f['mechanic'].username, 'pin': f['mechanic'].pin}),
+            'vehicle-find': ('get', reverse('vehicle-find'), {'registration_no': f['vehicle'].registration_no}),
+            'vehicle-search': ('get', reverse('vehicle-search'), {'q': f['vehicle'].registration_no[:4]}),
+            'mechanic-list': ('get', reverse('mechanic-list'), None),
+            'jobcard-create': ('get', reverse('jobcard-create'), None),
+            'jobcard-bulk-create': ('post', reverse('jobcard-bulk-create'), [jobcard_payload] * 10),
+            'jobcard-detail': ('get', reverse('jobcard-detail', args=[f['invoiced'].id]), None),
+            'part-list-create': ('get', reverse('part-list-create'), None),
+            'part-detail': ('get', reverse('part-detail', args=[f['part'].id]), None),
+            'parts-forecast': ('get', reverse('parts-forecast'), None),
+            'jobcard-issue-part': (
+                'post', reverse('jobcard-issue-part', args=[f['open'].id]), {'part_id': f['part'].id, 'quantity_used': 1},
+            ),
+            'jobcard-issue-parts': (
+                'post', reverse('jobcard-issue-parts', args=[f['open'].id]),
+                {'items': [{'part_id': f['part'].id, 'quantity_used': 1}]},
+            ),
+            'jobcard-create-invoice': (
+                'post', reverse('jobcard-create-invoice', args=[f['open'].id]), {'labor_charge': '500.00'},
+            ),
+            'jobcard-invoice-pdf': ('get', reverse('jobcard-invoice-pdf', args=[f['invoiced'].id]), None),
+            'reports-data': ('get', reverse('reports-data'), {'period': 'month'}),
+            'invoice-export-data': ('get', reverse('invoice-export-data'), {'period': 'week'}),
+            'my-jobs': ('get', reverse('my-jobs'), {'mechanic_id': f['mechanic'].id, 'period': 'month'}),
+            'jobcard-update-status': (
+                'patch', reverse('jobcard-update-status', args=[f['open'].id]), {'status': 'qc'},
+            ),
+            'user-profile': ('get', reverse('user-profile', args=[f['mechanic'].id]), None),
+            'change-pin': (
+                'post', reverse('change-pin', args=[f['mechanic'].id]),
+                {'current_pin': f['mechanic'].pin, 'new_pin': 4321, 'new_pin_confirm': 4321},
+            ),
+        }
+        if f['task'] is not None:
+            specs['task-update'] = ('patch', reverse('task-update', args=[f['task'].id]), {'completed': True})
+        if f['background_job'] is not None:
+            specs['background-job-detail'] = ('get', reverse('background-job-detail', args=[f['background_job'].id]), None)
+            specs['background-job-download'] = (
+                'get', reverse('background-job-download', args=[f['background_job'].id]), None,
+            )
+        return specs
+
+    def request(self, client, spec):
+        method, path, payload = spec
+        if method == 'get':
+            return client.get(path, payload or {})
+        return getattr(client, method)(path, json.dumps(payload), content_type='application/json')
+
+    def run_once(self, client, spec):
+        """Sends one request; writes are rolled back so every iteration sees the same data."""
+        if spec[0] == 'get':
+            started = time.perf_counter()
+            response = self.request(client, spec)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            return response, (time.perf_counter() - started) * 1000
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                response = self.request(client, spec)
+                elapsed = (time.perf_counter() - started) * 1000
+                raise _Rollback
+        except _Rollback:
+            pass
+        return response, elapsed
+
+    def measure(self, spec, iterations, warmup):
+        client = Client(raise_request_exception=False)
+        for _ in range(warmup):
+            self.run_once(client, spec)
+        # Counted with an execute wrapper: the request_started signal resets
+        # connection.queries, so CaptureQueriesContext would see nothing.
+        statements = []
+
+        def count(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+        with connection.execute_wrapper(count):
+            response, _ = self.run_once(client, spec)
+        timings = sorted(self.run_once(client, spec)[1] for _ in range(iterations))
+        return {
+            'method': spec[0].upper(),
+            'path': spec[1],
+            'status': response.status_code,
+            'queries': len(statements),
+            'p50_ms': round(_percentile(timings, 0.50), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'min_ms': round(timings[0], 3),
+        }
+
+    def compare(self, results, baseline_path, threshold):
+        baseline = json.loads(Path(baseline_path).read_text())['results']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if 'skipped' in result or not before or 'skipped' in before:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+            if result['p95_ms'] > before['p95_ms'] * threshold:
+                regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if regressions:
+            raise CommandError("Performance regressions against the baseline:\n  " + "\n  ".join(regressions))
+        self.stderr.write(self.style.SUCCESS(f"No regressions against {baseline_path}."))
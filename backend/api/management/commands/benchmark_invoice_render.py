@@ -0,0 +1,101 @@
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import Invoice
+from api.utils import InvoiceRenderer, get_invoice_renderer, invoice_data_from_instance, load_invoice_data
+
+
+def synthetic_invoice(index, parts):
+    lines = [
+        {'name': f'Part {n}', 'quantity_used': 1 + n % 3, 'price_at_time_of_use': Decimal('125.50')}
+        for n in range(parts)
+    ]
+    parts_total = sum(line['quantity_used'] * line['price_at_time_of_use'] for line in lines)
+    labor = Decimal('533.00')
+    tax = (parts_total + labor) * Decimal('0.12')
+    return {
+        'id': index, 'created_at': timezone.make_aware(datetime(2025, 1, 1)), 'jobcard_id': index,
+        'labor_charge': labor, 'parts_total': parts_total, 'tax': tax, 'discount': Decimal('0.00'),
+        'total_amount': parts_total + labor + tax,
+        'jobcard__customer__name': 'Benchmark Customer', 'jobcard__customer__phone': 9800000000,
+        'jobcard__vehicle__make': 'Honda', 'jobcard__vehicle__model': 'Activa',
+        'jobcard__vehicle__registration_no': f'GJ01AB{index:04d}',
+        'parts': lines,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Times invoice PDF rendering per invoice: a renderer rebuilt for every "
+        "invoice (the previous behaviour) against the shared per-process renderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=200, help="Number of invoices to render per run.")
+        parser.add_argument('--parts', type=int, default=4, help="Part lines per synthetic invoice.")
+        parser.add_argument(
+            '--from-db', action='store_true',
+            help="Render real invoices from the database and also compare query counts."
+        )
+
+    def handle(self, *args, **options):
+        if options['from_db']:
+            self.bench_database(options['invoices'])
+        else:
+            invoices = [synthetic_invoice(i, options['parts']) for i in range(1, options['invoices'] + 1)]
+            self.compare(invoices, lambda data: data, lambda data: data)
+
+    def bench_database(self, count):
+        ids = list(Invoice.objects.order_by('-id').values_list('id', flat=True)[:count])
+        if not ids:
+            self.stdout.write(self.style.WARNING("No invoices in the database; run without --from-db."))
+            return
+
+        def load_lazily(pk):
+            # Previous behaviour: the invoice, then customer, vehicle and parts on access.
+            return invoice_data_from_instance(Invoice.objects.get(pk=pk))
+
+        def load_at_once(pk):
+            return load_invoice_data(pk=pk)
+
+        for label, loader in (('before', load_lazily), ('after', load_at_once)):
+            with CaptureQueriesContext(connection) as queries:
+                loader(ids[0])
+            self.stdout.write(f"{label}: {len(queries)} queries to load one invoice")
+        reset_queries()
+        self.compare(ids, load_lazily, load_at_once)
+
+    def compare(self, items, load_before, load_after):
+        def rebuilt(data):
+            return InvoiceRenderer().render(data)
+
+        def shared(data):
+            return get_invoice_renderer().render(data)
+
+        get_invoice_renderer()  # Build the shared renderer outside the timed loop
+        before = self.time_run(items, load_before, rebuilt)
+        after = self.time_run(items, load_after, shared)
+        for label, timings in (('before', before), ('after', after)):
+            timings = sorted(timings)
+            self.stdout.write(
+                f"{label}: mean {statistics.mean(timings):.2f} ms, "
+                f"p50 {timings[len(timings) // 2]:.2f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms per invoice"
+            )
+        speedup = statistics.mean(before) / statistics.mean(after)
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {speedup:.2f}x over {len(items)} invoices"))
+
+    def time_run(self, items, load, render):
+        timings = []
+        for item in items:
+            started = time.perf_counter()
+            render(load(item))
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
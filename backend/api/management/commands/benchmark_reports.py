@@ -0,0 +1,104 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, router
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api.models import DailyRevenueRollup
+from api.periods import PERIOD_DAYS, period_start_day, start_of_day
+from api.reports import abuild_report, build_report, report_buckets
+
+# The dashboard's periods, plus a year to show how long ranges scale.
+RANGE_DAYS = {**PERIOD_DAYS, 'year': 365}
+
+
+def _percentile(sorted_values, fraction):
+    index = max(0, min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the reports payload per range: built with its queries run one after another "
+        "(build_report) and concurrently (abuild_report), each cold (no finished buckets cached) "
+        "and warm (only the open bucket queried), against the current database (see "
+        "seed_workshop). Prints the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Timed runs per range and mode.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed runs per range and mode first.")
+        parser.add_argument('--workers', type=int, default=4, help="REPORTS_QUERY_WORKERS for the concurrent runs.")
+        parser.add_argument('--granularity', default='day', help="Bucket size: hour, day, week or month.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 2:
+            raise CommandError("--workers must be at least 2 for the queries to run concurrently.")
+        if not DailyRevenueRollup.objects.exists():
+            raise CommandError("The rollup tables are empty; run seed_workshop first.")
+
+        granularity = options['granularity']
+        today = timezone.localdate()
+        end = start_of_day(today + timedelta(days=1))
+        results = {}
+        # The pool is only used with persistent connections (see REPORTS_QUERY_WORKERS),
+        # so keep them for this run whatever the settings say.
+        settings_dict = connections[router.db_for_read(DailyRevenueRollup)].settings_dict
+        conn_max_age = settings_dict['CONN_MAX_AGE']
+        settings_dict['CONN_MAX_AGE'] = None
+        try:
+            self.run_ranges(granularity, today, end, results, options)
+        finally:
+            settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+        self.stdout.write(json.dumps({
+            'meta': {
+                'database': connection.vendor, 'workers': options['workers'],
+                'iterations': options['iterations'], 'granularity': granularity,
+            },
+            'results': results,
+        }, indent=2))
+
+    def run_ranges(self, granularity, today, end, results, options):
+        with override_settings(REPORTS_QUERY_WORKERS=options['workers']):
+            modes = {'sequential': build_report, 'concurrent': async_to_sync(abuild_report)}
+            for name, days in RANGE_DAYS.items():
+                start = start_of_day(today - timedelta(days=days) if name == 'year' else period_start_day(name, today))
+                report_buckets.invalidate()
+                if modes['concurrent'](start, end, granularity) != modes['sequential'](start, end, granularity):
+                    raise CommandError(f"{name}: the concurrent report differs from the sequential one.")
+                results[name] = {
+                    f'{mode}_{state}': self.time(build, start, end, granularity, options, cold=state == 'cold')
+                    for mode, build in modes.items()
+                    for state in ('cold', 'warm')
+                }
+                self.stderr.write(f"{name:6} " + "  ".join(
+                    f"{key} p50 {timing['p50_ms']:8.2f} ms" for key, timing in results[name].items()
+                ))
+
+    def time(self, build, start, end, granularity, options, cold):
+        def run():
+            if cold:
+                report_buckets.invalidate()
+            build(start, end, granularity)
+
+        for _ in range(options['warmup']):
+            run()
+        timings = []
+        for _ in range(options['iterations']):
+            if cold:
+                report_buckets.invalidate()
+            started = time.perf_counter()
+            build(start, end, granularity)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'p50_ms': round(_percentile(timings, 0.50), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+        }
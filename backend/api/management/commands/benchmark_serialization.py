@@ -0,0 +1,69 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.fastpath import JOBCARD_LIST_COLUMNS, FastJSONRenderer, invoice_export_rows, jobcard_list_rows
+from api.models import Invoice, JobCard
+from api.serializers import InvoiceExportSerializer, JobCardListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures rows/second for the job list and invoice export payloads, from query to JSON "
+        "bytes: DRF serializers with JSONRenderer against the value-row fast path with "
+        "FastJSONRenderer. Runs against the current database (see seed_workshop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per payload.")
+        parser.add_argument('--iterations', type=int, default=5, help="Timed runs per path; the best is kept.")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        jobcards = JobCard.objects.order_by('-created_at', '-id')[:rows]
+        invoice_ids = list(Invoice.objects.order_by('id').values_list('id', flat=True)[:rows])
+        if jobcards.count() < rows or len(invoice_ids) < rows:
+            raise CommandError(f"Need at least {rows} job cards and invoices; run seed_workshop first.")
+        invoices = Invoice.objects.filter(id__lte=invoice_ids[-1])
+
+        paths = {
+            'jobcard_list': {
+                'serializer': lambda: JSONRenderer().render(JobCardListSerializer(
+                    jobcards.select_related('customer', 'vehicle', 'assigned_mechanic'), many=True,
+                ).data),
+                'fastpath': lambda: FastJSONRenderer().render(
+                    jobcard_list_rows(jobcards.values_list(*JOBCARD_LIST_COLUMNS, named=True))
+                ),
+            },
+            'invoice_export': {
+                'serializer': lambda: JSONRenderer().render(InvoiceExportSerializer(
+                    invoices.select_related('jobcard__customer'), many=True,
+                ).data),
+                'fastpath': lambda: FastJSONRenderer().render(invoice_export_rows(invoices)),
+            },
+        }
+
+        results = {}
+        for payload, builders in paths.items():
+            if json.loads(builders['serializer']()) != json.loads(builders['fastpath']()):
+                raise CommandError(f"{payload}: the fast path output differs from the serializer's.")
+            results[payload] = {}
+            for name, build in builders.items():
+                best = min(self.time(build) for _ in range(options['iterations']))
+                results[payload][name] = {'best_ms': round(best * 1000, 1), 'rows_per_second': round(rows / best)}
+            results[payload]['speedup'] = round(
+                results[payload]['fastpath']['rows_per_second'] / results[payload]['serializer']['rows_per_second'], 2
+            )
+            self.stderr.write(
+                f"{payload:15} serializer {results[payload]['serializer']['rows_per_second']:>9} rows/s  "
+                f"fast path {results[payload]['fastpath']['rows_per_second']:>9} rows/s  "
+                f"x{results[payload]['speedup']}"
+            )
+        self.stdout.write(json.dumps({'rows': rows, 'results': results}, indent=2))
+
+    def time(self, build):
+        started = time.perf_counter()
+        build()
+        return time.perf_counter() - started
@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from api.forecast import np, parts_forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the parts demand forecast (see api/forecast.py): daily demand, days of stock "
+        "left and suggested order quantities, fewest days of cover first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reorder-only', action='store_true', help="Only parts due for reorder.")
+        parser.add_argument('--json', action='store_true', help="Print the forecast as JSON.")
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("Parts forecasting needs NumPy installed.")
+        forecast = parts_forecast.get()
+        rows = [row for row in forecast['parts'] if row['reorder'] or not options['reorder_only']]
+        if options['json']:
+            self.stdout.write(json.dumps({**forecast, 'parts': rows}, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        self.stdout.write(
+            f"Forecast as of {forecast['as_of']} from {forecast['history_days']} days of usage; "
+            f"lead time {forecast['lead_days']} days."
+        )
+        self.stdout.write(f"{'Part':30} {'Stock':>7} {'Per day':>8} {'Cover':>7}  {'Stock-out':10} {'Order':>6}")
+        for row in rows:
+            cover = '-' if row['days_of_cover'] is None else f"{row['days_of_cover']:.1f}"
+            line = (
+                f"{row['name'][:30]:30} {row['stock_quantity']:>7} {row['daily_demand']:>8.2f} {cover:>7}  "
+                f"{str(row['stockout_date'] or '-'):10} {row['suggested_order_quantity'] or '':>6}"
+            )
+            self.stdout.write(self.style.WARNING(line) if row['reorder'] else line)
+        due = sum(row['reorder'] for row in forecast['parts'])
+        self.stdout.write(f"{due} part(s) due for reorder.")
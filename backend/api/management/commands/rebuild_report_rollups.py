@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily revenue, mechanic and part rollups used by the reports dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help="First day to rebuild (YYYY-MM-DD). Defaults to the beginning.")
+        parser.add_argument('--to', dest='end', help="Last day to rebuild (YYYY-MM-DD). Defaults to the latest invoice.")
+
+    def handle(self, *args, **options):
+        start = self._parse_day(options['start'], '--from')
+        end = self._parse_day(options['end'], '--to')
+        if start and end and start > end:
+            raise CommandError("--from must not be after --to.")
+
+        days = rebuild_rollups(start=start, end=end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt report rollups for {days} day(s) with invoices."))
+
+    def _parse_day(self, value, option):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"{option} expects a date in YYYY-MM-DD format.")
+        return day
@@ -0,0 +1,138 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.background import (
+    JobError, claim_next, mark_done, mark_failed, purge_expired, release, requeue_stale, run_job, run_pooled,
+)
+from api.pdf_export import _init_worker
+
+logger = logging.getLogger('api.background')
+
+# Seconds between sweeps for stale jobs and expired results.
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued background jobs (invoice PDFs, file exports; see api/background.py) in a "
+        "process pool until stopped. Run as many of these as needed: each job is claimed by "
+        "exactly one worker. With --once, exits when the queue is empty."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Pool processes (default BACKGROUND_WORKERS); 0 runs jobs in this process.",
+        )
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument(
+            '--poll-interval', type=float, default=None,
+            help="Seconds between queue polls when idle (default BACKGROUND_POLL_INTERVAL).",
+        )
+
+    def handle(self, *args, **options):
+        workers = settings.BACKGROUND_WORKERS if options['workers'] is None else options['workers']
+        if workers < 0:
+            raise CommandError("--workers must be 0 or more.")
+        self.poll_interval = options['poll_interval'] or settings.BACKGROUND_POLL_INTERVAL
+        self.once = options['once']
+        self.housekept_at = None
+        if workers == 0:
+            self.run_inline()
+        else:
+            self.run_pool(workers)
+
+    def housekeeping(self):
+        now = time.monotonic()
+        if self.housekept_at is not None and now - self.housekept_at < HOUSEKEEPING_INTERVAL:
+            return
+        self.housekept_at = now
+        requeued, failed = requeue_stale()
+        purged = purge_expired()
+        if requeued or failed or purged:
+            logger.warning("Stale jobs: %d requeued, %d failed; %d expired jobs purged.", requeued, failed, purged)
+
+    def finished(self, job_id, result=None, exc=None):
+        if exc is None:
+            mark_done(job_id, result)
+            self.stdout.write(f"Job {job_id} done.")
+        else:
+            # Expected failures (JobError) are the job's outcome, not a bug to trace.
+            logger.error("Background job %d failed.", job_id, exc_info=None if isinstance(exc, JobError) else exc)
+            mark_failed(job_id, exc)
+            self.stdout.write(f"Job {job_id} failed: {exc}")
+
+    def run_inline(self):
+        while True:
+            self.housekeeping()
+            job_id = claim_next()
+            if job_id is None:
+                if self.once:
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                result = run_job(job_id)
+            except Exception as exc:
+                self.finished(job_id, exc=exc)
+            else:
+                self.finished(job_id, result)
+
+    def make_pool(self, workers):
+        # Spawned rather than forked, so no child inherits this process's
+        # database connections; each opens its own.
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker,
+        )
+
+    def run_pool(self, workers):
+        pool = self.make_pool(workers)
+        pending = {}
+        try:
+            while True:
+                self.housekeeping()
+                while len(pending) < workers:
+                    job_id = claim_next()
+                    if job_id is None:
+                        break
+                    pending[pool.submit(run_pooled, job_id)] = job_id
+                if not pending:
+                    if self.once:
+                        return
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                lost = []
+                for future in done:
+                    job_id = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        lost.append(job_id)
+                    except Exception as exc:
+                        self.finished(job_id, exc=exc)
+                    else:
+                        self.finished(job_id, result)
+                if lost:
+                    # A pool process died (e.g. killed for memory), taking the pool with it.
+                    lost.extend(pending.values())
+                    pending.clear()
+                    logger.error("A worker process died; returning jobs %s to the queue.", lost)
+                    release(lost, "The worker process died.")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.make_pool(workers)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; returning unfinished jobs to the queue.")
+        finally:
+            if pending:
+                release(list(pending.values()), "The worker stopped.")
+            pool.shutdown(wait=False, cancel_futures=True)
+            connections.close_all()
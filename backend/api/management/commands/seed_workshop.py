@@ -0,0 +1,230 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.earnings import CENT, labor_share
+from api.models import (
+    ArchivedInvoice, ArchivedJobCard, ArchivedPartUsage, ArchivedServiceTask, Customer, DailyMechanicRollup,
+    DailyPartRollup, DailyRevenueRollup, EarningsEntry, Invoice, JobCard, Part, PartUsage, Revision, ServiceTask,
+    User, Vehicle,
+)
+from api.rollups import rebuild_rollups
+
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan',
+    'Ananya', 'Diya', 'Priya', 'Kavya', 'Meera', 'Pooja', 'Neha', 'Riya', 'Sneha', 'Isha',
+    'Rahul', 'Amit', 'Suresh', 'Ramesh', 'Mahesh', 'Kiran', 'Deepak', 'Manoj', 'Nikhil', 'Harsh',
+]
+LAST_NAMES = [
+    'Patel', 'Shah', 'Sharma', 'Verma', 'Mehta', 'Desai', 'Joshi', 'Iyer', 'Nair', 'Reddy',
+    'Gupta', 'Singh', 'Kumar', 'Rao', 'Chauhan', 'Trivedi', 'Pandya', 'Bhatt', 'Kapoor', 'Malhotra',
+]
+STATES = ['GJ', 'MH', 'DL', 'KA', 'RJ', 'MP', 'TN', 'UP']
+MODELS = [
+    ('Honda', 'Activa', 'moped'), ('TVS', 'Jupiter', 'moped'), ('Suzuki', 'Access', 'moped'),
+    ('Hero', 'Splendor', 'bike'), ('Bajaj', 'Pulsar', 'bike'), ('Royal Enfield', 'Classic 350', 'bike'),
+    ('Yamaha', 'FZ', 'bike'), ('Honda', 'Shine', 'bike'), ('TVS', 'Apache', 'bike'), ('Hero', 'Pleasure', 'moped'),
+]
+TASKS = [
+    'General service', 'Oil change', 'Brake adjustment', 'Chain lubrication', 'Clutch cable replacement',
+    'Air filter cleaning', 'Spark plug check', 'Battery check', 'Tyre puncture repair', 'Carburettor tuning',
+]
+PART_KINDS = [
+    'Brake Pad', 'Engine Oil 1L', 'Spark Plug', 'Air Filter', 'Chain Set', 'Clutch Cable', 'Brake Cable',
+    'Battery 12V', 'Headlight Bulb', 'Tyre Tube', 'Mirror', 'Indicator', 'Horn', 'Fuse', 'Gasket',
+]
+PART_BRANDS = ['Bosch', 'Castrol', 'NGK', 'Minda', 'Exide', 'Rolon', 'Lumax', 'Uno', 'Varroc', 'Endurance']
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with a synthetic workshop: customers, vehicles, mechanics, parts and "
+        "job cards with tasks, parts used, invoices and earnings, spread over --days. The same "
+        "--seed always produces the same data. Meant for a throwaway SQLite database, e.g. with "
+        "DJANGO_SETTINGS_MODULE=autoServe.bench_settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=5000)
+        parser.add_argument('--mechanics', type=int, default=25)
+        parser.add_argument('--parts', type=int, default=400)
+        parser.add_argument('--jobcards', type=int, default=200000)
+        parser.add_argument('--days', type=int, default=365, help="Spread job cards over this many past days.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000, help="Job cards written per transaction.")
+        parser.add_argument('--flush', action='store_true', help="Delete existing workshop data first.")
+        parser.add_argument(
+            '--allow-any-database', action='store_true',
+            help="Run against a database other than SQLite. Never point this at production data."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' and not options['allow_any_database']:
+            raise CommandError(
+                f"Refusing to seed a {connection.vendor} database; use a SQLite benchmark database "
+                "(DJANGO_SETTINGS_MODULE=autoServe.bench_settings) or pass --allow-any-database."
+            )
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError("This database does not return ids from bulk inserts, which seeding relies on.")
+        if options['flush']:
+            self.flush()
+        elif JobCard.objects.exists():
+            raise CommandError("The database already has job cards; pass --flush to replace them.")
+
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            customers = self.create_customers(options['customers'])
+            vehicles = self.create_vehicles(customers)
+            mechanics = self.create_mechanics(options['mechanics'])
+            parts = self.create_parts(options['parts'])
+        self.stdout.write(
+            f"Created {len(customers)} customers, {len(vehicles)} vehicles, "
+            f"{len(mechanics)} mechanics and {len(parts)} parts."
+        )
+
+        self.running_totals = {}
+        created = 0
+        total = options['jobcards']
+        for offset in range(0, total, options['batch_size']):
+            count = min(options['batch_size'], total - offset)
+            with transaction.atomic():
+                self.create_jobcards(offset, count, total, options['days'], vehicles, mechanics, parts)
+            created += count
+            self.stdout.write(f"  {created}/{total} job cards")
+
+        days = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {total} job cards and {Invoice.objects.count()} invoices over {days} day(s) "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def flush(self):
+        with transaction.atomic():
+            for model in (
+                EarningsEntry, DailyRevenueRollup, DailyMechanicRollup, DailyPartRollup,
+                ArchivedInvoice, ArchivedPartUsage, ArchivedServiceTask, ArchivedJobCard,
+                Invoice, PartUsage, ServiceTask, JobCard, Vehicle, Customer, Part, Revision,
+            ):
+                model.objects.all().delete()
+            User.objects.filter(username__startswith='bench_').delete()
+
+    def create_customers(self, count):
+        rng = self.rng
+        return Customer.objects.bulk_create([
+            Customer(
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                phone=9000000000 + index * 7919 % 999999999,
+                email=f"customer{index}@example.com" if rng.random() < 0.6 else None,
+            )
+            for index in range(count)
+        ], batch_size=1000)
+
+    def create_vehicles(self, customers):
+        rng = self.rng
+        vehicles = []
+        for index, customer in enumerate(customers):
+            for extra in range(1 if rng.random() < 0.8 else 2):
+                number = index * 2 + extra
+                make, model, vehicle_type = rng.choice(MODELS)
+                letters = chr(65 + number // 10000 % 26) + chr(65 + number // 260000 % 26)
+                vehicles.append(Vehicle(
+                    customer=customer, make=make, model=model, vehicle_type=vehicle_type,
+                    registration_no=f"{STATES[number % len(STATES)]}{number % 40 + 1:02d}{letters}{number % 10000:04d}",
+                ))
+        return Vehicle.objects.bulk_create(vehicles, batch_size=1000)
+
+    def create_mechanics(self, count):
+        users = [
+            User(
+                username=f"bench_mechanic{index}", full_name=f"{FIRST_NAMES[index % len(FIRST_NAMES)]} Mechanic",
+                email=f"bench_mechanic{index}@example.com", phone=9100000000 + index, role='mechanic', pin=1234,
+            )
+            for index in range(count)
+        ]
+        users.append(User(
+            username='bench_admin', full_name='Bench Admin', email='bench_admin@example.com',
+            phone=9199999999, role='admin', pin=1234,
+        ))
+        return [user for user in User.objects.bulk_create(users) if user.role == 'mechanic']
+
+    def create_parts(self, count):
+        rng = self.rng
+        return Part.objects.bulk_create([
+            Part(
+                name=f"{PART_BRANDS[index // len(PART_KINDS) % len(PART_BRANDS)]} {PART_KINDS[index % len(PART_KINDS)]}"
+                     + (f" v{index // (len(PART_KINDS) * len(PART_BRANDS)) + 1}" if index >= len(PART_KINDS) * len(PART_BRANDS) else ''),
+                stock_quantity=rng.randint(20, 500),
+                unit_price=Decimal(rng.randint(50, 5000)).quantize(CENT),
+            )
+            for index in range(count)
+        ])
+
+    def create_jobcards(self, offset, count, total, days, vehicles, mechanics, parts):
+        rng = self.rng
+        span = timedelta(days=days)
+        jobcards = []
+        for index in range(offset, offset + count):
+            # Job cards arrive in time order, oldest first, like real intake.
+            created_at = self.now - span + span * (index + rng.random()) / total
+            age = self.now - created_at
+            if age > timedelta(days=3):
+                status = 'done' if rng.random() < 0.97 else rng.choice(['parts', 'qc'])
+            else:
+                status = rng.choice(['queue', 'service', 'parts', 'qc', 'done'])
+            vehicle = rng.choice(vehicles)
+            jobcards.append(JobCard(
+                customer_id=vehicle.customer_id, vehicle=vehicle, created_at=created_at, updated_at=created_at,
+                status=status, assigned_mechanic=rng.choice(mechanics),
+            ))
+        jobcards = JobCard.objects.bulk_create(jobcards)
+
+        tasks = []
+        usages = []
+        invoices = []
+        for jobcard in jobcards:
+            for description in rng.sample(TASKS, rng.randint(1, 3)):
+                tasks.append(ServiceTask(
+                    jobcard=jobcard, description=description, completed=jobcard.status in ('qc', 'done'),
+                ))
+            lines = []
+            if jobcard.status in ('parts', 'qc', 'done'):
+                for part in rng.sample(parts, rng.randint(0, 3)):
+                    lines.append(PartUsage(
+                        jobcard=jobcard, part=part, quantity_used=rng.randint(1, 2),
+                        price_at_time_of_use=part.unit_price,
+                    ))
+            usages.extend(lines)
+            if jobcard.status == 'done' and rng.random() < 0.9:
+                parts_total = sum((line.quantity_used * line.price_at_time_of_use for line in lines), Decimal('0.00'))
+                labor_charge = Decimal(rng.randrange(200, 1250, 50)).quantize(CENT)
+                tax = ((parts_total + labor_charge) * Decimal('0.12')).quantize(CENT)
+                discount = (labor_charge * Decimal('0.05')).quantize(CENT) if rng.random() < 0.1 else Decimal('0.00')
+                invoices.append(Invoice(
+                    jobcard=jobcard, labor_charge=labor_charge, parts_total=parts_total, tax=tax,
+                    discount=discount, total_amount=parts_total + labor_charge + tax - discount,
+                    created_at=min(jobcard.created_at + timedelta(hours=rng.uniform(2, 48)), self.now),
+                ))
+        ServiceTask.objects.bulk_create(tasks, batch_size=2000)
+        PartUsage.objects.bulk_create(usages, batch_size=2000)
+        invoices = Invoice.objects.bulk_create(invoices, batch_size=2000)
+
+        share_rate = labor_share()
+        entries = []
+        for invoice in sorted(invoices, key=lambda invoice: invoice.created_at):
+            mechanic_id = invoice.jobcard.assigned_mechanic_id
+            amount = (invoice.labor_charge * share_rate).quantize(CENT)
+            self.running_totals[mechanic_id] = self.running_totals.get(mechanic_id, Decimal('0.00')) + amount
+            entries.append(EarningsEntry(
+                mechanic_id=mechanic_id, invoice=invoice, day=timezone.localdate(invoice.created_at),
+                labor_charge=invoice.labor_charge, share_rate=share_rate, amount=amount,
+                running_total=self.running_totals[mechanic_id], created_at=invoice.created_at,
+            ))
+        EarningsEntry.objects.bulk_create(entries, batch_size=2000)
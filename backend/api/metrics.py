@@ -0,0 +1,227 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('api.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in Prometheus terms."""
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+        series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+        series['sum'] += value
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self._series.items()):
+            labels = ','.join(f'{key}="{_escape(value)}"' for key, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip([*self.buckets, '+Inf'], series['counts']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series["sum"]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._values.items()):
+            labels = ','.join(f'{key}="{_escape(value)}"' for key, value in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    Request metrics for this process. Every worker keeps its own registry,
+    so scrape each worker (or run a single ASGI worker) to see all traffic.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        route = ('route', 'method')
+        self.requests = Counter('autoserve_requests_total', "Requests handled.", ('route', 'method', 'status'))
+        self.latency = Histogram(
+            'autoserve_request_duration_seconds', "Time to produce the response.", LATENCY_BUCKETS, route)
+        self.queries = Histogram(
+            'autoserve_db_queries_per_request', "Database queries run per request.", QUERY_BUCKETS, route)
+        self.db_time = Histogram(
+            'autoserve_db_duration_seconds', "Time spent in database queries per request.", LATENCY_BUCKETS, route)
+        self.serializer_time = Histogram(
+            'autoserve_serializer_duration_seconds',
+            "Time spent building serializer .data per request, excluding the queries it ran.",
+            LATENCY_BUCKETS, route)
+        self.response_size = Histogram(
+            'autoserve_response_size_bytes', "Response body size (not recorded for streamed responses).",
+            SIZE_BUCKETS, route)
+
+    def record(self, route, method, status_code, stats, elapsed, size):
+        labels = (route, method)
+        with self._lock:
+            self.requests.inc((route, method, str(status_code)))
+            self.latency.observe(labels, elapsed)
+            self.queries.observe(labels, stats.query_count)
+            self.db_time.observe(labels, stats.db_time)
+            self.serializer_time.observe(labels, max(stats.serializer_time, 0.0))
+            if size is not None:
+                self.response_size.observe(labels, size)
+
+    def exposition(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.queries, self.db_time, self.serializer_time, self.response_size):
+                lines.extend(metric.exposition())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        self.__init__()
+
+
+registry = MetricsRegistry()
+
+
+class RequestStats:
+    """What one request did; filled in by the query wrapper and the serializer hook."""
+
+    def __init__(self, keep_sql):
+        # Queries can run on several threads for one request (see counting_queries).
+        self._lock = threading.Lock()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.keep_sql = keep_sql
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: time every query the request runs.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.query_count += 1
+                self.db_time += elapsed
+                if self.keep_sql:
+                    self.sql.append((elapsed, sql))
+
+
+_current_stats = contextvars.ContextVar('api_request_stats', default=None)
+
+
+@contextmanager
+def counting_queries():
+    """
+    Counts the queries this thread runs, on any database, towards the
+    current request. The middleware wraps the request thread; code that
+    queries on other threads for the request (e.g. the reports pool, see
+    reports.py) wraps those, in a copy of the request's context.
+    """
+    stats = _current_stats.get()
+    with ExitStack() as stack:
+        if stats is not None:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(stats))
+        yield
+
+_serializer_data = BaseSerializer.data
+
+
+def _timed_serializer_data(self):
+    """BaseSerializer.data, timed for the current request (nested calls count once)."""
+    stats = _current_stats.get()
+    if stats is None or stats.serializer_depth:
+        return _serializer_data.fget(self)
+    stats.serializer_depth += 1
+    started = time.perf_counter()
+    db_before = stats.db_time
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        # Lazy queries run while serializing are already counted as DB time.
+        stats.serializer_time += time.perf_counter() - started - (stats.db_time - db_before)
+        stats.serializer_depth -= 1
+
+
+def instrument_serializers():
+    """Times serializer .data for every DRF serializer; called once from ApiConfig.ready()."""
+    if BaseSerializer.data is _serializer_data:
+        BaseSerializer.data = property(_timed_serializer_data)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-route latency, query count and time, serializer time and
+    response size into `registry`, exposed at /metrics. When
+    METRICS_SLOW_REQUEST_MS is set, slower requests are logged to
+    'api.slow_requests' with the SQL they ran, slowest queries first.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_ms = getattr(settings, 'METRICS_SLOW_REQUEST_MS', None)
+        stats = RequestStats(keep_sql=slow_ms is not None)
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with counting_queries():
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.record(route, request.method, response.status_code, stats, elapsed, size)
+
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            statements = '\n'.join(
+                f'  {duration * 1000:8.2f} ms  {sql}' for duration, sql in sorted(stats.sql, reverse=True)
+            )
+            logger.warning(
+                "Slow request: %s %s (%s) took %.0f ms, %d queries in %.0f ms\n%s",
+                request.method, request.get_full_path(), route, elapsed * 1000,
+                stats.query_count, stats.db_time * 1000, statements,
+            )
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_alter_invoice_created_at_alter_jobcard_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobcard',
+            index=models.Index(fields=['created_at', 'id'], name='jobcard_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_jobcard_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_parts_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_labor_charge', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyMechanicRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('jobs_completed', models.PositiveIntegerField(default=0)),
+                ('labor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('mechanic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'mechanic'), name='unique_mechanic_rollup_per_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPartRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity_used', models.PositiveIntegerField(default=0)),
+                ('parts_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.part')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'part'), name='unique_part_rollup_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:38
+
+import django.db.models.functions.text
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_daily_report_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='role',
+            field=models.CharField(choices=[('admin', 'Admin'), ('mechanic', 'Mechanic')], db_index=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='jobcard',
+            index=models.Index(fields=['assigned_mechanic', 'status', 'created_at'], name='jobcard_mech_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(django.db.models.functions.text.Upper('registration_no'), name='vehicle_reg_upper_idx'),
+        ),
+    ]
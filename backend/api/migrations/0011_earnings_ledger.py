@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:48
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_ledger(apps, schema_editor):
+    """Writes one ledger entry per existing invoice, oldest first, with running totals."""
+    Invoice = apps.get_model('api', 'Invoice')
+    EarningsEntry = apps.get_model('api', 'EarningsEntry')
+    share_rate = Decimal(str(getattr(settings, 'MECHANIC_LABOR_SHARE', '0.70')))
+    totals = {}
+    entries = []
+    invoices = (
+        Invoice.objects.filter(jobcard__assigned_mechanic__isnull=False)
+        .order_by('created_at', 'id')
+        .values('id', 'created_at', 'labor_charge', 'jobcard__assigned_mechanic_id')
+    )
+    for invoice in invoices.iterator():
+        mechanic_id = invoice['jobcard__assigned_mechanic_id']
+        amount = (invoice['labor_charge'] * share_rate).quantize(Decimal('0.01'))
+        totals[mechanic_id] = totals.get(mechanic_id, Decimal('0.00')) + amount
+        entries.append(EarningsEntry(
+            mechanic_id=mechanic_id,
+            invoice_id=invoice['id'],
+            day=timezone.localdate(invoice['created_at']),
+            labor_charge=invoice['labor_charge'],
+            share_rate=share_rate,
+            amount=amount,
+            running_total=totals[mechanic_id],
+            created_at=invoice['created_at'],
+        ))
+    EarningsEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_jobcard_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningsEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('labor_charge', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('share_rate', models.DecimalField(decimal_places=3, max_digits=4)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('running_total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('invoice', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings_entry', to='api.invoice')),
+                ('mechanic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earnings_entries', to='api.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mechanic', 'day', 'id'], name='earnings_mech_day_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
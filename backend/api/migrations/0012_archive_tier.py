@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_earnings_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedInvoice',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('labor_charge', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('parts_total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='earningsentry',
+            name='archived_invoice',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings_entry', to='api.archivedinvoice'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedJobCard',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('queue', 'In Queue'), ('service', 'Under Service'), ('parts', 'Awaiting Spare Parts'), ('qc', 'Quality Check'), ('done', 'Completed')], max_length=20)),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('assigned_mechanic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_jobs', to='api.user')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_jobcards', to='api.customer')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_jobcards', to='api.vehicle')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedinvoice',
+            name='jobcard',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice', to='api.archivedjobcard'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPartUsage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity_used', models.PositiveIntegerField(default=1)),
+                ('price_at_time_of_use', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('jobcard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts_used', to='api.archivedjobcard')),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_usages', to='api.part')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedServiceTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('description', models.CharField(max_length=255)),
+                ('completed', models.BooleanField(default=False)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('jobcard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='api.archivedjobcard')),
+            ],
+        ),
+    ]
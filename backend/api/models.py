@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 # ---------------- User Model ----------------
@@ -12,7 +13,7 @@ class User(models.Model):
     full_name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     phone = models.BigIntegerField()
-    role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES, db_index=True)
     pin = models.IntegerField()
     def __str__(self):
         return f"{self.full_name} ({self.role})"
@@ -35,6 +36,12 @@ class Vehicle(models.Model):
     registration_no = models.CharField(max_length=20, unique=True)
     vehicle_type = models.CharField(max_length=50, choices=[('moped', 'Moped'), ('bike', 'Bike')])
 
+    class Meta:
+        indexes = [
+            # Case-insensitive registration lookups filter on UPPER(registration_no).
+            models.Index(Upper('registration_no'), name='vehicle_reg_upper_idx'),
+        ]
+
     def __str__(self):
         return f"{self.registration_no} - {self.make} {self.model}"
 
@@ -60,6 +67,29 @@ class JobCard(models.Model):
         limit_choices_to={'role': 'mechanic'},
         related_name='assigned_jobs'
     )
+    # Bumped whenever the card, its tasks, parts used or invoice change
+    # (see revisions.touch_jobcard); the detail endpoint's ETag is built from it.
+    revision = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    # Written only by touch_jobcard's atomic increment: saving an instance
+    # loaded before a concurrent bump must not write the stale values back.
+    VERSION_FIELDS = ('revision', 'updated_at')
+
+    class Meta:
+        indexes = [
+            # Serves the job board's keyset pagination on (created_at, id).
+            models.Index(fields=['created_at', 'id'], name='jobcard_created_id_idx'),
+            # My-jobs lists and mechanic workload counts.
+            models.Index(fields=['assigned_mechanic', 'status', 'created_at'], name='jobcard_mech_status_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name not in self.VERSION_FIELDS]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"JobCard {self.id} - {self.vehicle.registration_no}"
@@ -95,7 +125,8 @@ class Invoice(models.Model):
     tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    created_at = models.DateTimeField(default=timezone.now)
+    # Indexed for the date-range scans in reports and exports.
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         return f"Invoice for {self.jobcard}"
@@ -110,4 +141,179 @@ class PartUsage(models.Model):
     price_at_time_of_use = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.quantity_used} x {self.part.name} for JobCard {self.jobcard.id}"
\ No newline at end of file
+        return f"{self.quantity_used} x {self.part.name} for JobCard {self.jobcard.id}"
+
+# ---------------- Reporting Rollups ----------------
+# Per-day totals maintained as invoices are created and invoiced job cards
+# change (see rollups.py), so the reports dashboard reads a handful of rows
+# instead of scanning invoices.
+class DailyRevenueRollup(models.Model):
+    day = models.DateField(unique=True)
+    invoice_count = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_parts_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_labor_charge = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Revenue rollup for {self.day}"
+
+
+class DailyMechanicRollup(models.Model):
+    day = models.DateField()
+    mechanic = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_rollups')
+    jobs_completed = models.PositiveIntegerField(default=0)
+    labor_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'mechanic'], name='unique_mechanic_rollup_per_day'),
+        ]
+
+    def __str__(self):
+        return f"Mechanic rollup for {self.day} ({self.mechanic_id})"
+
+
+class DailyPartRollup(models.Model):
+    day = models.DateField()
+    part = models.ForeignKey(Part, on_delete=models.CASCADE, related_name='daily_rollups')
+    quantity_used = models.PositiveIntegerField(default=0)
+    parts_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'part'], name='unique_part_rollup_per_day'),
+        ]
+
+    def __str__(self):
+        return f"Part rollup for {self.day} ({self.part_id})"
+
+
+# ---------------- Mechanic Earnings Ledger ----------------
+# Append-only: one entry per invoice, written in the invoice's transaction
+# (see earnings.py). running_total is the mechanic's cumulative earnings up
+# to and including the entry, so any period's earnings are the difference
+# of two running totals.
+class EarningsEntry(models.Model):
+    mechanic = models.ForeignKey(User, on_delete=models.CASCADE, related_name='earnings_entries')
+    invoice = models.OneToOneField(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='earnings_entry')
+    # Set instead of `invoice` once the invoice has moved to the archive tier.
+    archived_invoice = models.OneToOneField(
+        'ArchivedInvoice', on_delete=models.SET_NULL, null=True, blank=True, related_name='earnings_entry'
+    )
+    day = models.DateField()
+    labor_charge = models.DecimalField(max_digits=10, decimal_places=2)
+    share_rate = models.DecimalField(max_digits=4, decimal_places=3)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    running_total = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['mechanic', 'day', 'id'], name='earnings_mech_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} for {self.mechanic_id} on {self.day}"
+
+
+# ---------------- Archive Tier ----------------
+# Done job cards past the archive cutoff are moved here, with their tasks,
+# parts used and invoice, by the archive_jobcards command (see archive.py),
+# keeping the live tables small. Rows keep their original ids, and the
+# related names match the live models, so the same lookups work on both.
+class ArchivedJobCard(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='archived_jobcards')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='archived_jobcards')
+    created_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=JobCard.STATUS_CHOICES)
+    assigned_mechanic = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_jobs'
+    )
+    revision = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Archived JobCard {self.id}"
+
+
+class ArchivedServiceTask(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    jobcard = models.ForeignKey(ArchivedJobCard, on_delete=models.CASCADE, related_name='tasks')
+    description = models.CharField(max_length=255)
+    completed = models.BooleanField(default=False)
+    notes = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.description}"
+
+
+class ArchivedPartUsage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    jobcard = models.ForeignKey(ArchivedJobCard, on_delete=models.CASCADE, related_name='parts_used')
+    part = models.ForeignKey(Part, on_delete=models.PROTECT, related_name='archived_usages')
+    quantity_used = models.PositiveIntegerField(default=1)
+    price_at_time_of_use = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity_used} x part {self.part_id} for archived JobCard {self.jobcard_id}"
+
+
+class ArchivedInvoice(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    jobcard = models.OneToOneField(ArchivedJobCard, on_delete=models.CASCADE, related_name='invoice')
+    labor_charge = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    parts_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    created_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Archived invoice for JobCard {self.jobcard_id}"
+
+
+# ---------------- Revision Counters ----------------
+# Named version stamps for collections without a natural "last changed" row,
+# e.g. the parts catalog; see revisions.py.
+class Revision(models.Model):
+    key = models.CharField(max_length=50, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key} r{self.value}"
+
+
+# ---------------- Background Jobs ----------------
+# Work too slow for a request (uncached invoice PDFs, file exports), queued
+# by the views and run by `manage.py run_background_worker`; see background.py.
+class BackgroundJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    # Hash of kind and params: a request for work already queued or running joins that job.
+    key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result_path = models.CharField(max_length=500, blank=True)
+    result_name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='bgjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
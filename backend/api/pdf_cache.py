@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+
+from .utils import get_invoice_renderer
+
+# Bump when the PDF layout changes so previously cached files are not reused.
+RENDERER_VERSION = 1
+
+
+def invoice_fingerprint(data):
+    """SHA-256 over everything that ends up on the printed invoice (see load_invoice_data)."""
+    inputs = {'version': RENDERER_VERSION, **data}
+    encoded = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class InvoicePDFCache:
+    """
+    Disk-backed cache of rendered invoice PDFs.
+
+    Files are named invoice-<id>-<fingerprint>.pdf, so a changed invoice (or
+    a new renderer version) simply misses and the stale file is replaced.
+    File mtimes double as LRU timestamps: hits touch the file.
+
+    Each process keeps an LRU index of the files (name -> size) and their
+    running total, read from the directory once and then updated as it
+    reads and writes, so a miss costs no directory scan. Only when the total
+    passes max_bytes is the directory rescanned, picking up other workers'
+    files, and the least recently used files removed down to EVICT_TO of
+    the budget, so rescans happen once per slice of the budget written.
+    """
+
+    EVICT_TO = 0.9
+
+    def __init__(self, directory=None, max_bytes=None):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = None  # file name -> size, least recently used first
+        self._indexed = None  # the directory _entries describes
+        self._versions = {}  # invoice id -> its cached file name
+        self._total = 0
+
+    @property
+    def directory(self):
+        return Path(self._directory or settings.INVOICE_PDF_CACHE_DIR)
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes or settings.INVOICE_PDF_CACHE_MAX_BYTES
+
+    def path_for(self, invoice_id, fingerprint):
+        return self.directory / f'invoice-{invoice_id}-{fingerprint[:32]}.pdf'
+
+    def lookup(self, data):
+        """Returns (path, fingerprint) for an invoice's cached PDF, or None on a miss."""
+        fingerprint = invoice_fingerprint(data)
+        path = self.path_for(data['id'], fingerprint)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if self._indexed == path.parent and path.name in self._entries:
+                self._entries.move_to_end(path.name)
+        return path, fingerprint
+
+    def get_or_render(self, data):
+        """
+        Returns (path, fingerprint) for an invoice's PDF, rendering it on a miss.
+        `data` is the invoice render data from load_invoice_data().
+        """
+        cached = self.lookup(data)
+        if cached is not None:
+            return cached
+
+        fingerprint = invoice_fingerprint(data)
+        path = self.path_for(data['id'], fingerprint)
+
+        pdf_bytes = get_invoice_renderer().render(data)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial PDF.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(pdf_bytes)
+        os.replace(tmp_path, path)
+        self._added(data['id'], path, len(pdf_bytes))
+        return path, fingerprint
+
+    def _scan(self):
+        """Rebuilds the LRU index from the directory, oldest mtime first. Call with the lock held."""
+        found = []
+        for path in self.directory.glob('invoice-*.pdf'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path.name, stat.st_size))
+        found.sort()
+        self._indexed = self.directory
+        self._entries = OrderedDict((name, size) for _, name, size in found)
+        self._versions = {name.split('-')[1]: name for name in self._entries}
+        self._total = sum(self._entries.values())
+
+    def _forget(self, name):
+        self._total -= self._entries.pop(name, 0)
+
+    def _added(self, invoice_id, path, size):
+        """Records a newly written file, replacing the invoice's previous render, and evicts if over budget."""
+        with self._lock:
+            if self._indexed != path.parent:
+                self._scan()
+            previous = self._versions.get(str(invoice_id))
+            if previous is not None and previous != path.name:
+                (self.directory / previous).unlink(missing_ok=True)
+                self._forget(previous)
+            self._forget(path.name)
+            self._entries[path.name] = size
+            self._versions[str(invoice_id)] = path.name
+            self._total += size
+            if self._total > self.max_bytes:
+                self._evict(int(self.max_bytes * self.EVICT_TO))
+
+    def _evict(self, target):
+        # Rescan first: other workers' writes and reads are only on disk.
+        self._scan()
+        while self._total > target and self._entries:
+            name, size = self._entries.popitem(last=False)
+            (self.directory / name).unlink(missing_ok=True)
+            self._total -= size
+            if self._versions.get(name.split('-')[1]) == name:
+                del self._versions[name.split('-')[1]]
+
+    def evict(self):
+        """Deletes least recently used files until the cache fits in max_bytes."""
+        with self._lock:
+            self._evict(self.max_bytes)
+
+    def clear(self):
+        with self._lock:
+            for path in self.directory.glob('invoice-*.pdf'):
+                path.unlink(missing_ok=True)
+            self._indexed = self._entries = None
+
+
+pdf_cache = InvoicePDFCache()
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+# This module is imported by the worker processes, so it must not import
+# models (or api.utils, which does) at module level: under the "spawn" start
+# method the workers import it before Django is set up.
+
+
+def _init_worker():
+    """Sets up Django in a freshly spawned worker (no-op for forked workers)."""
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autoServe.settings')
+        django.setup()
+
+
+def _render_batch(invoices):
+    """Worker task: renders each invoice's data and returns [(invoice_id, pdf_bytes)]."""
+    from .utils import get_invoice_renderer
+    renderer = get_invoice_renderer()
+    return [(data['id'], renderer.render(data)) for data in invoices]
+
+
+class _StreamBuffer:
+    """Write-only file object that a generator drains after each write."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def render_pool():
+    """
+    The process pool invoice exports render in, created on first use and
+    shared by all requests. Its workers are spawned, as the background
+    worker's are: forking a threaded server would copy locks its other
+    threads hold.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=settings.INVOICE_EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _render_pool
+
+
+def _discard_render_pool(pool):
+    """Drops a broken pool (a worker died) so the next export starts a new one."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_invoice_zip(invoice_ids, batch_size=None):
+    """
+    Yields a ZIP archive holding one invoice-<id>.pdf per invoice, rendered
+    in the shared render pool.
+
+    The data for each batch is loaded here (workers never touch the
+    database) and at most two batches per worker are in flight, so memory
+    stays bounded however long the period is. Each PDF is written to the
+    archive and yielded as soon as its batch finishes, so completion order,
+    not invoice order, decides the order inside the ZIP.
+    """
+    from .utils import load_invoices_by_id
+
+    batch_size = batch_size or settings.INVOICE_EXPORT_BATCH_SIZE
+    batches = _chunked(list(invoice_ids), batch_size)
+
+    buffer = _StreamBuffer()
+    # PDFs are already compressed, so they are stored rather than deflated.
+    archive = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED)
+    pool = render_pool()
+    pending = set()
+
+    def submit_next():
+        batch = next(batches, None)
+        if batch is not None:
+            pending.add(pool.submit(_render_batch, load_invoices_by_id(batch)))
+
+    try:
+        for _ in range(settings.INVOICE_EXPORT_WORKERS * 2):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                for invoice_id, pdf_bytes in future.result():
+                    archive.writestr(f'invoice-{invoice_id}.pdf', pdf_bytes)
+                    yield buffer.drain()
+                submit_next()
+        archive.close()
+        yield buffer.drain()
+    except BrokenProcessPool:
+        _discard_render_pool(pool)
+        raise
+    finally:
+        # Also reached when the client disconnects mid-download; the pool is shared.
+        for future in pending:
+            future.cancel()
+
+
+def write_invoice_zip(invoice_ids, output, batch_size=None):
+    """
+    Writes the same ZIP as stream_invoice_zip() to the file object `output`,
+    rendering in this process. For background jobs, which already run in a
+    worker pool of their own.
+    """
+    from .utils import get_invoice_renderer, load_invoices_by_id
+
+    batch_size = batch_size or settings.INVOICE_EXPORT_BATCH_SIZE
+    renderer = get_invoice_renderer()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for batch in _chunked(list(invoice_ids), batch_size):
+            for data in load_invoices_by_id(batch):
+                archive.writestr(f"invoice-{data['id']}.pdf", renderer.render(data))
+
+
+def render_combined_pdf(invoice_ids, batch_size=None, output=None):
+    """
+    Renders all invoices into one multi-page PDF and returns it as an open
+    file, positioned at the start. Without `output` that is a temporary
+    file, which lives in memory while small and spills to disk once large.
+    The whole document is laid out at once, so this runs in background jobs
+    only, never in a request.
+    """
+    from .utils import get_invoice_renderer, load_invoices_by_id
+
+    batch_size = batch_size or settings.INVOICE_EXPORT_BATCH_SIZE
+    invoices = []
+    for batch in _chunked(list(invoice_ids), batch_size):
+        invoices.extend(load_invoices_by_id(batch))
+
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    get_invoice_renderer().render_many(invoices, output)
+    output.seek(0)
+    return output
@@ -0,0 +1,73 @@
+"""
+Date ranges requested through query parameters, shared by the reports,
+invoice export and my-jobs endpoints: either a named rolling period
+(?period=today|week|month) or an explicit ?from= / ?to= range.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+# Length of the 'today' / 'week' / 'month' windows, in days before the end day.
+PERIOD_DAYS = {'today': 0, 'week': 7, 'month': 30}
+
+
+def start_of_day(day):
+    """Local midnight at the start of `day`, as an aware datetime."""
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def period_start_day(period, end_day):
+    """First day of the named period's window ending on end_day."""
+    return end_day - timedelta(days=PERIOD_DAYS[period])
+
+
+def parse_date_param(params, name, end_of_day=False):
+    """
+    Parses an ISO date or datetime query parameter.
+    Returns None if absent; raises ValidationError if malformed.
+    A plain date with end_of_day=True becomes the start of the following day,
+    so it can be used as an exclusive upper bound.
+    """
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        day = parse_date(raw)
+        value = None if day else parse_datetime(raw)
+    except ValueError:
+        day = value = None
+    if value is not None:
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+    if day is None:
+        raise ValidationError({name: 'Expected an ISO date (YYYY-MM-DD) or datetime.'})
+    if end_of_day:
+        day += timedelta(days=1)
+    return start_of_day(day)
+
+
+def requested_range(params, default_period='month'):
+    """
+    The range a request asks for, as (start, end, label): 'from' / 'to'
+    (ISO dates or datetimes; a plain 'to' date includes that whole day)
+    when either is given, else the whole days of the named 'period' up to
+    now. start and end are aware datetimes, end exclusive; a 'from' / 'to'
+    bound that was not given is None. An unknown period falls back to
+    default_period.
+    label names the range, e.g. for download file names.
+    """
+    if 'from' in params or 'to' in params:
+        start = parse_date_param(params, 'from')
+        end = parse_date_param(params, 'to', end_of_day=True)
+        if start is not None and end is not None and start >= end:
+            raise ValidationError({'to': "Must be after 'from'."})
+        return start, end, f"{params.get('from', 'start')}-to-{params.get('to', 'now')}"
+    period = params.get('period', default_period)
+    if period not in PERIOD_DAYS:
+        period = default_period
+    now = timezone.now()
+    today = timezone.localdate(now)
+    return start_of_day(period_start_day(period, today)), now, f"{period}-{today:%Y%m%d}"
@@ -0,0 +1,404 @@
+"""
+The reports dashboard payload over any range, with the revenue series in
+hour, day, week or month buckets.
+
+The range is split into buckets of the requested granularity. Day, week
+and month buckets are summed from the daily rollups (see rollups.py), hour
+buckets from the invoices themselves. A bucket that ended in the past
+cannot change any more, so after the first request that needs it, its
+totals are kept in an in-process store (report_buckets) and never queried
+again; requests only query the buckets still open, normally the current
+one. rebuild_rollups() rewrites history and bumps the REPORTS_HISTORY
+revision, which the store is keyed by.
+"""
+import asyncio
+import contextvars
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .metrics import counting_queries
+from .models import (
+    ArchivedInvoice, ArchivedPartUsage, DailyMechanicRollup, DailyPartRollup, DailyRevenueRollup, Invoice, Part,
+    PartUsage, User,
+)
+from .periods import start_of_day
+from .revisions import REPORTS_HISTORY, current
+from .rollups import _merge_tiers
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+# Shortest length of a bucket, for bounding the number of buckets in a range.
+MIN_BUCKET_LENGTH = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+    'month': timedelta(days=28),
+}
+
+AMOUNT_FIELDS = ('total_revenue', 'total_parts_cost', 'total_labor_charge')
+
+
+# ---------------- Buckets ----------------
+
+def bucket_start(moment, granularity):
+    """Start of the bucket holding the aware datetime `moment`, in local time."""
+    local = timezone.localtime(moment)
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.date()
+    if granularity == 'week':
+        day -= timedelta(days=day.weekday())  # ISO weeks, starting on Monday
+    elif granularity == 'month':
+        day = day.replace(day=1)
+    return start_of_day(day)
+
+
+def next_bucket(start, granularity):
+    """Start of the bucket after the one starting at `start`."""
+    if granularity == 'hour':
+        # Stepped in UTC, so a DST change neither skips nor repeats an hour.
+        return timezone.localtime(start.astimezone(dt_timezone.utc) + timedelta(hours=1))
+    day = timezone.localtime(start).date()
+    if granularity == 'day':
+        day += timedelta(days=1)
+    elif granularity == 'week':
+        day += timedelta(days=7)
+    else:
+        day = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start_of_day(day)
+
+
+def align_range(start, end, granularity):
+    """Widens [start, end) to whole buckets."""
+    aligned_end = bucket_start(end, granularity)
+    if aligned_end < end:
+        aligned_end = next_bucket(aligned_end, granularity)
+    return bucket_start(start, granularity), aligned_end
+
+
+def too_many_buckets(start, end, granularity):
+    return (end - start) / MIN_BUCKET_LENGTH[granularity] > settings.REPORTS_MAX_BUCKETS
+
+
+def bucket_label(start, granularity):
+    """What a bucket is keyed and shown by: its start time for hours, its first day otherwise."""
+    return start if granularity == 'hour' else timezone.localtime(start).date()
+
+
+# ---------------- Bucket queries ----------------
+# Each takes (granularity, start, end) and returns grouped rows with a
+# 'bucket' label; BUCKET_QUERIES lists them in the order _fill_buckets takes them.
+
+def _rollups(model, granularity, start, end):
+    bucket = {'day': F('day'), 'week': TruncWeek('day'), 'month': TruncMonth('day')}[granularity]
+    return model.objects.filter(
+        day__gte=timezone.localdate(start), day__lt=timezone.localdate(end)
+    ).annotate(bucket=bucket)
+
+
+def _invoices(start, end):
+    # Live and archived invoices alike (see archive.py)
+    return [
+        model.objects.filter(created_at__gte=start, created_at__lt=end).annotate(bucket=TruncHour('created_at'))
+        for model in (Invoice, ArchivedInvoice)
+    ]
+
+
+def _revenue_buckets(granularity, start, end):
+    if granularity == 'hour':
+        return list(_merge_tiers([
+            invoices.values('bucket').annotate(
+                invoice_count=Count('id'),
+                total_revenue=Sum('total_amount'),
+                total_parts_cost=Sum('parts_total'),
+                total_labor_charge=Sum('labor_charge'),
+            ).order_by()
+            for invoices in _invoices(start, end)
+        ], ['bucket']))
+    return list(
+        _rollups(DailyRevenueRollup, granularity, start, end).values('bucket').annotate(
+            invoice_count=Sum('invoice_count'),
+            total_revenue=Sum('total_revenue'),
+            total_parts_cost=Sum('total_parts_cost'),
+            total_labor_charge=Sum('total_labor_charge'),
+        ).order_by()
+    )
+
+
+def _mechanic_buckets(granularity, start, end):
+    if granularity == 'hour':
+        return list(_merge_tiers([
+            # Invoiced cards in 'done', like DailyMechanicRollup.jobs_completed
+            invoices.values('bucket', mechanic_id=F('jobcard__assigned_mechanic_id'))
+            .annotate(count=Count('id', filter=Q(jobcard__status='done'))).order_by()
+            for invoices in _invoices(start, end)
+        ], ['bucket', 'mechanic_id']))
+    return list(
+        _rollups(DailyMechanicRollup, granularity, start, end)
+        .values('bucket', 'mechanic_id').annotate(count=Sum('jobs_completed')).order_by()
+    )
+
+
+def _part_buckets(granularity, start, end):
+    if granularity == 'hour':
+        return list(_merge_tiers([
+            model.objects.filter(jobcard__invoice__created_at__gte=start, jobcard__invoice__created_at__lt=end)
+            .annotate(bucket=TruncHour('jobcard__invoice__created_at'))
+            .values('bucket', 'part_id').annotate(quantity=Sum('quantity_used')).order_by()
+            for model in (PartUsage, ArchivedPartUsage)
+        ], ['bucket', 'part_id']))
+    return list(
+        _rollups(DailyPartRollup, granularity, start, end)
+        .values('bucket', 'part_id').annotate(quantity=Sum('quantity_used')).order_by()
+    )
+
+
+BUCKET_QUERIES = (_revenue_buckets, _mechanic_buckets, _part_buckets)
+
+
+def _fill_buckets(labels, revenue_rows, mechanic_rows, part_rows):
+    """label -> bucket totals, with per-mechanic and per-part counts keyed by id."""
+    zero = Decimal('0.0')
+    buckets = {
+        label: {'invoice_count': 0, **{field: zero for field in AMOUNT_FIELDS}, 'mechanics': {}, 'parts': {}}
+        for label in labels
+    }
+    for row in revenue_rows:
+        buckets[row['bucket']].update(
+            invoice_count=row['invoice_count'], **{field: row[field] for field in AMOUNT_FIELDS}
+        )
+    for row in mechanic_rows:
+        buckets[row['bucket']]['mechanics'][row['mechanic_id']] = row['count']
+    for row in part_rows:
+        buckets[row['bucket']]['parts'][row['part_id']] = row['quantity']
+    return buckets
+
+
+# ---------------- Finished-bucket store ----------------
+
+class ReportBuckets:
+    """
+    In-process store of finished buckets' totals, keyed by (granularity,
+    label), as of one REPORTS_HISTORY revision: a newer revision empties
+    it. Holds up to REPORTS_BUCKET_CACHE_SIZE buckets, least recently used
+    dropped first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._buckets = OrderedDict()
+
+    def get_many(self, generation, keys):
+        with self._lock:
+            if generation != self._generation:
+                return {}
+            found = {}
+            for key in keys:
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    self._buckets.move_to_end(key)
+                    found[key] = bucket
+            return found
+
+    def set_many(self, generation, buckets):
+        with self._lock:
+            if self._generation is not None and generation < self._generation:
+                return  # Computed from data older than what the store holds.
+            if generation != self._generation:
+                self._buckets.clear()
+                self._generation = generation
+            for key, bucket in buckets.items():
+                self._buckets[key] = bucket
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > settings.REPORTS_BUCKET_CACHE_SIZE:
+                self._buckets.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation = None
+            self._buckets.clear()
+
+
+report_buckets = ReportBuckets()
+
+
+def _history_generation():
+    return current(REPORTS_HISTORY)[0]
+
+
+def _plan(start, end, granularity, generation):
+    """
+    Splits [start, end) into buckets. Returns their keys, the finished
+    buckets found in the store, and the span still to query: from the first
+    bucket not in the store to the end, or None when all of them are.
+    """
+    starts = [start]
+    while (following := next_bucket(starts[-1], granularity)) < end:
+        starts.append(following)
+    keys = [(granularity, bucket_label(bucket, granularity)) for bucket in starts]
+    finished_before = timezone.now() - timedelta(seconds=settings.REPORTS_CLOSED_BUCKET_DELAY)
+    ends = starts[1:] + [end]
+    finished = [key for key, bucket_end in zip(keys, ends) if bucket_end <= finished_before]
+    stored = report_buckets.get_many(generation, finished)
+    missing = next((i for i, key in enumerate(keys) if key not in stored), None)
+    span = None if missing is None else (starts[missing], end)
+    return keys, set(finished), stored, span
+
+
+def _collect(keys, finished, stored, span, results, generation):
+    """Bucket totals in key order: stored ones plus those queried, storing the newly finished ones."""
+    buckets = dict(stored)
+    if span is not None:
+        queried = keys[next(i for i, key in enumerate(keys) if key not in stored):]
+        filled = _fill_buckets([label for _, label in queried], *results)
+        buckets.update({key: filled[key[1]] for key in queried})
+        # Buckets that finished before the queries started can no longer change.
+        report_buckets.set_many(generation, {key: buckets[key] for key in queried if key in finished})
+    return [buckets[key] for key in keys]
+
+
+def _names(buckets):
+    """Mechanic and part names for the ids counted in `buckets`, in two queries."""
+    mechanic_ids = set().union(*(bucket['mechanics'] for bucket in buckets)) - {None}
+    part_ids = set().union(*(bucket['parts'] for bucket in buckets))
+    mechanics = dict(User.objects.filter(id__in=mechanic_ids).values_list('id', 'full_name')) if mechanic_ids else {}
+    parts = dict(Part.objects.filter(id__in=part_ids).values_list('id', 'name')) if part_ids else {}
+    return mechanics, parts
+
+
+def _ranked(counts):
+    return sorted(
+        ((name, count) for name, count in counts.items() if count),
+        key=lambda item: (-item[1], item[0] or ''),
+    )
+
+
+def _assemble_report(keys, buckets, mechanic_names, part_names):
+    zero = Decimal('0.0')
+    invoice_count = sum(bucket['invoice_count'] for bucket in buckets)
+    totals = {field: sum((bucket[field] for bucket in buckets), zero) for field in AMOUNT_FIELDS}
+    mechanics, parts = Counter(), Counter()
+    for bucket in buckets:
+        for mechanic_id, count in bucket['mechanics'].items():
+            mechanics[mechanic_names.get(mechanic_id)] += count
+        for part_id, quantity in bucket['parts'].items():
+            parts[part_names.get(part_id)] += quantity
+
+    financial_kpis = {
+        **totals,
+        'avg_invoice_value': (totals['total_revenue'] / invoice_count).quantize(Decimal('0.01')) if invoice_count else zero,
+        'total_profit': totals['total_revenue'] - totals['total_parts_cost'],
+    }
+    return {
+        'financial_kpis': financial_kpis,
+        'revenue_over_time': [
+            {'date': label, 'revenue': bucket['total_revenue']}
+            for (_, label), bucket in zip(keys, buckets) if bucket['invoice_count']
+        ],
+        'operational_kpis': {
+            'jobs_completed': sum(mechanics.values()),
+            'mechanic_performance': [
+                {'assigned_mechanic__full_name': name, 'count': count} for name, count in _ranked(mechanics)
+            ],
+        },
+        'most_used_parts': [
+            {'part__name': name, 'total_quantity': quantity} for name, quantity in _ranked(parts)[:5]
+        ],
+    }
+
+
+def build_report(start, end, granularity='day'):
+    """
+    Builds the ReportsAPIView payload for [start, end) (aware datetimes,
+    widened to whole buckets), its revenue series in `granularity` buckets.
+    """
+    start, end = align_range(start, end, granularity)
+    generation = _history_generation()
+    keys, finished, stored, span = _plan(start, end, granularity, generation)
+    results = [query(granularity, *span) for query in BUCKET_QUERIES] if span is not None else None
+    buckets = _collect(keys, finished, stored, span, results, generation)
+    return _assemble_report(keys, buckets, *_names(buckets))
+
+
+# ---------------- Concurrent queries ----------------
+
+_query_pool = None
+_query_pool_lock = threading.Lock()
+
+
+def _report_pool():
+    global _query_pool
+    with _query_pool_lock:
+        if _query_pool is None:
+            _query_pool = ThreadPoolExecutor(
+                max_workers=settings.REPORTS_QUERY_WORKERS, thread_name_prefix='report-query'
+            )
+        return _query_pool
+
+
+def _runs_sequentially():
+    """
+    Whether abuild_report should run its queries one after another on the
+    caller's connection: with fewer than two REPORTS_QUERY_WORKERS, without
+    persistent connections (CONN_MAX_AGE 0, where each pooled query would
+    connect anew), or inside a transaction, whose writes other connections
+    cannot see.
+    """
+    # The connection the rollups are read from (see routing.py).
+    alias = router.db_for_read(DailyRevenueRollup)
+    return (
+        settings.REPORTS_QUERY_WORKERS < 2
+        or connections[alias].settings_dict['CONN_MAX_AGE'] == 0
+        or transaction.get_connection(alias).in_atomic_block
+    )
+
+
+def _run_report_query(query, *args):
+    # Pool threads keep their own connections; expire them the way a request
+    # would, so CONN_MAX_AGE and broken connections are honoured. Their
+    # queries count towards the request's metrics like its own.
+    close_old_connections()
+    try:
+        with counting_queries():
+            return query(*args)
+    finally:
+        close_old_connections()
+
+
+async def abuild_report(start, end, granularity='day'):
+    """
+    build_report with its queries run on a pool of REPORTS_QUERY_WORKERS
+    threads, each on its own persistent connection, and the bucket queries
+    run concurrently, so they take about as long as the slowest one rather
+    than the sum of all. Otherwise (see _runs_sequentially) the queries run
+    one after another on the caller's connection.
+    """
+    # Connections are per thread: look at the one the caller's sync code uses.
+    if await sync_to_async(_runs_sequentially)():
+        return await sync_to_async(build_report)(start, end, granularity)
+    start, end = align_range(start, end, granularity)
+    loop = asyncio.get_running_loop()
+    pool = _report_pool()
+
+    def run(query, *args):
+        # In a copy of the caller's context, so it reads from the same database.
+        return loop.run_in_executor(pool, contextvars.copy_context().run, _run_report_query, query, *args)
+
+    generation = await run(_history_generation)
+    keys, finished, stored, span = _plan(start, end, granularity, generation)
+    results = None
+    if span is not None:
+        results = await asyncio.gather(*(run(query, granularity, *span) for query in BUCKET_QUERIES))
+    buckets = _collect(keys, finished, stored, span, results, generation)
+    return _assemble_report(keys, buckets, *await run(_names, buckets))
@@ -0,0 +1,57 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import JobCard, Revision
+
+PARTS_CATALOG = 'parts'
+REPORTS = 'reports'
+# Bumped only when past report totals are rewritten (rebuild_rollups), not per invoice.
+REPORTS_HISTORY = 'reports-history'
+
+
+def bump(key):
+    """
+    Increments the named revision counter, creating it if needed, and
+    returns its new value. Inside a transaction the bumped row stays locked
+    until commit, so request paths use bump_on_commit instead.
+    """
+    changes = {'value': F('value') + 1, 'updated_at': timezone.now()}
+    if not Revision.objects.filter(key=key).update(**changes):
+        try:
+            with transaction.atomic():
+                Revision.objects.create(key=key, value=1)
+                return 1
+        except IntegrityError:
+            # Another request created the row first; bump it instead.
+            Revision.objects.filter(key=key).update(**changes)
+    return Revision.objects.filter(key=key).values_list('value', flat=True).get()
+
+
+def bump_on_commit(key, then=None):
+    """
+    Bumps the named revision once the current transaction commits (at once
+    outside one), then calls then(new_value). Bumping inside the transaction
+    would hold the counter's single row locked until commit and serialize
+    every writer behind it, e.g. all part issues across all parts; after
+    commit it is a short autocommit UPDATE. A revalidation in between can
+    still get a 304 for the old revision, until the bump lands.
+    The change is committed by then, so a failed bump is logged rather than
+    failing the request; the next bump moves the revision past it.
+    """
+    def run():
+        revision = bump(key)
+        if then is not None:
+            then(revision)
+    transaction.on_commit(run, robust=True)
+
+
+def current(key):
+    """Returns (value, updated_at) for the named counter; (0, None) if it was never bumped."""
+    row = Revision.objects.filter(key=key).values_list('value', 'updated_at').first()
+    return row or (0, None)
+
+
+def touch_jobcard(jobcard_id):
+    """Marks a job card as changed by bumping its revision and updated_at."""
+    JobCard.objects.filter(pk=jobcard_id).update(revision=F('revision') + 1, updated_at=timezone.now())
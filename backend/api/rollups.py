@@ -0,0 +1,241 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ArchivedInvoice, ArchivedPartUsage, DailyMechanicRollup, DailyPartRollup, DailyRevenueRollup, Invoice, PartUsage,
+)
+from .revisions import REPORTS, REPORTS_HISTORY, bump, bump_on_commit
+
+LINE_TOTAL = ExpressionWrapper(
+    F('quantity_used') * F('price_at_time_of_use'),
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+def _increment(model, lookup, **amounts):
+    """
+    Adds `amounts` to the rollup row identified by `lookup`, creating it if
+    needed. The UPDATE uses F() expressions so concurrent invoices on the
+    same day never lose an increment.
+    """
+    increments = {field: F(field) + value for field, value in amounts.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **amounts)
+    except IntegrityError:
+        # Another request created the row first; add to it instead.
+        model.objects.filter(**lookup).update(**increments)
+
+
+def record_invoice(invoice):
+    """
+    Folds a newly created invoice into the daily rollups. Its job card
+    counts as completed if it is in 'done' (see record_jobcard_change).
+    Call inside the transaction that creates the invoice so the rollups and
+    the invoice commit (or roll back) together; the reports revision is
+    bumped after commit (see bump_on_commit).
+    """
+    day = timezone.localdate(invoice.created_at)
+    jobcard = invoice.jobcard
+
+    _increment(
+        DailyRevenueRollup, {'day': day},
+        invoice_count=1,
+        total_revenue=invoice.total_amount,
+        total_parts_cost=invoice.parts_total,
+        total_labor_charge=invoice.labor_charge,
+    )
+    _increment(
+        DailyMechanicRollup, {'day': day, 'mechanic_id': jobcard.assigned_mechanic_id},
+        jobs_completed=int(jobcard.status == 'done'),
+        labor_total=invoice.labor_charge,
+    )
+    part_totals = (
+        PartUsage.objects.filter(jobcard=jobcard)
+        .values('part_id')
+        .annotate(quantity=Sum('quantity_used'), revenue=Sum(LINE_TOTAL))
+    )
+    for row in part_totals:
+        _increment(
+            DailyPartRollup, {'day': day, 'part_id': row['part_id']},
+            quantity_used=row['quantity'],
+            parts_revenue=row['revenue'],
+        )
+    bump_on_commit(REPORTS)
+
+
+def _invoice_of(jobcard_id):
+    return Invoice.objects.filter(jobcard_id=jobcard_id).values('created_at', 'labor_charge').first()
+
+
+def _history_changed():
+    # A day that may already be a finished report bucket changed: besides the
+    # reports revision, drop the cached buckets (see reports.py).
+    bump_on_commit(REPORTS)
+    bump_on_commit(REPORTS_HISTORY)
+
+
+def record_jobcard_change(jobcard_id, old_status, old_mechanic_id, new_status, new_mechanic_id):
+    """
+    Moves an invoiced job card within its invoice day's mechanic rollups
+    when it enters or leaves 'done' or is reassigned: jobs_completed counts
+    invoiced cards in 'done', labor_total follows the card's mechanic, as
+    rebuild_rollups computes them. Cards without an invoice are not in the
+    rollups yet (see record_invoice).
+    """
+    was_done, is_done = old_status == 'done', new_status == 'done'
+    if was_done == is_done and old_mechanic_id == new_mechanic_id:
+        return
+    invoice = _invoice_of(jobcard_id)
+    if invoice is None:
+        return
+    day = timezone.localdate(invoice['created_at'])
+    DailyMechanicRollup.objects.filter(day=day, mechanic_id=old_mechanic_id).update(
+        jobs_completed=F('jobs_completed') - int(was_done),
+        labor_total=F('labor_total') - invoice['labor_charge'],
+    )
+    _increment(
+        DailyMechanicRollup, {'day': day, 'mechanic_id': new_mechanic_id},
+        jobs_completed=int(is_done),
+        labor_total=invoice['labor_charge'],
+    )
+    _history_changed()
+
+
+def record_late_part_usage(jobcard_id, usages):
+    """
+    Adds parts issued to a job card that is already invoiced to its invoice
+    day's part rollups, as rebuild_rollups counts every part used on an
+    invoiced card. Parts issued before the invoice are counted by
+    record_invoice.
+    """
+    invoice = _invoice_of(jobcard_id)
+    if invoice is None:
+        return
+    day = timezone.localdate(invoice['created_at'])
+    for usage in usages:
+        _increment(
+            DailyPartRollup, {'day': day, 'part_id': usage.part_id},
+            quantity_used=usage.quantity_used,
+            parts_revenue=usage.quantity_used * usage.price_at_time_of_use,
+        )
+    _history_changed()
+
+
+def _merge_tiers(row_sets, key_fields):
+    """Adds up grouped rows from the live and archive tables that share a key."""
+    merged = {}
+    for rows in row_sets:
+        for row in rows:
+            key = tuple(row[field] for field in key_fields)
+            if key in merged:
+                for field, value in row.items():
+                    if field not in key_fields:
+                        merged[key][field] += value
+            else:
+                merged[key] = row
+    return merged.values()
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Recomputes the rollups from the invoice history, live and archived,
+    with three GROUP BY queries per tier. `start` and `end` are inclusive
+    dates; omit them to rebuild everything. Returns the number of revenue
+    days written.
+    """
+    invoice_tiers = [Invoice.objects.all(), ArchivedInvoice.objects.all()]
+    usage_tiers = [
+        PartUsage.objects.filter(jobcard__invoice__isnull=False),
+        ArchivedPartUsage.objects.filter(jobcard__invoice__isnull=False),
+    ]
+    revenue_rows = DailyRevenueRollup.objects.all()
+    mechanic_rows = DailyMechanicRollup.objects.all()
+    part_rows = DailyPartRollup.objects.all()
+
+    if start is not None:
+        invoice_tiers = [invoices.filter(created_at__date__gte=start) for invoices in invoice_tiers]
+        usage_tiers = [usages.filter(jobcard__invoice__created_at__date__gte=start) for usages in usage_tiers]
+        revenue_rows, mechanic_rows, part_rows = (
+            qs.filter(day__gte=start) for qs in (revenue_rows, mechanic_rows, part_rows)
+        )
+    if end is not None:
+        invoice_tiers = [invoices.filter(created_at__date__lte=end) for invoices in invoice_tiers]
+        usage_tiers = [usages.filter(jobcard__invoice__created_at__date__lte=end) for usages in usage_tiers]
+        revenue_rows, mechanic_rows, part_rows = (
+            qs.filter(day__lte=end) for qs in (revenue_rows, mechanic_rows, part_rows)
+        )
+
+    zero = Decimal('0.00')
+    with transaction.atomic():
+        revenue_rows.delete()
+        mechanic_rows.delete()
+        part_rows.delete()
+        bump(REPORTS)
+        # Past days' totals change, so cached report buckets must go (see reports.py).
+        bump(REPORTS_HISTORY)
+
+        daily = _merge_tiers([
+            invoices.annotate(day=TruncDate('created_at'))
+            .values('day')
+            .annotate(
+                invoice_count=Count('id'),
+                total_revenue=Sum('total_amount', default=zero),
+                total_parts_cost=Sum('parts_total', default=zero),
+                total_labor_charge=Sum('labor_charge', default=zero),
+            )
+            .order_by()
+            for invoices in invoice_tiers
+        ], ['day'])
+        created = DailyRevenueRollup.objects.bulk_create(
+            [DailyRevenueRollup(**row) for row in daily], batch_size=500
+        )
+
+        per_mechanic = _merge_tiers([
+            invoices.annotate(day=TruncDate('created_at'))
+            .values('day', 'jobcard__assigned_mechanic_id')
+            .annotate(
+                jobs_completed=Count('id', filter=Q(jobcard__status='done')),
+                labor_total=Sum('labor_charge', default=zero),
+            )
+            .order_by()
+            for invoices in invoice_tiers
+        ], ['day', 'jobcard__assigned_mechanic_id'])
+        DailyMechanicRollup.objects.bulk_create(
+            [
+                DailyMechanicRollup(
+                    day=row['day'],
+                    mechanic_id=row['jobcard__assigned_mechanic_id'],
+                    jobs_completed=row['jobs_completed'],
+                    labor_total=row['labor_total'],
+                )
+                for row in per_mechanic
+            ],
+            batch_size=500,
+        )
+
+        per_part = _merge_tiers([
+            usages.annotate(day=TruncDate('jobcard__invoice__created_at'))
+            .values('day', 'part_id')
+            .annotate(quantity=Sum('quantity_used'), revenue=Sum(LINE_TOTAL))
+            .order_by()
+            for usages in usage_tiers
+        ], ['day', 'part_id'])
+        DailyPartRollup.objects.bulk_create(
+            [
+                DailyPartRollup(
+                    day=row['day'], part_id=row['part_id'],
+                    quantity_used=row['quantity'], parts_revenue=row['revenue'],
+                )
+                for row in per_part
+            ],
+            batch_size=500,
+        )
+    return len(created)
+
@@ -0,0 +1,177 @@
+import asyncio
+import contextvars
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+# Alias the current view's reads go to; None means the default (primary).
+_read_alias = contextvars.ContextVar('api_read_alias', default=None)
+
+UNSAFE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the alias chosen for the current view (see
+    ReplicaReadsMixin) and everything else to the default database. Only
+    the reporting and export views opt in; writes always go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        aliases = {'default', settings.REPLICA_DATABASE}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaMonitor:
+    """
+    Replication lag of the replica in seconds, re-measured at most every
+    REPLICA_LAG_CHECK_INTERVAL seconds per process. None means the replica
+    is unusable: unreachable, not replicating, or replication stopped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._lag = None
+
+    def lag(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+                try:
+                    self._lag = self.measure_lag(settings.REPLICA_DATABASE)
+                except DatabaseError:
+                    connections[settings.REPLICA_DATABASE].close()
+                    self._lag = None
+                self._checked_at = now
+            return self._lag
+
+    def measure_lag(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'mysql':
+            # No replication status to read (e.g. the SQLite stand-in in tests).
+            return 0
+        with connection.cursor() as cursor:
+            for statement in ('SHOW REPLICA STATUS', 'SHOW SLAVE STATUS'):  # MySQL 8.0.22+ / older
+                try:
+                    cursor.execute(statement)
+                except DatabaseError:
+                    continue
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                status = dict(zip([column[0] for column in cursor.description], row))
+                return status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        return None
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = None
+
+
+replica_monitor = ReplicaMonitor()
+
+
+def _client_key(request):
+    # The API is token-authenticated cross-origin (no cookies), so a client is
+    # its Authorization header, or its address when it sends none.
+    identity = request.headers.get('Authorization') or f"addr:{request.META.get('REMOTE_ADDR')}"
+    return 'replica-pin:' + hashlib.sha256(identity.encode()).hexdigest()
+
+
+def pin_to_primary(request):
+    """Sends this client's reads to the primary for REPLICA_PIN_SECONDS (read-your-writes)."""
+    cache.set(_client_key(request), True, settings.REPLICA_PIN_SECONDS)
+
+
+def replica_for(request):
+    """
+    The replica alias to read from for this request, or None for the
+    primary: no replica configured, the client wrote recently, or the
+    replica is unusable or more than REPLICA_MAX_LAG seconds behind.
+    """
+    alias = settings.REPLICA_DATABASE
+    if not alias or cache.get(_client_key(request)):
+        return None
+    lag = replica_monitor.lag()
+    if lag is None or lag > settings.REPLICA_MAX_LAG:
+        return None
+    return alias
+
+
+@contextmanager
+def reads_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def keep_routing(iterable):
+    """
+    Wraps a streamed response body so the queries it runs lazily, after the
+    view has returned, read from the same database as the view did.
+    """
+    return _routed(iterable, _read_alias.get())
+
+
+def _routed(iterable, alias):
+    iterator = iter(iterable)
+    while True:
+        with reads_from(alias):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class ReplicaReadsMixin:
+    """
+    For read-only views that can tolerate REPLICA_MAX_LAG seconds of
+    staleness: their reads go to the replica when replica_for() allows it.
+    Works with sync (DRF) and async views.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if getattr(self, 'view_is_async', False):
+            return self._async_dispatch(request, *args, **kwargs)
+        with reads_from(replica_for(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+    async def _async_dispatch(self, request, *args, **kwargs):
+        alias = await sync_to_async(replica_for)(request)
+        with reads_from(alias):
+            response = super().dispatch(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+
+
+class ReplicaPinningMiddleware:
+    """Pins a client to the primary after a successful write, when a replica is configured."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.REPLICA_DATABASE and request.method in UNSAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
@@ -0,0 +1,329 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import Vehicle
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+
+# Queries this long also find registrations and name words one typo away.
+NEAR_MATCH_MIN_LENGTH = 4
+
+
+def normalize_registration(value):
+    """'gj-01 ab 1234' -> 'GJ01AB1234', so spacing and dashes never matter."""
+    return _NON_ALNUM.sub('', str(value).upper())
+
+
+def _deletions(term):
+    """`term` with each one of its characters left out."""
+    return {term[:index] + term[index + 1:] for index in range(len(term))}
+
+
+def _vehicle_keys(entry):
+    """
+    Yields every key a vehicle can be found by. The first letter says what
+    the key holds: R/P for the whole registration/phone number, r/p for a
+    suffix of it, N for a word of the owner's name, D/M for a registration
+    or name word with one character left out (see VehicleSearchIndex._near).
+    """
+    registration = normalize_registration(entry['registration_no'])
+    phone = str(entry['customer']['phone'])
+    yield f'R{registration}'
+    yield f'P{phone}'
+    # Every suffix is indexed too, so "1234" or "AB12" find GJ01AB1234 and
+    # the last digits of a phone number find its owner, all by prefix lookup.
+    for start in range(1, len(registration)):
+        yield f'r{registration[start:]}'
+    for start in range(1, len(phone)):
+        yield f'p{phone[start:]}'
+    words = set(entry['customer']['name'].lower().split())
+    for word in words:
+        yield f'N{word}'
+    if len(registration) >= NEAR_MATCH_MIN_LENGTH:
+        for variant in _deletions(registration):
+            yield f'D{variant}'
+    for word in words:
+        if len(word) >= NEAR_MATCH_MIN_LENGTH:
+            for variant in _deletions(word):
+                yield f'M{variant}'
+
+
+def _edit_distance(a, b, limit):
+    """
+    Edit distance between a and b counting a swap of adjacent characters as
+    one edit, or limit + 1 once it is certain to exceed `limit`. Only the
+    diagonal band of width 2 * limit + 1 is computed, so a check costs
+    O(len * limit) rather than O(len ** 2).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    too_far = limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [i if i <= limit else too_far] + [too_far] * len(b)
+        for j in range(low, high + 1):
+            cost = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char != b[j - 1]),
+            )
+            if before is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost
+        if min(current[max(0, low - 1):high + 1]) > limit:
+            return too_far
+        before, previous = previous, current
+    return min(previous[len(b)], too_far)
+
+
+class VehicleSearchIndex:
+    """
+    In-process type-ahead index over vehicle registration numbers and their
+    owners' phone numbers and names.
+
+    Keys live in one sorted list of (key, vehicle id) tuples, so a prefix
+    query is a binary search followed by a scan that stops once enough
+    vehicles are found. The list is loaded from the database once and then
+    kept current by the Vehicle and Customer signal handlers. Because every worker process has its own copy,
+    the index is fully reloaded after VEHICLE_SEARCH_INDEX_TTL seconds so
+    changes made by other workers (or by queryset.update(), which fires no
+    signals) are picked up within that window.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held by the one request reloading the index (see _refresh).
+        self._reload_lock = threading.Lock()
+        self._keys = None
+        self._vehicles = {}
+        self._vehicle_keys = {}
+        self._customer_vehicles = {}
+        self._loaded_at = 0.0
+
+    def _ttl(self):
+        return getattr(settings, 'VEHICLE_SEARCH_INDEX_TTL', 300)
+
+    def _is_stale(self):
+        return self._keys is None or time.monotonic() - self._loaded_at > self._ttl()
+
+    def _refresh(self):
+        """
+        Reloads a stale index, one request at a time. Once the TTL runs out
+        the first request to notice reloads it; the others keep searching
+        the old copy rather than all reloading at once. Only a missing index
+        (never loaded, or invalidated) makes requests wait for the reload.
+        """
+        if self._keys is None:
+            with self._reload_lock:
+                if self._keys is None:
+                    self.load()
+        elif self._is_stale() and self._reload_lock.acquire(blocking=False):
+            try:
+                if self._is_stale():
+                    self.load()
+            finally:
+                self._reload_lock.release()
+
+    @staticmethod
+    def _entry(vehicle):
+        customer = vehicle.customer
+        return {
+            'id': vehicle.id,
+            'make': vehicle.make,
+            'model': vehicle.model,
+            'registration_no': vehicle.registration_no,
+            'vehicle_type': vehicle.vehicle_type,
+            'customer': {
+                'id': customer.id,
+                'name': customer.name,
+                'phone': customer.phone,
+                'email': customer.email,
+            },
+        }
+
+    def load(self):
+        vehicles = {}
+        vehicle_keys = {}
+        customer_vehicles = {}
+        keys = []
+        for vehicle in Vehicle.objects.select_related('customer').iterator(chunk_size=2000):
+            entry = self._entry(vehicle)
+            own_keys = [(key, vehicle.id) for key in _vehicle_keys(entry)]
+            vehicles[vehicle.id] = entry
+            vehicle_keys[vehicle.id] = own_keys
+            customer_vehicles.setdefault(vehicle.customer_id, set()).add(vehicle.id)
+            keys.extend(own_keys)
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._vehicles = vehicles
+            self._vehicle_keys = vehicle_keys
+            self._customer_vehicles = customer_vehicles
+            self._loaded_at = time.monotonic()
+
+    def warm(self):
+        """Loads the index at process start; a missing database just defers it to the first search."""
+        try:
+            self.load()
+        except DatabaseError:
+            pass
+
+    def _remove(self, vehicle_id):
+        entry = self._vehicles.pop(vehicle_id, None)
+        if entry is None:
+            return
+        for item in self._vehicle_keys.pop(vehicle_id):
+            position = bisect_left(self._keys, item)
+            if position < len(self._keys) and self._keys[position] == item:
+                del self._keys[position]
+        owned = self._customer_vehicles.get(entry['customer']['id'])
+        if owned is not None:
+            owned.discard(vehicle_id)
+
+    def _add(self, entry):
+        own_keys = [(key, entry['id']) for key in _vehicle_keys(entry)]
+        for item in own_keys:
+            insort(self._keys, item)
+        self._vehicles[entry['id']] = entry
+        self._vehicle_keys[entry['id']] = own_keys
+        self._customer_vehicles.setdefault(entry['customer']['id'], set()).add(entry['id'])
+
+    def vehicle_saved(self, vehicle):
+        entry = self._entry(vehicle)
+        with self._lock:
+            if self._keys is None:
+                return
+            self._remove(vehicle.id)
+            self._add(entry)
+
+    def vehicle_deleted(self, vehicle_id):
+        with self._lock:
+            if self._keys is None:
+                return
+            self._remove(vehicle_id)
+
+    def customer_saved(self, customer):
+        """Re-indexes the customer's vehicles under their new name and phone number."""
+        with self._lock:
+            if self._keys is None:
+                return
+            for vehicle_id in list(self._customer_vehicles.get(customer.id, ())):
+                entry = self._vehicles[vehicle_id]
+                entry = {**entry, 'customer': {
+                    'id': customer.id,
+                    'name': customer.name,
+                    'phone': customer.phone,
+                    'email': customer.email,
+                }}
+                self._remove(vehicle_id)
+                self._add(entry)
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+
+    def _scan(self, key_prefix, found, limit, accept=None):
+        """Appends vehicle ids whose keys start with key_prefix to `found`, in key order, up to `limit`."""
+        keys = self._keys
+        position = bisect_left(keys, (key_prefix,))
+        while len(found) < limit and position < len(keys) and keys[position][0].startswith(key_prefix):
+            vehicle_id = keys[position][1]
+            if vehicle_id not in found and (accept is None or accept(vehicle_id)):
+                found[vehicle_id] = None
+            position += 1
+
+    def _near(self, whole, deleted, term, found, limit, accept=None):
+        """
+        Appends vehicle ids whose whole keys of kind `whole` (R or N) are one
+        typo from `term` to `found`, up to `limit`. A typo leaves the two
+        strings sharing a one-character deletion (or one being a deletion of
+        the other), so `term` and its deletions are looked up among the
+        whole keys and the `deleted` (D or M) keys: about 2 * len(term)
+        exact lookups, each candidate checked with a bounded edit distance.
+        """
+        if len(term) < NEAR_MATCH_MIN_LENGTH:
+            return
+        probes = {f'{deleted}{term}'}
+        for variant in _deletions(term):
+            probes.update((f'{whole}{variant}', f'{deleted}{variant}'))
+        keys = self._keys
+        one_typo = {}  # target -> within one edit of term, checked once per distinct string
+
+        def is_near(vehicle_id):
+            entry = self._vehicles[vehicle_id]
+            if whole == 'R':
+                targets = [normalize_registration(entry['registration_no'])]
+            else:
+                targets = entry['customer']['name'].lower().split()
+            for target in targets:
+                if target not in one_typo:
+                    one_typo[target] = _edit_distance(term, target, 1) <= 1
+                if one_typo[target]:
+                    return accept is None or accept(vehicle_id)
+            return False
+
+        for probe in sorted(probes):
+            position = bisect_left(keys, (probe,))
+            while len(found) < limit and position < len(keys) and keys[position][0] == probe:
+                vehicle_id = keys[position][1]
+                if vehicle_id not in found and is_near(vehicle_id):
+                    found[vehicle_id] = None
+                position += 1
+
+    def search(self, query, limit=10):
+        """
+        Returns up to `limit` vehicles (VehicleSerializer-shaped dicts) matching
+        `query`, best matches first: registration numbers, then phone numbers
+        that start with it, then ones that contain it, then owners whose name
+        has a word starting with each word typed ("ra sh" finds Rahul Sharma).
+        If none match, falls back to registrations and name words one typo
+        away ("GJ01AB1243", "sharam").
+        """
+        self._refresh()
+        found = {}  # insertion-ordered set of vehicle ids
+        registration = normalize_registration(query)
+        digits = query.strip() if query.strip().isdigit() else ''
+        words = sorted(set(query.lower().split()), key=len, reverse=True)
+        with self._lock:
+            if registration:
+                self._scan(f'R{registration}', found, limit)
+            if digits:
+                self._scan(f'P{digits}', found, limit)
+            if registration:
+                self._scan(f'r{registration}', found, limit)
+            if digits:
+                self._scan(f'p{digits}', found, limit)
+            if words:
+                # Scan the longest (most selective) word; check the rest on the entry.
+                others = words[1:]
+
+                def has_other_words(vehicle_id, typos=0):
+                    name_words = self._vehicles[vehicle_id]['customer']['name'].lower().split()
+                    return all(
+                        any(
+                            name.startswith(word)
+                            or (typos and len(word) >= NEAR_MATCH_MIN_LENGTH and _edit_distance(word, name, typos) <= typos)
+                            for name in name_words
+                        )
+                        for word in others
+                    )
+                self._scan(f'N{words[0]}', found, limit, accept=has_other_words if others else None)
+            if not found:
+                if registration and not digits:
+                    self._near('R', 'D', registration, found, limit)
+                if words:
+                    self._near(
+                        'N', 'M', words[0], found, limit,
+                        accept=(lambda vehicle_id: has_other_words(vehicle_id, typos=1)) if others else None,
+                    )
+            return [self._vehicles[vehicle_id] for vehicle_id in found]
+
+
+vehicle_index = VehicleSearchIndex()
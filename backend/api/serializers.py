@@ -1,7 +1,9 @@
 # serializers.py
 from rest_framework import serializers
 from django.db import transaction
-from .models import User, Customer, Vehicle, JobCard, ServiceTask, Part, PartUsage, Invoice
+from django.urls import reverse
+from .models import BackgroundJob, User, Customer, Vehicle, JobCard, ServiceTask, Part, PartUsage, Invoice
+from .workload import PENDING_STATUSES
 
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
@@ -27,11 +29,19 @@ class VehicleSerializer(serializers.ModelSerializer):
         model = Vehicle
         fields = ['id', 'make', 'model', 'registration_no', 'vehicle_type', 'customer']
 
+# The vehicle inside a job card listing; the card's customer is already
+# listed alongside, so it is not repeated here.
+class JobCardVehicleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Vehicle
+        fields = ['id', 'make', 'model', 'registration_no', 'vehicle_type']
+
 # --- NEW SERIALIZER FOR LISTING JOB CARDS ---
 # This serializer is used to display the list of all job cards.
+# The list endpoints build the same output with fastpath.jobcard_list_rows().
 class JobCardListSerializer(serializers.ModelSerializer):
     customer = CustomerSerializer(read_only=True)
-    vehicle = VehicleSerializer(read_only=True)
+    vehicle = JobCardVehicleSerializer(read_only=True)
     assigned_mechanic = serializers.StringRelatedField()
 
     class Meta:
@@ -51,16 +61,19 @@ class JobCardListSerializer(serializers.ModelSerializer):
     #     ]
 
 
-# Serializer for listing mechanics with their pending job counts
+# Serializer for listing mechanics with their pending job counts.
+# Expects a queryset from workload.mechanics_with_workload(), which annotates
+# the counts so no per-mechanic query is needed.
 class MechanicSerializer(serializers.ModelSerializer):
-    pending_jobs_count = serializers.SerializerMethodField()
+    pending_jobs_count = serializers.IntegerField(read_only=True)
+    pending_by_status = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'full_name', 'pending_jobs_count']
+        fields = ['id', 'full_name', 'pending_jobs_count', 'pending_by_status']
 
-    def get_pending_jobs_count(self, obj):
-        return obj.assigned_jobs.exclude(status='done').count()
+    def get_pending_by_status(self, obj):
+        return {code: getattr(obj, f'{code}_count', 0) for code in PENDING_STATUSES}
 
 # Serializer for creating new service tasks
 class ServiceTaskCreateSerializer(serializers.ModelSerializer):
@@ -214,15 +227,14 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
         # Tax will be calculated, but we allow it to be passed for potential overrides
         required_fields = ['labor_charge', 'discount']
 
+# The part's existence is checked by inventory.issue_parts() as part of the
+# stock update, so validation here needs no query.
 class IssuePartActionSerializer(serializers.Serializer):
     part_id = serializers.IntegerField(required=True)
     quantity_used = serializers.IntegerField(required=True, min_value=1)
 
-    def validate_part_id(self, value):
-        # Check if the part actually exists in the database
-        if not Part.objects.filter(pk=value).exists():
-            raise serializers.ValidationError("A part with this ID does not exist.")
-        return value
+class IssuePartsSerializer(serializers.Serializer):
+    items = IssuePartActionSerializer(many=True, allow_empty=False)
 
 class InvoiceExportSerializer(serializers.ModelSerializer):
     # Include customer name for clarity in the report
@@ -274,3 +286,26 @@ class ChangePinSerializer(serializers.Serializer):
         if data['new_pin'] != data['new_pin_confirm']:
             raise serializers.ValidationError({"new_pin_confirm": "New PINs do not match."})
         return data
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    """Status of a background job; download_url is set once the job is done."""
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'id', 'kind', 'status', 'attempts', 'error', 'created_at', 'started_at', 'finished_at',
+            'status_url', 'download_url',
+        ]
+
+    def _url(self, name, job):
+        url = reverse(name, args=[job.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_status_url(self, job):
+        return self._url('background-job-detail', job)
+
+    def get_download_url(self, job):
+        return self._url('background-job-download', job) if job.status == 'done' else None
@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import profile_cache
+from .catalog import parts_catalog
+from .models import Customer, Invoice, JobCard, Part, PartUsage, ServiceTask, User, Vehicle
+from .revisions import PARTS_CATALOG, bump_on_commit, touch_jobcard
+from .rollups import record_jobcard_change
+from .search import vehicle_index
+from .workload import workload_cache, workload_cache_enabled
+
+
+# --- Mechanic workload cache: apply status / mechanic changes on JobCard once committed ---
+
+@receiver(pre_save, sender=JobCard)
+def remember_jobcard_assignment(sender, instance, **kwargs):
+    """
+    Stashes the stored status and mechanic so post_save can compute the
+    delta, for the workload cache and the reporting rollups.
+    """
+    previous = None
+    if instance.pk:
+        previous = JobCard.objects.filter(pk=instance.pk).values('status', 'assigned_mechanic_id').first()
+    instance._previous_assignment = previous
+
+
+@receiver(post_save, sender=JobCard)
+def update_workload_on_save(sender, instance, created, **kwargs):
+    if not workload_cache_enabled():
+        return
+    previous = getattr(instance, '_previous_assignment', None)
+    old_mechanic_id = previous['assigned_mechanic_id'] if previous else None
+    old_status = previous['status'] if previous else None
+    new_mechanic_id, new_status = instance.assigned_mechanic_id, instance.status
+    # Applied once committed, so a rolled-back change leaves the counts alone.
+    transaction.on_commit(
+        lambda: workload_cache.job_changed(old_mechanic_id, old_status, new_mechanic_id, new_status)
+    )
+
+
+@receiver(post_delete, sender=JobCard)
+def update_workload_on_delete(sender, instance, **kwargs):
+    if not workload_cache_enabled():
+        return
+    mechanic_id, status = instance.assigned_mechanic_id, instance.status
+    transaction.on_commit(lambda: workload_cache.job_changed(mechanic_id, status, None, None))
+
+
+# --- Reporting rollups: invoiced cards entering or leaving 'done', or reassigned ---
+
+@receiver(post_save, sender=JobCard)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_assignment', None)
+    if previous:
+        record_jobcard_change(
+            instance.pk, previous['status'], previous['assigned_mechanic_id'],
+            instance.status, instance.assigned_mechanic_id,
+        )
+
+
+# --- Vehicle search index: re-index vehicles once their changes are committed ---
+
+@receiver(post_save, sender=Vehicle)
+def index_vehicle(sender, instance, **kwargs):
+    transaction.on_commit(lambda: vehicle_index.vehicle_saved(instance))
+
+
+@receiver(post_delete, sender=Vehicle)
+def unindex_vehicle(sender, instance, **kwargs):
+    vehicle_id = instance.id
+    transaction.on_commit(lambda: vehicle_index.vehicle_deleted(vehicle_id))
+
+
+@receiver(post_save, sender=Customer)
+def reindex_customer_vehicles(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: vehicle_index.customer_saved(instance))
+
+
+# --- Token auth profile cache: drop a user's cached profile when it changes ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_profile(sender, instance, **kwargs):
+    profile_cache.invalidate(instance.id)
+
+
+# --- Revisions: version stamps behind the conditional GET endpoints ---
+
+@receiver(post_save, sender=JobCard)
+def touch_saved_jobcard(sender, instance, created, **kwargs):
+    if not created:
+        touch_jobcard(instance.pk)
+
+
+@receiver(post_save, sender=ServiceTask)
+@receiver(post_delete, sender=ServiceTask)
+@receiver(post_save, sender=PartUsage)
+@receiver(post_delete, sender=PartUsage)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def touch_parent_jobcard(sender, instance, **kwargs):
+    touch_jobcard(instance.jobcard_id)
+
+
+@receiver(post_save, sender=Part)
+def bump_parts_catalog_on_save(sender, instance, **kwargs):
+    part_id = instance.id
+    bump_on_commit(PARTS_CATALOG, lambda revision: parts_catalog.apply(revision, [part_id]))
+
+
+@receiver(post_delete, sender=Part)
+def bump_parts_catalog_on_delete(sender, instance, **kwargs):
+    part_id = instance.id
+    bump_on_commit(PARTS_CATALOG, lambda revision: parts_catalog.apply(revision, [part_id]))
@@ -1,3 +1,1549 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+import re
+import threading
+import time
+import zipfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .authentication import issue_token, profile_cache
+from .background import claim_next, enqueue, purge_expired, requeue_stale
+from .catalog import parts_catalog
+from .events import EventHub, hub
+from .fastpath import JOBCARD_LIST_COLUMNS, jobcard_list_rows
+from .forecast import np, parts_forecast, smoothing_weights, usage_matrix
+from .metrics import registry as metrics_registry
+from .models import (
+    ArchivedInvoice, ArchivedJobCard, ArchivedPartUsage, ArchivedServiceTask, BackgroundJob, Customer, DailyMechanicRollup,
+    DailyPartRollup, DailyRevenueRollup, EarningsEntry, Invoice, JobCard, Part, PartUsage, ServiceTask, User, Vehicle,
+)
+from .pdf_cache import InvoicePDFCache, invoice_fingerprint, pdf_cache
+from .pdf_export import _discard_render_pool, render_pool
+from .periods import start_of_day
+from .reports import abuild_report, build_report, report_buckets
+from .revisions import PARTS_CATALOG, bump
+from .rollups import rebuild_rollups
+from .routing import ReplicaMonitor, ReplicaRouter, reads_from, replica_monitor
+from .search import vehicle_index
+from .serializers import InvoiceExportSerializer, JobCardListSerializer
+from .streaming_export import iter_export_rows
+from .utils import get_invoice_renderer, load_invoice_data
+from .workload import workload_cache
+
+
+def make_jobcard(status='queue'):
+    customer = Customer.objects.create(name='Ravi', phone=9800000000)
+    vehicle = Vehicle.objects.create(
+        customer=customer, make='Honda', model='Activa', registration_no='GJ01AB1234', vehicle_type='moped'
+    )
+    mechanic = User.objects.create(
+        username='mech', full_name='Mech One', email='mech@example.com', phone=9811111111, role='mechanic', pin=1234
+    )
+    return JobCard.objects.create(customer=customer, vehicle=vehicle, assigned_mechanic=mechanic, status=status)
+
+
+def metric_sample(exposition, name, **labels):
+    """The value of one series in a /metrics exposition, or None."""
+    wanted = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    for line in exposition.splitlines():
+        series, _, value = line.rpartition(' ')
+        if series == f'{name}{{{wanted}}}':
+            return float(value)
+    return None
+
+
+def day_range(first_day, last_day):
+    """[start, end) datetimes covering whole days first_day..last_day."""
+    return start_of_day(first_day), start_of_day(last_day + timedelta(days=1))
+
+
+class EventHubTests(TestCase):
+    def test_publish_reaches_every_subscriber(self):
+        events = EventHub()
+        first, second = events.subscribe(), events.subscribe()
+        events.publish('jobcard.status', {'jobcard_id': 1, 'status': 'qc'})
+        self.assertEqual(first.get(timeout=1)['data'], {'jobcard_id': 1, 'status': 'qc'})
+        self.assertEqual(second.get(timeout=1)['type'], 'jobcard.status')
+
+    def test_closed_subscription_stops_receiving(self):
+        events = EventHub()
+        subscription = events.subscribe()
+        subscription.close()
+        events.publish('task.updated', {'task_id': 1})
+        self.assertIsNone(subscription.get(timeout=0))
+        self.assertEqual(events.subscriber_count, 0)
+
+    def test_reconnect_replays_missed_events(self):
+        events = EventHub()
+        seen = events.publish('task.updated', {'task_id': 1})
+        events.publish('task.updated', {'task_id': 2})
+        subscription = events.subscribe(last_event_id=seen['id'])
+        self.assertEqual(subscription.get(timeout=1)['data'], {'task_id': 2})
+        self.assertIsNone(subscription.get(timeout=0))
+
+
+class LiveEventsViewTests(TestCase):
+    def test_status_update_is_streamed(self):
+        jobcard = make_jobcard()
+        response = self.client.get('/api/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/jobcards/{jobcard.id}/update-status/', {'status': 'qc'}, content_type='application/json'
+            )
+        message = next(stream).decode()
+        self.assertIn('event: jobcard.status', message)
+        self.assertIn('"status": "qc"', message)
+        response.close()
+
+    def test_issue_part_publishes_event(self):
+        jobcard = make_jobcard()
+        part = Part.objects.create(name='Spark Plug', stock_quantity=5, unit_price='120.00')
+        subscription = hub.subscribe()
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    f'/api/jobcards/{jobcard.id}/issue-part/',
+                    {'part_id': part.id, 'quantity_used': 2},
+                    content_type='application/json',
+                )
+            event = subscription.get(timeout=1)
+        finally:
+            subscription.close()
+        self.assertEqual(event['type'], 'part.issued')
+        self.assertEqual(event['data']['stock_quantity'], 3)
+
+
+class IssuePartsTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard()
+        self.plug = Part.objects.create(name='Spark Plug', stock_quantity=5, unit_price='120.00')
+        self.oil = Part.objects.create(name='Engine Oil', stock_quantity=2, unit_price='350.00')
+
+    def issue(self, items):
+        return self.client.post(
+            f'/api/jobcards/{self.jobcard.id}/issue-parts/', {'items': items}, content_type='application/json'
+        )
+
+    def test_issues_all_lines_in_one_request(self):
+        response = self.issue([
+            {'part_id': self.plug.id, 'quantity_used': 2},
+            {'part_id': self.oil.id, 'quantity_used': 1},
+            {'part_id': self.plug.id, 'quantity_used': 1},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.plug.refresh_from_db()
+        self.oil.refresh_from_db()
+        self.assertEqual((self.plug.stock_quantity, self.oil.stock_quantity), (2, 1))
+        usage = PartUsage.objects.get(jobcard=self.jobcard, part=self.plug)
+        self.assertEqual(usage.quantity_used, 3)
+
+    def test_short_line_rolls_back_whole_issue(self):
+        response = self.issue([
+            {'part_id': self.plug.id, 'quantity_used': 2},
+            {'part_id': self.oil.id, 'quantity_used': 3},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Engine Oil', response.json()['error'])
+        self.plug.refresh_from_db()
+        self.assertEqual(self.plug.stock_quantity, 5)
+        self.assertFalse(PartUsage.objects.exists())
+
+    def test_unknown_part_is_rejected(self):
+        response = self.issue([{'part_id': 9999, 'quantity_used': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PartUsage.objects.exists())
+
+
+class ConcurrentIssuePartTests(TransactionTestCase):
+    def test_parallel_requests_never_oversell(self):
+        jobcard = make_jobcard()
+        part = Part.objects.create(name='Brake Pad', stock_quantity=10, unit_price='250.00')
+        barrier = threading.Barrier(8)
+        statuses = []
+
+        def issue_three():
+            try:
+                barrier.wait()
+                # Exceptions come back as 500s: the test client's exception hook is
+                # a global signal, so raising would leak into the other threads.
+                response = self.client_class(raise_request_exception=False).post(
+                    f'/api/jobcards/{jobcard.id}/issue-part/',
+                    {'part_id': part.id, 'quantity_used': 3},
+                    content_type='application/json',
+                )
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=issue_three) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        part.refresh_from_db()
+        issued = PartUsage.objects.filter(part=part).aggregate(total=Sum('quantity_used'))['total'] or 0
+        self.assertGreaterEqual(part.stock_quantity, 0)
+        self.assertEqual(issued + part.stock_quantity, 10)
+        self.assertEqual(issued, 3 * statuses.count(201))
+        self.assertLessEqual(statuses.count(201), 3)
+
+
+@override_settings(REPORTS_QUERY_WORKERS=4)
+class ConcurrentReportsTests(TransactionTestCase):
+    def setUp(self):
+        # The pool is only used with persistent connections.
+        patcher = mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=60)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sequential_without_persistent_connections(self):
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        today = day_range(timezone.localdate(), timezone.localdate())
+        with CaptureQueriesContext(connection) as captured:
+            async_to_sync(abuild_report)(*today)
+        self.assertTrue(captured.captured_queries)
+
+    def test_concurrent_report_matches_the_sequential_one(self):
+        report_buckets.invalidate()
+        jobcard = make_jobcard()
+        part = Part.objects.create(name='Brake Pad', stock_quantity=10, unit_price='250.00')
+        self.client.post(f'/api/jobcards/{jobcard.id}/issue-part/', {'part_id': part.id, 'quantity_used': 2})
+        self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        today = day_range(timezone.localdate(), timezone.localdate())
+
+        statements = []
+
+        def count(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+        with connection.execute_wrapper(count):
+            report = async_to_sync(abuild_report)(*today)
+        # Every rollup query ran on a pool thread's connection.
+        self.assertEqual(statements, [])
+        self.assertEqual(report, build_report(*today))
+        self.assertEqual(report['operational_kpis']['jobs_completed'], 1)
+        self.assertEqual(report['most_used_parts'], [{'part__name': 'Brake Pad', 'total_quantity': 2}])
+
+        response = self.client.get('/api/reports/?period=today')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['operational_kpis']['jobs_completed'], 1)
+        self.assertEqual(self.client.get('/api/reports/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.client.get('/api/reports/?period=today', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_pooled_queries_count_towards_the_request(self):
+        def queries_per_report():
+            report_buckets.invalidate()
+            metrics_registry.reset()
+            self.assertEqual(self.client.get('/api/reports/?period=week').status_code, 200)
+            exposition = self.client.get('/metrics').content.decode()
+            return metric_sample(
+                exposition, 'autoserve_db_queries_per_request_sum', route='api/reports/', method='GET',
+            )
+
+        pooled = queries_per_report()
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        sequential = queries_per_report()
+        self.assertGreaterEqual(sequential, 5)  # revision, generation, three bucket queries
+        self.assertEqual(pooled, sequential)
+
+
+@skipUnless(connection.vendor in ('sqlite', 'mysql'), "Query plan checks support SQLite and MySQL.")
+class JobBoardTests(TestCase):
+    def setUp(self):
+        first = make_jobcard('queue')
+        self.mechanic = first.assigned_mechanic
+        other_customer = Customer.objects.create(name='Meena Shah', phone=9822222222)
+        other_vehicle = Vehicle.objects.create(
+            customer=other_customer, make='Bajaj', model='Pulsar', registration_no='MH12XY9876', vehicle_type='bike'
+        )
+        self.cards = [first]
+        for index, status in enumerate(['service', 'parts', 'qc', 'done', 'done', 'queue']):
+            mine = index % 2 == 0
+            self.cards.append(JobCard.objects.create(
+                customer=first.customer if mine else other_customer,
+                vehicle=first.vehicle if mine else other_vehicle,
+                assigned_mechanic=self.mechanic if mine else None,
+                status=status,
+            ))
+        # Several cards share a timestamp, so paging must break ties on id.
+        tied = timezone.now()
+        JobCard.objects.filter(id__in=[card.id for card in self.cards[2:6]]).update(created_at=tied)
+
+    def ids(self, params):
+        return [row['id'] for row in self.client.get('/api/jobcards/', params).json()['results']]
+
+    def test_cursor_pages_cover_every_card_once(self):
+        response = self.client.get('/api/jobcards/', {'status': 'all', 'page_size': 3}).json()
+        seen = [row['id'] for row in response['results']]
+        pages = 1
+        while response['next']:
+            response = self.client.get(response['next']).json()
+            seen.extend(row['id'] for row in response['results'])
+            pages += 1
+        expected = list(
+            JobCard.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/jobcards/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_status_filter(self):
+        done = {card.id for card in self.cards if card.status == 'done'}
+        self.assertEqual(set(self.ids({})), {card.id for card in self.cards} - done)
+        self.assertEqual(set(self.ids({'status': 'done'})), done)
+        self.assertEqual(
+            set(self.ids({'status': 'queue,qc'})),
+            {card.id for card in self.cards if card.status in ('queue', 'qc')},
+        )
+        self.assertEqual(len(self.ids({'status': 'all'})), len(self.cards))
+        response = self.client.get('/api/jobcards/', {'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_mechanic_registration_and_search_filters(self):
+        mine = {card.id for card in self.cards if card.assigned_mechanic_id == self.mechanic.id}
+        self.assertEqual(set(self.ids({'status': 'all', 'mechanic': self.mechanic.id})), mine)
+        self.assertEqual(set(self.ids({'status': 'all', 'registration_no': 'gj01ab1234'})), mine)
+        self.assertEqual(set(self.ids({'status': 'all', 'search': 'meena'})), {card.id for card in self.cards} - mine)
+        self.assertEqual(set(self.ids({'status': 'all', 'search': 'xy98'})), {card.id for card in self.cards} - mine)
+        # A number matches the job card id as well as names and registrations containing it.
+        wanted = str(self.cards[3].id)
+        self.assertEqual(
+            set(self.ids({'status': 'all', 'search': wanted})),
+            {card.id for card in self.cards if str(card.id) == wanted or wanted in card.vehicle.registration_no},
+        )
+        self.assertEqual(self.client.get('/api/jobcards/', {'mechanic': 'me'}).status_code, 400)
+
+    def test_counts_cover_every_page(self):
+        response = self.client.get('/api/jobcards/', {'status': 'queue', 'page_size': 1, 'counts': 1}).json()
+        self.assertEqual(len(response['results']), 1)
+        self.assertEqual(
+            response['counts'], {'queue': 2, 'service': 1, 'parts': 1, 'qc': 1, 'done': 2, 'all': 7}
+        )
+        self.assertNotIn('counts', self.client.get(response['next']).json())
+        searched = self.client.get('/api/jobcards/', {'search': 'meena', 'counts': 1}).json()['counts']
+        self.assertEqual(searched['all'], 3)
+        self.assertEqual(searched['done'], 1)
+
+    def test_counts_for_one_creation_day(self):
+        JobCard.objects.filter(id=self.cards[1].id).update(created_at=timezone.now() - timedelta(days=1))
+        today, yesterday = timezone.localdate(), timezone.localdate() - timedelta(days=1)
+        for day, total in [(today, 6), (yesterday, 1)]:
+            params = {'status': 'all', 'created_after': day, 'created_before': day, 'counts': 1, 'page_size': 1}
+            self.assertEqual(self.client.get('/api/jobcards/', params).json()['counts']['all'], total)
+
+    def test_my_jobs_counts_cover_every_status(self):
+        params = {'mechanic_id': self.mechanic.id, 'status': 'open', 'counts': 1}
+        response = self.client.get('/api/my-jobs/', params).json()
+        self.assertEqual(len(response['jobs']), 3)
+        self.assertEqual(response['counts'], {'queue': 1, 'service': 1, 'parts': 0, 'qc': 1, 'done': 1, 'all': 4})
+
+    def test_my_jobs_follow_next(self):
+        params = {'mechanic_id': self.mechanic.id, 'page_size': 2}
+        response = self.client.get('/api/my-jobs/', params).json()
+        seen = [row['id'] for row in response['jobs']]
+        while response['next']:
+            response = self.client.get(response['next']).json()
+            seen.extend(row['id'] for row in response['jobs'])
+        mine = JobCard.objects.filter(assigned_mechanic=self.mechanic).order_by('-created_at', '-id')
+        self.assertEqual(seen, list(mine.values_list('id', flat=True)))
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on every SELECT the hot endpoints issue and fails if any
+    of them reads a table with a full scan instead of an index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        jobcard = make_jobcard()
+        cls.mechanic = jobcard.assigned_mechanic
+        part = Part.objects.create(name='Chain Set', stock_quantity=50, unit_price='900.00')
+        for index in range(20):
+            card = JobCard.objects.create(
+                customer=jobcard.customer, vehicle=jobcard.vehicle, assigned_mechanic=cls.mechanic,
+                status='done' if index % 2 else 'service',
+            )
+            PartUsage.objects.create(jobcard=card, part=part, quantity_used=1, price_at_time_of_use=part.unit_price)
+            if index % 2:
+                Invoice.objects.create(jobcard=card, labor_charge='500.00', parts_total='900.00', total_amount='1400.00')
+        rebuild_rollups()
+
+    def full_scans(self, sql):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                details = [row[-1] for row in cursor.fetchall()]
+            return [detail for detail in details if re.fullmatch(r'SCAN \w+', detail)]
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN FORMAT=JSON {sql}')
+            plan = cursor.fetchone()[0]
+        return re.findall(r'"table_name": "(\w+)",\s*"access_type": "ALL"', json.dumps(json.loads(plan), indent=1))
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, url)
+        selects = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, url)
+        for sql in selects:
+            self.assertEqual(self.full_scans(sql), [], f"{url} runs a full scan:\n{sql}")
+
+    def test_vehicle_find(self):
+        self.assert_indexed('/api/vehicles/find/?registration_no=gj01ab1234')
+
+    def test_job_board(self):
+        self.assert_indexed('/api/jobcards/')
+        self.assert_indexed(f'/api/jobcards/?mechanic={self.mechanic.id}&status=service')
+
+    def test_mechanic_list(self):
+        self.assert_indexed('/api/users/mechanics/')
+
+    def test_my_jobs(self):
+        self.assert_indexed(f'/api/my-jobs/?mechanic_id={self.mechanic.id}')
+
+    def test_reports_and_export(self):
+        self.assert_indexed('/api/reports/?period=month')
+        self.assert_indexed('/api/invoices/export/?period=month')
+
+
+class VehicleSearchTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name='Rahul Sharma', phone=9876543210)
+        Vehicle.objects.create(customer=customer, make='Honda', model='Activa', registration_no='GJ01AB1234', vehicle_type='moped')
+        Vehicle.objects.create(customer=customer, make='Bajaj', model='Pulsar', registration_no='GJ05CD9912', vehicle_type='bike')
+        vehicle_index.load()
+
+    def search(self, query):
+        response = self.client.get('/api/vehicles/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [vehicle['registration_no'] for vehicle in response.json()]
+
+    def test_matches_registration_prefix_and_fragment(self):
+        self.assertEqual(self.search('gj01'), ['GJ01AB1234'])
+        self.assertEqual(self.search('ab 12'), ['GJ01AB1234'])
+        self.assertEqual(self.search('GJ'), ['GJ01AB1234', 'GJ05CD9912'])
+
+    def test_matches_phone_and_name(self):
+        self.assertEqual(self.search('3210'), ['GJ01AB1234', 'GJ05CD9912'])
+        self.assertEqual(self.search('rah sha'), ['GJ01AB1234', 'GJ05CD9912'])
+        self.assertEqual(self.search('rahul kumar'), [])
+
+    def test_near_matches_when_nothing_matches_exactly(self):
+        self.assertEqual(self.search('GJ01AB1243'), ['GJ01AB1234'])
+        self.assertEqual(self.search('GJ05D9912'), ['GJ05CD9912'])
+        self.assertEqual(self.search('sharam'), ['GJ01AB1234', 'GJ05CD9912'])
+        self.assertEqual(self.search('rah sharam'), ['GJ01AB1234', 'GJ05CD9912'])
+        self.assertEqual(self.search('rahl sharma'), ['GJ01AB1234', 'GJ05CD9912'])
+        # Short queries and ones too many edits away find nothing.
+        self.assertEqual(self.search('GX'), [])
+        self.assertEqual(self.search('MH09ZZ1234'), [])
+
+    def test_index_follows_committed_changes(self):
+        vehicle = Vehicle.objects.get(registration_no='GJ05CD9912')
+        with self.captureOnCommitCallbacks(execute=True):
+            vehicle.registration_no = 'MH12XY0001'
+            vehicle.save()
+        self.assertEqual(self.search('MH12'), ['MH12XY0001'])
+        self.assertEqual(self.search('GJ05'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            vehicle.delete()
+        self.assertEqual(self.search('MH12'), [])
+
+    def test_stale_index_is_reloaded_once_while_others_search_the_old_copy(self):
+        reloading = threading.Event()
+        release = threading.Event()
+
+        def slow_load():
+            # Stands in for the database read; only the timestamp matters here.
+            reloading.set()
+            release.wait(5)
+            vehicle_index._loaded_at = time.monotonic()
+
+        vehicle_index._loaded_at -= 10 ** 6  # past the TTL
+        results = []
+        with mock.patch.object(vehicle_index, 'load', side_effect=slow_load) as load:
+            reloader = threading.Thread(target=lambda: vehicle_index.search('GJ01'))
+            reloader.start()
+            self.assertTrue(reloading.wait(5))
+            # Meanwhile other searches answer from the old copy without reloading.
+            for _ in range(3):
+                results.append([vehicle['registration_no'] for vehicle in vehicle_index.search('GJ01')])
+            release.set()
+            reloader.join(5)
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(results, [['GJ01AB1234']] * 3)
+
+    def test_requires_two_characters(self):
+        response = self.client.get('/api/vehicles/search/', {'q': 'g'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SignedTokenAuthTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard()
+        self.mechanic = self.jobcard.assigned_mechanic
+        profile_cache.invalidate()
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {issue_token(user)}'}
+
+    def test_login_returns_token_that_identifies_the_mechanic(self):
+        response = self.client.post('/api/login/', {'username': 'mech', 'pin': 1234}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        token = response.json()['token']
+        # No mechanic_id in the query: the token says who is asking, without a User lookup.
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/my-jobs/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual([job['id'] for job in response.json()['jobs']], [self.jobcard.id])
+        self.assertFalse(any('FROM "api_user"' in query['sql'] for query in captured.captured_queries))
+
+    def test_profile_is_cached_until_the_user_changes(self):
+        headers = self.auth(self.mechanic)
+        self.client.get(f'/api/users/{self.mechanic.id}/', **headers)
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/users/{self.mechanic.id}/', **headers)
+        self.assertEqual(response.json()['full_name'], 'Mech One')
+        self.mechanic.full_name = 'Mech Renamed'
+        self.mechanic.save()
+        self.assertEqual(self.client.get(f'/api/users/{self.mechanic.id}/', **headers).json()['full_name'], 'Mech Renamed')
+
+    def test_token_cannot_act_on_other_users(self):
+        other = User.objects.create(username='mech2', full_name='Mech Two', email='m2@example.com', phone=1, role='mechanic', pin=1111)
+        response = self.client.get(f'/api/users/{other.id}/', **self.auth(self.mechanic))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(
+            f'/api/users/{other.id}/change-pin/',
+            {'current_pin': 1111, 'new_pin': 2222, 'new_pin_confirm': 2222},
+            content_type='application/json', **self.auth(self.mechanic),
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_pin_or_role_change_revokes_issued_tokens(self):
+        headers = self.auth(self.mechanic)
+        self.assertEqual(self.client.get('/api/my-jobs/', **headers).status_code, 200)
+        response = self.client.post(
+            f'/api/users/{self.mechanic.id}/change-pin/',
+            {'current_pin': 1234, 'new_pin': 4321, 'new_pin_confirm': 4321},
+            content_type='application/json', **headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/my-jobs/', **headers).status_code, 401)
+
+        self.mechanic.refresh_from_db()
+        headers = self.auth(self.mechanic)
+        self.assertEqual(self.client.get('/api/my-jobs/', **headers).status_code, 200)
+        self.mechanic.role = 'admin'
+        self.mechanic.save()
+        self.assertEqual(self.client.get('/api/my-jobs/', **headers).status_code, 401)
+
+    def test_tampered_or_expired_token_is_rejected(self):
+        token = issue_token(self.mechanic)
+        response = self.client.get('/api/my-jobs/', HTTP_AUTHORIZATION=f'Bearer {token[:-2]}xx')
+        self.assertEqual(response.status_code, 401)
+        with self.settings(API_TOKEN_TTL=-1):
+            response = self.client.get('/api/my-jobs/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 401)
+
+
+class MechanicWorkloadTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard(status='service')
+        self.mechanic = self.jobcard.assigned_mechanic
+        self.other = User.objects.create(
+            username='mech2', full_name='Mech Two', email='mech2@example.com', phone=9822222222, role='mechanic', pin=4321
+        )
+        for status, mechanic in (('queue', self.mechanic), ('qc', self.mechanic), ('done', self.mechanic), ('queue', self.other)):
+            JobCard.objects.create(
+                customer=self.jobcard.customer, vehicle=self.jobcard.vehicle, assigned_mechanic=mechanic, status=status
+            )
+        workload_cache.invalidate()
+
+    def workloads(self):
+        return {row['full_name']: (row['pending_jobs_count'], row['pending_by_status']) for row in
+                self.client.get('/api/users/mechanics/').json()}
+
+    def expected(self, one, two):
+        def counts(by_status):
+            return sum(by_status.values()), {'queue': 0, 'service': 0, 'parts': 0, 'qc': 0, **by_status}
+        return {'Mech One': counts(one), 'Mech Two': counts(two)}
+
+    def test_counts_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            workloads = self.workloads()
+        self.assertEqual(workloads, self.expected({'queue': 1, 'service': 1, 'qc': 1}, {'queue': 1}))
+
+    @override_settings(MECHANIC_WORKLOAD_CACHE=True)
+    def test_cache_applies_committed_changes(self):
+        self.workloads()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/jobcards/{self.jobcard.id}/update-status/', {'status': 'done'}, content_type='application/json'
+            )
+            queued = JobCard.objects.get(assigned_mechanic=self.mechanic, status='queue')
+            queued.assigned_mechanic = self.other
+            queued.save()
+            JobCard.objects.get(status='qc').delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.workloads(), self.expected({}, {'queue': 2}))
+
+    @override_settings(MECHANIC_WORKLOAD_CACHE=True)
+    def test_rolled_back_changes_leave_the_cache_alone(self):
+        before = self.workloads()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.jobcard.status = 'done'
+                self.jobcard.save()
+                JobCard.objects.get(status='qc').delete()
+                raise RuntimeError
+        self.assertEqual(self.workloads(), before)
+
+
+class BulkIntakeTests(TestCase):
+    def setUp(self):
+        self.mechanic = User.objects.create(
+            username='mech', full_name='Mech One', email='mech@example.com', phone=9811111111, role='mechanic', pin=1234
+        )
+
+    def item(self, number, registration=None, **overrides):
+        return {
+            'customer': {'name': f'Customer {number}', 'phone': 9800000000 + number},
+            'vehicle': {
+                'make': 'Honda', 'model': 'Activa', 'vehicle_type': 'moped',
+                'registration_no': registration or f'GJ01AB{number:04d}',
+            },
+            'assigned_mechanic_id': self.mechanic.id,
+            'tasks': [{'description': 'Oil change'}, {'description': 'Brake check'}],
+            **overrides,
+        }
+
+    def post(self, items):
+        return self.client.post('/api/jobcards/bulk/', items, content_type='application/json')
+
+    def test_bad_items_are_reported_and_skipped(self):
+        response = self.post([
+            self.item(1),
+            self.item(2, tasks=None),
+            self.item(3, assigned_mechanic_id=999),
+            self.item(4, customer_id=999),
+            self.item(5),
+        ])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual([row['index'] for row in body['created']], [0, 4])
+        self.assertEqual([row['index'] for row in body['errors']], [1, 2, 3])
+        self.assertIn('tasks', body['errors'][0]['errors'])
+        self.assertEqual(body['errors'][1]['errors'], {'assigned_mechanic_id': ["Mechanic not found."]})
+        self.assertEqual(body['errors'][2]['errors'], {'customer_id': ["Customer not found."]})
+        self.assertEqual(
+            sorted(JobCard.objects.values_list('vehicle__registration_no', flat=True)), ['GJ01AB0001', 'GJ01AB0005']
+        )
+        self.assertEqual(ServiceTask.objects.count(), 4)
+
+        response = self.post([self.item(6, assigned_mechanic_id=999)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], [])
+
+    def test_repeated_customers_and_vehicles_are_created_once(self):
+        existing = Vehicle.objects.create(
+            customer=Customer.objects.create(name='Asha', phone=9700000000),
+            make='Bajaj', model='Pulsar', registration_no='GJ05CD9912', vehicle_type='bike',
+        )
+        response = self.post([
+            self.item(1), self.item(1, registration='gj01ab0001'), self.item(2, registration='gj05cd9912'),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['created']), 3)
+        self.assertEqual(Customer.objects.filter(name='Customer 1').count(), 1)
+        self.assertEqual(Vehicle.objects.count(), 2)
+        first, second, third = JobCard.objects.order_by('id')
+        self.assertEqual((first.customer_id, first.vehicle_id), (second.customer_id, second.vehicle_id))
+        self.assertEqual(third.vehicle_id, existing.id)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        counts = []
+        for first, size in ((0, 5), (100, 40)):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.post([self.item(first + number) for number in range(size)])
+            self.assertEqual(len(response.json()['created']), size)
+            counts.append(len(captured.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rows_are_saved_one_by_one_without_bulk_returning(self):
+        # As on MySQL, which cannot return the ids of a multi-row INSERT.
+        features = type(connection.features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', False), \
+                CaptureQueriesContext(connection) as captured:
+            response = self.post([self.item(1), self.item(1), self.item(2)])
+        self.assertEqual(response.status_code, 201)
+        inserts = [query for query in captured.captured_queries if re.match(r'INSERT INTO [`"]api_jobcard[`"]', query['sql'])]
+        self.assertEqual(len(inserts), 3)
+        created = response.json()['created']
+        self.assertEqual(len(created), 3)
+        self.assertEqual(Customer.objects.count(), 2)
+        for row in created:
+            self.assertEqual(ServiceTask.objects.filter(jobcard_id=row['id']).count(), 2)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard()
+        self.task = ServiceTask.objects.create(jobcard=self.jobcard, description='Oil change')
+        self.part = Part.objects.create(name='Spark Plug', stock_quantity=10, unit_price='150.00')
+        parts_catalog.invalidate()
+
+    def revalidate(self, url, response, queries):
+        with self.assertNumQueries(queries):
+            return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_jobcard_detail_answers_304_until_a_related_row_changes(self):
+        url = f'/api/jobcards/{self.jobcard.id}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.revalidate(url, first, queries=1).status_code, 304)
+
+        self.task.completed = True
+        self.task.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+        second = self.client.get(url)
+        self.client.post(f'/api/jobcards/{self.jobcard.id}/issue-part/', {'part_id': self.part.id, 'quantity_used': 1})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=second['ETag']).status_code, 200)
+
+    def test_saving_a_stale_instance_keeps_a_concurrent_bump(self):
+        url = f'/api/jobcards/{self.jobcard.id}/'
+        stale = JobCard.objects.get(pk=self.jobcard.pk)
+        # A task update lands after the card was loaded...
+        self.task.completed = True
+        self.task.save()
+        before_qc = self.client.get(url)
+        self.assertEqual(before_qc['ETag'], f'"jobcard-{self.jobcard.id}-r{stale.revision + 1}"')
+        # ...then the stale copy is saved with a status change: one more bump, not back to the stale value.
+        stale.status = 'qc'
+        stale.save()
+        self.assertEqual(JobCard.objects.values_list('revision', flat=True).get(pk=self.jobcard.pk), stale.revision + 2)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=before_qc['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'qc')
+
+    def test_if_modified_since(self):
+        url = f'/api/jobcards/{self.jobcard.id}/'
+        first = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_parts_catalog_revision(self):
+        first = self.client.get('/api/parts/')
+        self.assertEqual(self.revalidate('/api/parts/', first, queries=1).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post(f'/api/jobcards/{self.jobcard.id}/issue-part/', {'part_id': self.part.id, 'quantity_used': 2})
+            # The catalog revision is only bumped once the issue commits.
+            self.assertEqual(self.client.get('/api/parts/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertTrue(callbacks)
+        response = self.client.get('/api/parts/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['stock_quantity'], 8)
+
+    def test_reports_change_when_an_invoice_is_recorded(self):
+        first = self.client.get('/api/reports/')
+        self.assertEqual(self.revalidate('/api/reports/', first, queries=1).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/jobcards/{self.jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get('/api/reports/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+class PartsCatalogTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard()
+        self.plug = Part.objects.create(name='spark plug', stock_quantity=10, unit_price='150.00')
+        self.chain = Part.objects.create(name='Chain Set', stock_quantity=4, unit_price='900.00')
+        parts_catalog.invalidate()
+
+    def names_and_stock(self):
+        return [(row['name'], row['stock_quantity']) for row in self.client.get('/api/parts/').json()]
+
+    def test_list_is_served_from_memory_once_loaded(self):
+        self.assertEqual(self.names_and_stock(), [('Chain Set', 4), ('spark plug', 10)])
+        with self.assertNumQueries(1):  # the revision stamp only
+            self.client.get('/api/parts/')
+
+    def test_stock_decrements_and_edits_are_written_through(self):
+        self.names_and_stock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/jobcards/{self.jobcard.id}/issue-part/', {'part_id': self.plug.id, 'quantity_used': 3})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/parts/{self.chain.id}/', {'name': 'Xtreme Chain'}, content_type='application/json')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names_and_stock(), [('spark plug', 7), ('Xtreme Chain', 4)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/parts/{self.chain.id}/')
+        self.assertEqual(self.names_and_stock(), [('spark plug', 7)])
+
+    def test_bumps_landing_out_of_order_keep_the_latest_stock(self):
+        self.names_and_stock()
+        issue = {'part_id': self.plug.id, 'quantity_used': 2}
+        with self.captureOnCommitCallbacks() as first:
+            self.client.post(f'/api/jobcards/{self.jobcard.id}/issue-part/', issue)
+        with self.captureOnCommitCallbacks() as second:
+            self.client.post(f'/api/jobcards/{self.jobcard.id}/issue-part/', issue)
+        # Both committed in order, but the second one's bump runs first.
+        for callback in second + first:
+            callback()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names_and_stock(), [('Chain Set', 4), ('spark plug', 6)])
+
+    def test_change_from_another_worker_forces_a_reload(self):
+        self.names_and_stock()
+        # Another process updated stock: the revision moved without this copy seeing the change.
+        Part.objects.filter(pk=self.chain.pk).update(stock_quantity=1)
+        bump(PARTS_CATALOG)
+        self.assertEqual(self.names_and_stock(), [('Chain Set', 1), ('spark plug', 10)])
+
+
+class EarningsLedgerTests(TestCase):
+    def setUp(self):
+        self.first = make_jobcard()
+        self.mechanic = self.first.assigned_mechanic
+        self.jobcards = [self.first] + [
+            JobCard.objects.create(customer=self.first.customer, vehicle=self.first.vehicle, assigned_mechanic=self.mechanic)
+            for _ in range(2)
+        ]
+
+    def invoice(self, jobcard, labor_charge):
+        response = self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': labor_charge})
+        self.assertEqual(response.status_code, 201)
+
+    def my_jobs(self, **params):
+        response = self.client.get('/api/my-jobs/', {'mechanic_id': self.mechanic.id, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_invoices_append_running_totals(self):
+        self.invoice(self.jobcards[0], '100.00')
+        self.invoice(self.jobcards[1], '250.00')
+        totals = list(EarningsEntry.objects.order_by('id').values_list('amount', 'running_total'))
+        self.assertEqual(totals, [(Decimal('70.00'), Decimal('70.00')), (Decimal('175.00'), Decimal('245.00'))])
+        self.assertEqual(Decimal(self.my_jobs()['earnings']), Decimal('245.00'))
+
+    def test_period_earnings_exclude_older_entries(self):
+        self.invoice(self.jobcards[0], '100.00')
+        EarningsEntry.objects.update(day=timezone.localdate() - timedelta(days=10))
+        self.invoice(self.jobcards[1], '200.00')
+        self.assertEqual(Decimal(self.my_jobs(period='today')['earnings']), Decimal('140.00'))
+        self.assertEqual(Decimal(self.my_jobs(period='month')['earnings']), Decimal('210.00'))
+        with self.assertNumQueries(4):  # mechanic check, jobs page, two ledger rows
+            self.my_jobs(period='week')
+
+    def test_jobs_are_paginated(self):
+        page = self.my_jobs(page_size=2)
+        self.assertEqual(len(page['jobs']), 2)
+        rest = self.client.get(page['next']).json()
+        self.assertEqual([job['id'] for job in page['jobs'] + rest['jobs']], [card.id for card in reversed(self.jobcards)])
+        self.assertIsNone(rest['next'])
+
+
+@skipUnless(np is not None, "Parts forecasting needs NumPy.")
+@override_settings(
+    PARTS_FORECAST_HISTORY_DAYS=10, PARTS_FORECAST_WINDOW_DAYS=5, PARTS_FORECAST_SMOOTHING=0.5,
+    PARTS_REORDER_LEAD_DAYS=7, PARTS_REORDER_COVER_DAYS=10,
+)
+class PartsForecastTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard()
+        self.pads = Part.objects.create(name='Brake Pad', stock_quantity=12, unit_price='250.00')
+        self.oil = Part.objects.create(name='Engine Oil', stock_quantity=500, unit_price='400.00')
+        self.horn = Part.objects.create(name='Horn', stock_quantity=3, unit_price='150.00')
+        # Brake pads: 2 a day for the last 4 days; engine oil: 5, nine days ago.
+        customer, vehicle = self.jobcard.customer, self.jobcard.vehicle
+        for days_ago, part, quantity in [(3, self.pads, 2), (2, self.pads, 2), (1, self.pads, 2), (9, self.oil, 5)]:
+            jobcard = JobCard.objects.create(customer=customer, vehicle=vehicle)
+            JobCard.objects.filter(id=jobcard.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+            PartUsage.objects.create(jobcard=jobcard, part=part, quantity_used=quantity, price_at_time_of_use='1.00')
+        self.client.post(f'/api/jobcards/{self.jobcard.id}/issue-part/', {'part_id': self.pads.id, 'quantity_used': 2})
+        parts_forecast.invalidate()
+
+    def smoothed(self, series, alpha=0.5):
+        level = series[0]
+        for value in series[1:]:
+            level = alpha * value + (1 - alpha) * level
+        return level
+
+    def test_smoothing_weights_match_the_recurrence(self):
+        series = [0, 3, 0, 1, 4, 2]
+        self.assertAlmostEqual(float(np.dot(series, smoothing_weights(len(series), 0.3))), self.smoothed(series, 0.3))
+
+    def test_forecast_for_every_part(self):
+        forecast = self.client.get('/api/parts/forecast/').json()
+        rows = {row['name']: row for row in forecast['parts']}
+        self.assertEqual([row['name'] for row in forecast['parts']], ['Brake Pad', 'Engine Oil', 'Horn'])
+
+        pads = rows['Brake Pad']
+        demand = self.smoothed([0] * 6 + [2, 2, 2, 2])
+        self.assertEqual(pads['stock_quantity'], 10)
+        self.assertEqual(pads['used_in_history'], 8)
+        self.assertEqual(pads['moving_average'], 1.6)
+        self.assertAlmostEqual(pads['daily_demand'], round(demand, 2))
+        self.assertAlmostEqual(pads['days_of_cover'], round(10 / demand, 1))
+        self.assertTrue(pads['reorder'])
+        self.assertEqual(pads['suggested_order_quantity'], int(np.ceil(demand * 17)) - 10)
+
+        self.assertFalse(rows['Engine Oil']['reorder'])
+        self.assertEqual(rows['Horn']['days_of_cover'], None)
+        self.assertEqual(rows['Horn']['suggested_order_quantity'], 0)
+        reorder = self.client.get('/api/parts/forecast/', {'reorder': '1'}).json()['parts']
+        self.assertEqual([row['name'] for row in reorder], ['Brake Pad'])
+
+    def test_usage_of_parts_missing_from_the_list_is_dropped(self):
+        # As if the parts were read before pads were issued on a part created in between.
+        start_day = timezone.localdate() - timedelta(days=9)
+        newer = Part.objects.create(name='Clutch Plate', stock_quantity=4, unit_price='300.00')
+        PartUsage.objects.create(jobcard=self.jobcard, part=newer, quantity_used=1, price_at_time_of_use='1.00')
+        usage = usage_matrix(np.array([self.oil.id, self.horn.id], dtype=np.int64), start_day, 10)
+        self.assertEqual(usage.shape, (2, 10))
+        self.assertEqual(usage.sum(axis=1).tolist(), [5.0, 0.0])
+        self.assertEqual(usage_matrix(np.array([], dtype=np.int64), start_day, 10).shape, (0, 10))
+
+    def test_cached_until_parts_are_issued(self):
+        first = self.client.get('/api/parts/forecast/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/parts/forecast/', {'reorder': '1'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/parts/forecast/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/jobcards/{self.jobcard.id}/issue-part/', {'part_id': self.horn.id, 'quantity_used': 1})
+        response = self.client.get('/api/parts/forecast/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        horn = next(row for row in response.json()['parts'] if row['name'] == 'Horn')
+        self.assertEqual((horn['stock_quantity'], horn['used_in_history']), (2, 1))
+
+        output = io.StringIO()
+        call_command('forecast_parts', reorder_only=True, stdout=output)
+        self.assertIn('Brake Pad', output.getvalue())
+        self.assertNotIn('Engine Oil', output.getvalue())
+
+
+class SerializationFastPathTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard(status='done')
+        JobCard.objects.create(customer=self.jobcard.customer, vehicle=self.jobcard.vehicle)  # no mechanic
+        Customer.objects.filter(id=self.jobcard.customer_id).update(email='ravi@example.com')
+        Invoice.objects.create(
+            jobcard=self.jobcard, labor_charge='300.00', parts_total='150.50', tax='54.06',
+            discount='0.00', total_amount='504.56',
+        )
+
+    def test_job_lists_match_the_serializer(self):
+        expected = JobCardListSerializer(JobCard.objects.order_by('-created_at', '-id'), many=True).data
+        with timezone.override('Asia/Kolkata'):
+            local = JobCardListSerializer(JobCard.objects.order_by('-created_at', '-id'), many=True).data
+            rows = JobCard.objects.order_by('-created_at', '-id').values_list(*JOBCARD_LIST_COLUMNS)
+            self.assertEqual(jobcard_list_rows(rows), local)
+        self.assertEqual(self.client.get('/api/jobcards/?status=all').json()['results'], json.loads(json.dumps(expected)))
+        jobs = self.client.get('/api/my-jobs/', {'mechanic_id': self.jobcard.assigned_mechanic_id}).json()['jobs']
+        self.assertEqual(jobs, json.loads(json.dumps(expected[1:])))
+
+    def test_invoice_export_matches_the_serializer(self):
+        expected = InvoiceExportSerializer(Invoice.objects.all(), many=True).data
+        self.assertEqual(self.client.get('/api/invoices/export/?period=today').json(), json.loads(json.dumps(expected)))
+
+
+class ArchiveTierTests(TestCase):
+    def setUp(self):
+        self.old = make_jobcard(status='done')
+        customer, vehicle, mechanic = self.old.customer, self.old.vehicle, self.old.assigned_mechanic
+        self.old_open = JobCard.objects.create(customer=customer, vehicle=vehicle, assigned_mechanic=mechanic, status='qc')
+        self.older = JobCard.objects.create(customer=customer, vehicle=vehicle, assigned_mechanic=mechanic, status='done')
+        self.recent = JobCard.objects.create(customer=customer, vehicle=vehicle, assigned_mechanic=mechanic, status='done')
+        part = Part.objects.create(name='Brake Pad', stock_quantity=10, unit_price='250.00')
+        for jobcard in (self.old, self.older, self.recent):
+            ServiceTask.objects.create(jobcard=jobcard, description='Brake service', completed=True)
+            self.client.post(f'/api/jobcards/{jobcard.id}/issue-part/', {'part_id': part.id, 'quantity_used': 1})
+            self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        long_ago = timezone.now() - timedelta(days=400)
+        JobCard.objects.exclude(id=self.recent.id).update(created_at=long_ago)
+        Invoice.objects.exclude(jobcard=self.recent).update(created_at=long_ago)
+        rebuild_rollups()
+        report_buckets.invalidate()
+        self.days = day_range(timezone.localdate(long_ago), timezone.localdate())
+        self.report = build_report(*self.days)
+
+    def test_old_done_job_cards_move_with_their_rows(self):
+        call_command('archive_jobcards', batch_size=1, stdout=io.StringIO())
+
+        archived_ids = {self.old.id, self.older.id}
+        self.assertEqual(set(ArchivedJobCard.objects.values_list('id', flat=True)), archived_ids)
+        self.assertEqual(set(JobCard.objects.values_list('id', flat=True)), {self.old_open.id, self.recent.id})
+        self.assertEqual(set(ArchivedInvoice.objects.values_list('jobcard_id', flat=True)), archived_ids)
+        self.assertEqual(ArchivedServiceTask.objects.count(), 2)
+        self.assertEqual(ArchivedPartUsage.objects.count(), 2)
+        self.assertEqual(Invoice.objects.get().jobcard_id, self.recent.id)
+        self.assertEqual(EarningsEntry.objects.filter(archived_invoice__isnull=False, invoice__isnull=True).count(), 2)
+
+        # Rebuilding the rollups from both tiers gives the same report.
+        rebuild_rollups()
+        self.assertEqual(build_report(*self.days), self.report)
+
+        export = self.client.get('/api/invoices/export/', {'from': '2000-01-01'}).json()
+        self.assertEqual(len(export), 3)
+        self.assertEqual([row['id'] for row in export], sorted(row['id'] for row in export))
+        csv_rows = b''.join(self.client.get('/api/invoices/export/', {'from': '2000-01-01', 'output': 'csv'}).streaming_content)
+        self.assertEqual(len(csv_rows.decode().strip().splitlines()), 4)
+        self.assertEqual(load_invoice_data(jobcard_id=self.old.id)['parts'][0]['name'], 'Brake Pad')
+
+    def test_export_reads_each_tier_by_id_range(self):
+        call_command('archive_jobcards', batch_size=1, stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as captured:
+            rows = list(iter_export_rows(Invoice.objects.all(), ArchivedInvoice.objects.all(), chunk_size=1))
+        ids = [*Invoice.objects.values_list('id', flat=True), *ArchivedInvoice.objects.values_list('id', flat=True)]
+        self.assertEqual([row['id'] for row in rows], sorted(ids))
+        self.assertEqual(len(rows), 3)
+        # One row per batch plus the empty batch ending each tier: 1 + 1 live, 2 + 1 archived.
+        self.assertEqual(len(captured), 5)
+        self.assertFalse(any('UNION' in query['sql'] for query in captured.captured_queries))
+
+    def test_dry_run_only_counts(self):
+        output = io.StringIO()
+        call_command('archive_jobcards', dry_run=True, stdout=output)
+        self.assertIn('2 job card(s)', output.getvalue())
+        self.assertFalse(ArchivedJobCard.objects.exists())
+
+
+class InvoicePDFCacheTests(TestCase):
+    def setUp(self):
+        self.jobcards = [make_jobcard()]
+        self.jobcards += [
+            JobCard.objects.create(customer=self.jobcards[0].customer, vehicle=self.jobcards[0].vehicle) for _ in range(2)
+        ]
+        for jobcard in self.jobcards:
+            self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        overrides = override_settings(INVOICE_PDF_CACHE_DIR=self.directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.url = f'/api/jobcards/{self.jobcards[0].id}/invoice-pdf/'
+
+    def files(self):
+        return sorted(path.name for path in self.directory.iterdir())
+
+    def test_matching_etag_gets_a_304_without_rendering(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(b''.join(first.streaming_content).startswith(b'%PDF'))
+        with mock.patch('api.pdf_cache.get_invoice_renderer') as renderer:
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        renderer.assert_not_called()
+        self.assertEqual(len(self.files()), 1)
+
+    def test_editing_the_invoice_changes_the_fingerprint(self):
+        first = self.client.get(self.url)
+        old_file = self.files()
+        Invoice.objects.filter(jobcard=self.jobcards[0]).update(labor_charge='450.00')
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        # The stale render was replaced, not kept alongside.
+        self.assertEqual(len(self.files()), 1)
+        self.assertNotEqual(self.files(), old_file)
+
+    def test_pdf_is_written_to_a_temporary_file_then_renamed(self):
+        data = load_invoice_data(jobcard_id=self.jobcards[0].id)
+        final = pdf_cache.path_for(data['id'], invoice_fingerprint(data))
+        real_replace = os.replace
+
+        def replace(source, target):
+            # Readers never see the final name before the whole PDF is there.
+            self.assertFalse(Path(target).exists())
+            self.assertTrue(Path(source).read_bytes().startswith(b'%PDF'))
+            return real_replace(source, target)
+
+        with mock.patch('api.pdf_cache.os.replace', side_effect=replace) as replaced:
+            path, _ = pdf_cache.get_or_render(data)
+        replaced.assert_called_once()
+        self.assertEqual(path, final)
+        self.assertEqual(self.files(), [final.name])
+
+    def test_least_recently_used_files_are_evicted(self):
+        invoices = [load_invoice_data(jobcard_id=jobcard.id) for jobcard in self.jobcards]
+        paths = [pdf_cache.get_or_render(data)[0] for data in invoices]
+        for age, path in enumerate(paths):
+            stamp = time.time() - 100 * (len(paths) - age)
+            os.utime(path, (stamp, stamp))
+        # Reading the oldest file makes it the most recently used.
+        pdf_cache.lookup(invoices[0])
+        limited = InvoicePDFCache(directory=self.directory, max_bytes=paths[0].stat().st_size + paths[2].stat().st_size)
+        limited.evict()
+        self.assertEqual(self.files(), sorted([paths[0].name, paths[2].name]))
+
+
+    def test_misses_scan_the_directory_only_when_over_budget(self):
+        invoices = [load_invoice_data(jobcard_id=jobcard.id) for jobcard in self.jobcards]
+        size = len(get_invoice_renderer().render(invoices[0]))
+        cache = InvoicePDFCache(directory=self.directory, max_bytes=int(size * 2.5))
+        with mock.patch.object(InvoicePDFCache, '_scan', autospec=True, side_effect=InvoicePDFCache._scan) as scan:
+            paths = [cache.get_or_render(data)[0] for data in invoices[:2]]
+            self.assertEqual(scan.call_count, 1)  # the first write reads the directory once
+            for age, path in enumerate(paths):
+                stamp = time.time() - 100 * (len(paths) - age)
+                os.utime(path, (stamp, stamp))
+            # The third file passes the budget: a rescan, then LRU eviction down to 90% of it.
+            paths.append(cache.get_or_render(invoices[2])[0])
+            self.assertEqual(scan.call_count, 2)
+        self.assertEqual(self.files(), sorted(path.name for path in paths[1:]))
+
+    def test_file_evicted_before_it_is_opened_is_rendered_again(self):
+        real_get_or_render = pdf_cache.get_or_render
+        calls = []
+
+        def evicted_in_between(data):
+            path, fingerprint = real_get_or_render(data)
+            if not calls:
+                path.unlink()
+            calls.append(path)
+            return path, fingerprint
+
+        with mock.patch.object(pdf_cache, 'get_or_render', side_effect=evicted_in_between):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(len(calls), 2)
+
+
+class InvoiceExportTests(TestCase):
+    def setUp(self):
+        first = make_jobcard(status='done')
+        for jobcard in [first] + [
+            JobCard.objects.create(customer=first.customer, vehicle=first.vehicle, status='done') for _ in range(2)
+        ]:
+            self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        self.invoice_ids = sorted(Invoice.objects.values_list('id', flat=True))
+
+    @override_settings(INVOICE_EXPORT_WORKERS=2, INVOICE_EXPORT_BATCH_SIZE=1)
+    def test_zip_is_rendered_in_the_shared_pool(self):
+        self.addCleanup(lambda: _discard_render_pool(render_pool()))
+        for _ in range(2):
+            response = self.client.get('/api/invoices/export/', {'from': '2000-01-01', 'output': 'zip'})
+            self.assertEqual(response['Content-Type'], 'application/zip')
+            with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+                self.assertEqual(sorted(archive.namelist()), sorted(f'invoice-{pk}.pdf' for pk in self.invoice_ids))
+                self.assertTrue(all(archive.read(name).startswith(b'%PDF') for name in archive.namelist()))
+        # Both exports used the one pool, of spawned (not forked) workers.
+        pool = render_pool()
+        self.assertIs(render_pool(), pool)
+        self.assertEqual(pool._mp_context.get_start_method(), 'spawn')
+
+    def test_combined_pdf_is_only_built_by_a_background_job(self):
+        params = {'from': '2000-01-01', 'output': 'pdf'}
+        response = self.client.get('/api/invoices/export/', params)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(BACKGROUND_JOBS=True, BACKGROUND_RESULTS_DIR=Path(directory.name)):
+            job = self.client.get('/api/invoices/export/', params).json()
+            call_command('run_background_worker', workers=0, once=True, stdout=io.StringIO())
+            download = self.client.get(f"/api/background-jobs/{job['id']}/download/")
+            pdf = b''.join(download.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(len(re.findall(rb'/Type /Page[^s]', pdf)), len(self.invoice_ids))
+
+
+class BackgroundJobTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard(status='done')
+        self.client.post(f'/api/jobcards/{self.jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        self.invoice = Invoice.objects.get()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.results_dir = Path(directory.name) / 'results'
+        overrides = override_settings(
+            BACKGROUND_JOBS=True, BACKGROUND_RESULTS_DIR=self.results_dir,
+            INVOICE_PDF_CACHE_DIR=Path(directory.name) / 'pdfs',
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def run_worker(self):
+        call_command('run_background_worker', workers=0, once=True, stdout=io.StringIO())
+
+    def test_uncached_pdf_is_rendered_by_a_job(self):
+        url = f'/api/jobcards/{self.jobcard.id}/invoice-pdf/'
+        queued = self.client.get(url)
+        self.assertEqual(queued.status_code, 202)
+        job = queued.json()
+        self.assertEqual((job['kind'], job['status'], job['download_url']), ('invoice_pdf', 'queued', None))
+        self.assertEqual(queued['Location'], job['status_url'])
+        # Asking again joins the queued job.
+        self.assertEqual(self.client.get(url).json()['id'], job['id'])
+        self.assertEqual(self.client.get(f"/api/background-jobs/{job['id']}/download/").status_code, 409)
+
+        self.run_worker()
+        done = self.client.get(job['status_url']).json()
+        self.assertEqual(done['status'], 'done')
+        download = self.client.get(done['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+        # Now cached, so served directly.
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_exports_run_as_jobs(self):
+        params = {'from': '2000-01-01', 'output': 'zip'}
+        job = self.client.get('/api/invoices/export/', params).json()
+        self.assertEqual(self.client.get('/api/invoices/export/', {**params, 'output': 'csv'}).status_code, 200)
+        csv_job = self.client.get('/api/invoices/export/', {**params, 'output': 'csv', 'async': '1'}).json()
+        self.run_worker()
+
+        download = self.client.get(f"/api/background-jobs/{job['id']}/download/")
+        self.assertIn('invoices-2000-01-01-to-now.zip', download['Content-Disposition'])
+        with zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), [f'invoice-{self.invoice.id}.pdf'])
+        rows = b''.join(self.client.get(f"/api/background-jobs/{csv_job['id']}/download/").streaming_content)
+        self.assertEqual(len(rows.decode().strip().splitlines()), 2)
+
+    def test_failures_and_lost_jobs(self):
+        other = JobCard.objects.create(customer=self.jobcard.customer, vehicle=self.jobcard.vehicle)
+        failing = enqueue('invoice_pdf', jobcard_id=other.id)
+        with self.assertLogs('api.background', 'ERROR'):
+            self.run_worker()
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.error), ('failed', "Invoice not found for this job card."))
+
+        lost = enqueue('invoice_pdf', jobcard_id=self.jobcard.id)
+        self.assertEqual(claim_next(), lost.id)
+        self.assertIsNone(claim_next())
+        long_ago = timezone.now() - timedelta(hours=1)
+        BackgroundJob.objects.filter(id=lost.id).update(started_at=long_ago)
+        self.assertEqual(requeue_stale(), (1, 0))
+        BackgroundJob.objects.filter(id=lost.id).update(status='running', started_at=long_ago, attempts=3)
+        self.assertEqual(requeue_stale(), (0, 1))
+
+    def test_expired_results_are_purged(self):
+        job = self.client.get('/api/invoices/export/', {'from': '2000-01-01', 'output': 'pdf'}).json()
+        self.run_worker()
+        result = Path(BackgroundJob.objects.get(id=job['id']).result_path)
+        self.assertTrue(result.exists())
+        BackgroundJob.objects.update(finished_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(purge_expired(), 1)
+        self.assertFalse(result.exists())
+
+
+class ReportRangeTests(TestCase):
+    def setUp(self):
+        report_buckets.invalidate()
+        self.part = Part.objects.create(name='Brake Pad', stock_quantity=50, unit_price='250.00')
+        self.today = timezone.localdate()
+        self.month_start = self.today.replace(day=1)
+        # Invoices at 10:00 on the first of last month, 40 and 3 days ago, and now.
+        previous_month = (self.month_start - timedelta(days=1)).replace(day=1)
+        self.days_ago = [(self.today - previous_month).days, 40, 3, 0]
+        for days_ago in self.days_ago:
+            jobcard = make_jobcard(status='done') if days_ago == self.days_ago[0] else JobCard.objects.create(
+                customer=Customer.objects.first(), vehicle=Vehicle.objects.first(), assigned_mechanic=User.objects.first(),
+            )
+            self.client.post(f'/api/jobcards/{jobcard.id}/issue-part/', {'part_id': self.part.id, 'quantity_used': 1})
+            self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '100.00'})
+            if days_ago:
+                created_at = start_of_day(self.today - timedelta(days=days_ago)) + timedelta(hours=10)
+                Invoice.objects.filter(jobcard=jobcard).update(created_at=created_at)
+        rebuild_rollups()
+
+    def report(self, **params):
+        response = self.client.get('/api/reports/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_granularities_agree(self):
+        params = {'from': (self.today - timedelta(days=self.days_ago[0])).isoformat(), 'to': self.today.isoformat()}
+        reports = {granularity: self.report(granularity=granularity, **params) for granularity in ('hour', 'day', 'week', 'month')}
+        for report in reports.values():
+            self.assertEqual(report['operational_kpis']['jobs_completed'], 4)
+            self.assertEqual(report['financial_kpis'], reports['day']['financial_kpis'])
+            self.assertEqual(report['most_used_parts'], [{'part__name': 'Brake Pad', 'total_quantity': 4}])
+            self.assertEqual(report['operational_kpis']['mechanic_performance'], [
+                {'assigned_mechanic__full_name': 'Mech One', 'count': 4},
+            ])
+        self.assertEqual(len(reports['day']['revenue_over_time']), len({*self.days_ago}))
+        hours = [row['date'] for row in reports['hour']['revenue_over_time']]
+        self.assertTrue(hours[0].endswith('T10:00:00Z'))
+        months = [row['date'] for row in reports['month']['revenue_over_time']]
+        self.assertEqual(months[-1], self.month_start.isoformat())
+        self.assertEqual(months[0], self.report(granularity='month', **params)['range']['from'][:10])
+        weeks = [row['date'] for row in reports['week']['revenue_over_time']]
+        self.assertTrue(all(timezone.datetime.fromisoformat(week).weekday() == 0 for week in weeks))
+
+    def test_finished_buckets_are_cached(self):
+        first_day = (self.today - timedelta(days=self.days_ago[0])).isoformat()
+        with CaptureQueriesContext(connection) as cold:
+            first = self.report(**{'from': first_day})
+        self.assertTrue(any(first_day in str(query['sql']) for query in cold.captured_queries))
+
+        # Past totals changed behind the rollups' back are not re-read...
+        DailyRevenueRollup.objects.filter(day__lt=self.today).update(total_revenue=0)
+        with CaptureQueriesContext(connection) as warm:
+            second = self.report(**{'from': first_day})
+        self.assertEqual(second['financial_kpis'], first['financial_kpis'])
+        self.assertFalse(any(first_day in str(query['sql']) for query in warm.captured_queries))
+        # ...while today's bucket is live.
+        jobcard = JobCard.objects.create(customer=Customer.objects.first(), vehicle=Vehicle.objects.first())
+        self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '100.00'})
+        self.assertEqual(self.report(**{'from': first_day})['operational_kpis']['jobs_completed'], 5)
+        # Rebuilding the rollups rewrites history, so the cached buckets are dropped.
+        rebuild_rollups()
+        self.assertNotEqual(
+            self.report(**{'from': first_day})['financial_kpis']['total_revenue'], first['financial_kpis']['total_revenue']
+        )
+
+    def test_invalid_ranges(self):
+        for params in [
+            {'granularity': 'minute'}, {'from': 'yesterday'}, {'to': '2026-01-01'},
+            {'from': '2026-02-01', 'to': '2026-01-01'}, {'from': '1900-01-01', 'granularity': 'hour'},
+        ]:
+            response = self.client.get('/api/reports/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_export_reads_periods_like_the_reports(self):
+        week = self.report(period='week')
+        export = self.client.get('/api/invoices/export/', {'period': 'week'}).json()
+        self.assertEqual(len(export), week['operational_kpis']['jobs_completed'])
+
+
+class IncrementalRollupTests(TestCase):
+    def setUp(self):
+        report_buckets.invalidate()
+        self.first = make_jobcard()
+        self.other_mechanic = User.objects.create(
+            username='mech2', full_name='Mech Two', email='mech2@example.com', phone=9822222222, role='mechanic', pin=4321
+        )
+        self.plug = Part.objects.create(name='Spark Plug', stock_quantity=50, unit_price='150.00')
+        self.chain = Part.objects.create(name='Chain Set', stock_quantity=50, unit_price='900.00')
+
+    def new_jobcard(self):
+        return JobCard.objects.create(
+            customer=self.first.customer, vehicle=self.first.vehicle, assigned_mechanic=self.first.assigned_mechanic,
+        )
+
+    def issue(self, jobcard, part, quantity):
+        response = self.client.post(
+            f'/api/jobcards/{jobcard.id}/issue-part/', {'part_id': part.id, 'quantity_used': quantity}
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def invoice(self, jobcard):
+        response = self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def reports(self):
+        report_buckets.invalidate()
+        return {
+            granularity: self.client.get('/api/reports/', {'period': 'today', 'granularity': granularity}).json()
+            for granularity in ('hour', 'day')
+        }
+
+    def rollup_rows(self):
+        return (
+            sorted(DailyMechanicRollup.objects.filter(jobs_completed__gt=0).values_list(
+                'day', 'mechanic_id', 'jobs_completed')),
+            sorted(DailyPartRollup.objects.values_list('day', 'part_id', 'quantity_used', 'parts_revenue')),
+        )
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        # Parts issued before and after the invoice.
+        self.issue(self.first, self.plug, 2)
+        self.invoice(self.first)
+        self.issue(self.first, self.plug, 1)
+        self.issue(self.first, self.chain, 1)
+        # Invoiced, then sent back to quality check: no longer completed.
+        reopened = self.new_jobcard()
+        self.invoice(reopened)
+        response = self.client.patch(
+            f'/api/jobcards/{reopened.id}/update-status/', {'status': 'qc'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        # Invoiced, then handed to another mechanic.
+        reassigned = self.new_jobcard()
+        self.invoice(reassigned)
+        reassigned.refresh_from_db()
+        reassigned.assigned_mechanic = self.other_mechanic
+        reassigned.save()
+
+        incremental, rows = self.reports(), self.rollup_rows()
+        self.assertEqual(incremental['day']['operational_kpis'], {
+            'jobs_completed': 2,
+            'mechanic_performance': [
+                {'assigned_mechanic__full_name': 'Mech One', 'count': 1},
+                {'assigned_mechanic__full_name': 'Mech Two', 'count': 1},
+            ],
+        })
+        self.assertEqual(incremental['day']['most_used_parts'], [
+            {'part__name': 'Spark Plug', 'total_quantity': 3}, {'part__name': 'Chain Set', 'total_quantity': 1},
+        ])
+        self.assertEqual(incremental['hour']['operational_kpis'], incremental['day']['operational_kpis'])
+        self.assertEqual(incremental['hour']['most_used_parts'], incremental['day']['most_used_parts'])
+
+        rebuild_rollups()
+        self.assertEqual(self.reports(), incremental)
+        self.assertEqual(self.rollup_rows(), rows)
+
+
+@skipUnless('replica' in settings.DATABASES, "Needs a second database; see autoServe/test_settings.py.")
+@override_settings(REPLICA_DATABASE='replica', REPLICA_LAG_CHECK_INTERVAL=0)
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        replica_monitor.invalidate()
+        # Rows that only the replica has tell the two databases apart.
+        customer = Customer.objects.using('replica').create(name='Replica Customer', phone=9800000001)
+        vehicle = Vehicle.objects.using('replica').create(
+            customer=customer, make='Honda', model='Shine', registration_no='GJ05CD6789', vehicle_type='bike'
+        )
+        jobcard = JobCard.objects.using('replica').create(customer=customer, vehicle=vehicle, status='done')
+        Invoice.objects.using('replica').create(jobcard=jobcard, labor_charge='999.00', total_amount='999.00')
+        DailyRevenueRollup.objects.using('replica').create(
+            day=timezone.localdate(), invoice_count=1, total_revenue='999.00', total_labor_charge='999.00'
+        )
+
+    def revenue(self, **extra):
+        response = self.client.get('/api/reports/', {'period': 'today'}, **extra)
+        self.assertEqual(response.status_code, 200)
+        return Decimal(str(response.json()['financial_kpis']['total_revenue']))
+
+    def test_reports_and_exports_read_from_the_replica(self):
+        self.assertEqual(self.revenue(), Decimal('999.00'))
+        export = self.client.get('/api/invoices/export/', {'period': 'today'}).json()
+        self.assertEqual([row['customer_name'] for row in export], ['Replica Customer'])
+        csv_body = b''.join(
+            self.client.get('/api/invoices/export/', {'period': 'today', 'output': 'csv'}).streaming_content
+        )
+        self.assertIn(b'Replica Customer', csv_body)
+
+    def test_lagging_or_stopped_replica_falls_back_to_the_primary(self):
+        for lag in (60, None):
+            with mock.patch.object(ReplicaMonitor, 'measure_lag', return_value=lag):
+                replica_monitor.invalidate()
+                self.assertEqual(self.revenue(), Decimal('0'))
+        replica_monitor.invalidate()
+        self.assertEqual(self.revenue(), Decimal('999.00'))
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        jobcard = make_jobcard(status='done')
+        response = self.client.post(f'/api/jobcards/{jobcard.id}/create-invoice/', {'labor_charge': '300.00'})
+        self.assertEqual(response.status_code, 201)
+        # The writer sees its invoice; other clients keep reading the replica.
+        self.assertGreater(self.revenue(), Decimal('300.00') - 1)
+        self.assertNotEqual(self.revenue(), Decimal('999.00'))
+        self.assertEqual(self.revenue(REMOTE_ADDR='10.0.0.2'), Decimal('999.00'))
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            cache.clear()
+            self.assertEqual(self.revenue(), Decimal('999.00'))
+
+    def test_writes_always_go_to_the_primary(self):
+        self.assertIsNone(ReplicaRouter().db_for_write(Invoice))
+        with reads_from('replica'):
+            Part.objects.create(name='Spark Plug', stock_quantity=5, unit_price='150.00')
+        self.assertTrue(Part.objects.using('default').filter(name='Spark Plug').exists())
+        self.assertFalse(Part.objects.using('replica').exists())
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.jobcard = make_jobcard()
+        metrics_registry.reset()
+
+    def sample(self, exposition, name, **labels):
+        value = metric_sample(exposition, name, **labels)
+        self.assertIsNotNone(value, f"{name}{labels} not exposed")
+        return value
+
+    def test_routes_are_recorded_and_exposed(self):
+        url = f'/api/jobcards/{self.jobcard.id}/'
+        self.client.get(url)
+        self.client.get(url)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        text = response.content.decode()
+        route = {'route': 'api/jobcards/<int:pk>/', 'method': 'GET'}
+        self.assertEqual(self.sample(text, 'autoserve_requests_total', **route, status='200'), 2)
+        self.assertEqual(self.sample(text, 'autoserve_request_duration_seconds_count', **route), 2)
+        self.assertGreater(self.sample(text, 'autoserve_db_queries_per_request_sum', **route), 0)
+        self.assertGreater(self.sample(text, 'autoserve_serializer_duration_seconds_sum', **route), 0)
+        self.assertGreater(self.sample(text, 'autoserve_response_size_bytes_sum', **route), 0)
+        self.assertEqual(self.sample(text, 'autoserve_request_duration_seconds_bucket', **route, le='+Inf'), 2)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('api.slow_requests', level='WARNING') as logs:
+            self.client.get(f'/api/jobcards/{self.jobcard.id}/')
+        self.assertIn('api/jobcards/<int:pk>/', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+@skipUnless(connection.vendor == 'sqlite', "seed_workshop only seeds SQLite databases by default.")
+class BenchmarkSuiteTests(TestCase):
+    def test_every_endpoint_is_benchmarked_on_seeded_data(self):
+        call_command(
+            'seed_workshop', customers=30, mechanics=3, parts=20, jobcards=200, days=30, batch_size=80,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(JobCard.objects.count(), 200)
+        self.assertTrue(EarningsEntry.objects.exists())
+        invoices = Invoice.objects.count()
+        enqueue('invoice_pdf', jobcard_id=Invoice.objects.order_by('id').first().jobcard_id)
+        call_command('run_background_worker', workers=0, once=True, stdout=io.StringIO())
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark_endpoints', iterations=2, warmup=0, output=output.name, stderr=io.StringIO())
+            results = json.load(open(output.name))['results']
+            # Comparing a run with itself at a generous threshold finds no regressions.
+            call_command(
+                'benchmark_endpoints', iterations=2, warmup=0, only=['part-list-create'],
+                compare=output.name, threshold=100, stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+
+        serialization = io.StringIO()
+        call_command('benchmark_serialization', rows=50, iterations=1, stdout=serialization, stderr=io.StringIO())
+        self.assertEqual(set(json.loads(serialization.getvalue())['results']), {'jobcard_list', 'invoice_export'})
+
+        self.assertEqual([name for name, result in results.items() if 'skipped' in result], ['live-events'])
+        for name, result in results.items():
+            if 'skipped' not in result:
+                self.assertLess(result['status'], 400, name)
+        # Write requests were rolled back.
+        self.assertEqual(Invoice.objects.count(), invoices)
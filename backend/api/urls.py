@@ -1,19 +1,24 @@
 # urls.py
 from django.urls import path
-from .views import( InvoiceExportAPIView, LoginView, ServiceTaskUpdateAPIView, VehicleFindAPIView,
-    MechanicListAPIView,JobCardListCreateAPIView,JobCardDetailAPIView,
-    PartListCreateAPIView,PartDetailAPIView,IssuePartAPIView,InvoiceCreateAPIView,InvoicePDFView,
-    ReportsAPIView,MyJobsAPIView,JobCardStatusUpdateAPIView, UserProfileView,ChangePinView  )
+from .views import( InvoiceExportAPIView, LoginView, ServiceTaskUpdateAPIView, VehicleFindAPIView,VehicleSearchAPIView,
+    MechanicListAPIView,JobCardListCreateAPIView,JobCardBulkCreateAPIView,JobCardDetailAPIView,
+    PartListCreateAPIView,PartDetailAPIView,IssuePartAPIView,IssuePartsAPIView,InvoiceCreateAPIView,InvoicePDFView,
+    ReportsAPIView,MyJobsAPIView,JobCardStatusUpdateAPIView, UserProfileView,ChangePinView,
+    LiveEventsView, PartsForecastAPIView, BackgroundJobDetailView, BackgroundJobDownloadView  )
 
 urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('vehicles/find/', VehicleFindAPIView.as_view(), name='vehicle-find'),
+    path('vehicles/search/', VehicleSearchAPIView.as_view(), name='vehicle-search'),
     path('users/mechanics/', MechanicListAPIView.as_view(), name='mechanic-list'),
     path('jobcards/', JobCardListCreateAPIView.as_view(), name='jobcard-create'),
+    path('jobcards/bulk/', JobCardBulkCreateAPIView.as_view(), name='jobcard-bulk-create'),
     path('jobcards/<int:pk>/', JobCardDetailAPIView.as_view(), name='jobcard-detail'),
     path('parts/', PartListCreateAPIView.as_view(), name='part-list-create'),
     path('parts/<int:pk>/', PartDetailAPIView.as_view(), name='part-detail'),
+    path('parts/forecast/', PartsForecastAPIView.as_view(), name='parts-forecast'),
     path('jobcards/<int:pk>/issue-part/', IssuePartAPIView.as_view(), name='jobcard-issue-part'),
+    path('jobcards/<int:pk>/issue-parts/', IssuePartsAPIView.as_view(), name='jobcard-issue-parts'),
     path('jobcards/<int:pk>/create-invoice/', InvoiceCreateAPIView.as_view(), name='jobcard-create-invoice'),
     path('jobcards/<int:pk>/invoice-pdf/', InvoicePDFView.as_view(), name='jobcard-invoice-pdf'),
     path('reports/', ReportsAPIView.as_view(), name='reports-data'),
@@ -23,4 +28,7 @@ urlpatterns = [
     path('tasks/<int:pk>/update/', ServiceTaskUpdateAPIView.as_view(), name='task-update'),
      path('users/<int:pk>/', UserProfileView.as_view(), name='user-profile'),
     path('users/<int:pk>/change-pin/', ChangePinView.as_view(), name='change-pin'),
+    path('events/', LiveEventsView.as_view(), name='live-events'),
+    path('background-jobs/<int:pk>/', BackgroundJobDetailView.as_view(), name='background-job-detail'),
+    path('background-jobs/<int:pk>/download/', BackgroundJobDownloadView.as_view(), name='background-job-download'),
 ]
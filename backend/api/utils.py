@@ -1,135 +1,289 @@
 import io
-from django.http import HttpResponse
+import threading
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 
-def generate_invoice_pdf(invoice):
+from .models import ArchivedInvoice, Invoice
+
+# Every value printed on an invoice, fetched in one query by load_invoice_data().
+# Rows are joined LEFT OUTER to the parts used, so an invoice with three
+# parts comes back as three rows that share the invoice columns.
+INVOICE_FIELDS = [
+    'id', 'created_at', 'labor_charge', 'parts_total', 'tax', 'discount', 'total_amount',
+    'jobcard_id',
+    'jobcard__customer__name', 'jobcard__customer__phone',
+    'jobcard__vehicle__make', 'jobcard__vehicle__model', 'jobcard__vehicle__registration_no',
+]
+PART_FIELDS = [
+    'jobcard__parts_used__id',
+    'jobcard__parts_used__part__name',
+    'jobcard__parts_used__quantity_used',
+    'jobcard__parts_used__price_at_time_of_use',
+]
+
+
+def _invoice_data_from_rows(rows):
+    """Folds the joined value rows of one invoice into a plain dict."""
+    first = rows[0]
+    data = {field: first[field] for field in INVOICE_FIELDS}
+    data['parts'] = [
+        {
+            'name': row['jobcard__parts_used__part__name'],
+            'quantity_used': row['jobcard__parts_used__quantity_used'],
+            'price_at_time_of_use': row['jobcard__parts_used__price_at_time_of_use'],
+        }
+        for row in sorted(rows, key=lambda row: row['jobcard__parts_used__id'] or 0)
+        if row['jobcard__parts_used__id'] is not None
+    ]
+    return data
+
+
+def load_invoices_data(queryset):
     """
-    Generates a professional PDF for a given invoice object.
+    Loads the render data for every invoice in `queryset` with a single
+    query. Returns a list of dicts ordered by invoice id.
+    """
+    grouped = {}
+    for row in queryset.values(*INVOICE_FIELDS, *PART_FIELDS).order_by('id'):
+        grouped.setdefault(row['id'], []).append(row)
+    return [_invoice_data_from_rows(rows) for rows in grouped.values()]
+
+
+def load_invoices_by_id(invoice_ids):
+    """Render data for the given invoice ids, live or archived, ordered by id."""
+    invoices = load_invoices_data(Invoice.objects.filter(id__in=invoice_ids))
+    if len(invoices) < len(invoice_ids):
+        invoices.extend(load_invoices_data(ArchivedInvoice.objects.filter(id__in=invoice_ids)))
+        invoices.sort(key=lambda invoice: invoice['id'])
+    return invoices
+
+
+def load_invoice_data(**filters):
+    """
+    Loads the render data for one invoice, e.g. load_invoice_data(jobcard_id=5),
+    looking in the archive when no live invoice matches.
+    Returns None if no invoice matches.
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=40,
-        leftMargin=40,
-        topMargin=40,
-        bottomMargin=30
+    invoices = (
+        load_invoices_data(Invoice.objects.filter(**filters))
+        or load_invoices_data(ArchivedInvoice.objects.filter(**filters))
     )
+    return invoices[0] if invoices else None
 
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name="CenterTitle", alignment=1, fontSize=16, leading=20, spaceAfter=12, fontName="Helvetica-Bold"))
-    styles.add(ParagraphStyle(name="SubTitle", alignment=1, fontSize=10, spaceAfter=10, fontName="Helvetica-Oblique"))
-    styles.add(ParagraphStyle(name="TableHeader", fontSize=10, fontName="Helvetica-Bold"))
-    styles.add(ParagraphStyle(name="NormalSmall", fontSize=9, leading=12))
-
-    story = []
-
-    # --- 1. Header: Company Name and Title ---
-    story.append(Paragraph("AutoServe360", styles["CenterTitle"]))
-    story.append(Paragraph("Two-Wheeler Service Pro", styles["SubTitle"]))
-    story.append(Spacer(1, 0.25 * inch))
-    story.append(Paragraph("INVOICE", styles["CenterTitle"]))
-    story.append(Spacer(1, 0.25 * inch))
-
-    # --- 2. Invoice Info and Customer Details Table ---
-    invoice_info_data = [
-        [
-            Paragraph(f"Invoice #: {invoice.id}", styles["NormalSmall"]),
-            Paragraph(f"Customer: {invoice.jobcard.customer.name}", styles["NormalSmall"])
-        ],
-        [
-            Paragraph(f"Date: {invoice.created_at.strftime('%d/%m/%Y')}", styles["NormalSmall"]),
-            Paragraph(f"Phone: {invoice.jobcard.customer.phone}", styles["NormalSmall"])
-        ],
-        [
-            '',
-            Paragraph(f"Vehicle: {invoice.jobcard.vehicle.make} {invoice.jobcard.vehicle.model}", styles["NormalSmall"])
-        ],
-        [
-            '',
-            Paragraph(f"Reg. No: {invoice.jobcard.vehicle.registration_no}", styles["NormalSmall"])
+
+def invoice_data_from_instance(invoice):
+    """Builds the same render data from an already loaded Invoice instance."""
+    jobcard = invoice.jobcard
+    return {
+        'id': invoice.id,
+        'created_at': invoice.created_at,
+        'labor_charge': invoice.labor_charge,
+        'parts_total': invoice.parts_total,
+        'tax': invoice.tax,
+        'discount': invoice.discount,
+        'total_amount': invoice.total_amount,
+        'jobcard_id': jobcard.id,
+        'jobcard__customer__name': jobcard.customer.name,
+        'jobcard__customer__phone': jobcard.customer.phone,
+        'jobcard__vehicle__make': jobcard.vehicle.make,
+        'jobcard__vehicle__model': jobcard.vehicle.model,
+        'jobcard__vehicle__registration_no': jobcard.vehicle.registration_no,
+        'parts': [
+            {
+                'name': usage.part.name,
+                'quantity_used': usage.quantity_used,
+                'price_at_time_of_use': usage.price_at_time_of_use,
+            }
+            for usage in jobcard.parts_used.all()
         ],
-    ]
-    invoice_table = Table(invoice_info_data, colWidths=[2.5 * inch, 4.5 * inch])
-    invoice_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(invoice_table)
-    story.append(Spacer(1, 0.3 * inch))
-
-    # --- 3. Line Items Table (Parts and Labor) ---
-    line_items_data = [
-        [
+    }
+
+
+class InvoiceRenderer:
+    """
+    Renders invoice PDFs.
+    Styles, the static header, table styles and column widths are built once
+    when the renderer is created; render() only builds the per-invoice
+    tables. Each thread gets its own renderer through get_invoice_renderer(),
+    which also lets it reuse one output buffer between renders.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(name="CenterTitle", alignment=1, fontSize=16, leading=20, spaceAfter=12, fontName="Helvetica-Bold"))
+        styles.add(ParagraphStyle(name="SubTitle", alignment=1, fontSize=10, spaceAfter=10, fontName="Helvetica-Oblique"))
+        styles.add(ParagraphStyle(name="TableHeader", fontSize=10, fontName="Helvetica-Bold"))
+        styles.add(ParagraphStyle(name="NormalSmall", fontSize=9, leading=12))
+        self.small = styles["NormalSmall"]
+
+        # --- 1. Header: Company Name and Title ---
+        self.header = [
+            Paragraph("AutoServe360", styles["CenterTitle"]),
+            Paragraph("Two-Wheeler Service Pro", styles["SubTitle"]),
+            Spacer(1, 0.25 * inch),
+            Paragraph("INVOICE", styles["CenterTitle"]),
+            Spacer(1, 0.25 * inch),
+        ]
+        self.section_gap = Spacer(1, 0.3 * inch)
+
+        self.info_col_widths = [2.5 * inch, 4.5 * inch]
+        self.info_style = TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ])
+
+        self.line_items_header = [
             Paragraph("#", styles["TableHeader"]),
             Paragraph("Item Description", styles["TableHeader"]),
             Paragraph("Qty", styles["TableHeader"]),
             Paragraph("Unit Price", styles["TableHeader"]),
             Paragraph("Total", styles["TableHeader"])
         ]
-    ]
+        self.line_items_col_widths = [0.4*inch, 3.5*inch, 0.7*inch, 1.2*inch, 1.2*inch]
+        self.line_items_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#FACC15')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#111827')),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+            ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
+            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ])
+
+        self.totals_col_widths = [5.5 * inch, 1.5 * inch]
+        self.totals_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#FACC15')),
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+            ('LINEBELOW', (0, -1), (-1, -1), 1, colors.black),
+        ])
+        self.grand_total_label = Paragraph("<b>Grand Total:</b>", self.small)
+
+        self._buffer = io.BytesIO()
+
+    def build_story(self, data):
+        small = self.small
+        story = list(self.header)
 
-    # Add parts used
-    parts_used = invoice.jobcard.parts_used.all()
-    for i, usage in enumerate(parts_used):
-        total_price = usage.quantity_used * usage.price_at_time_of_use
+        # --- 2. Invoice Info and Customer Details Table ---
+        invoice_info_data = [
+            [
+                Paragraph(f"Invoice #: {data['id']}", small),
+                Paragraph(f"Customer: {data['jobcard__customer__name']}", small)
+            ],
+            [
+                Paragraph(f"Date: {data['created_at'].strftime('%d/%m/%Y')}", small),
+                Paragraph(f"Phone: {data['jobcard__customer__phone']}", small)
+            ],
+            [
+                '',
+                Paragraph(f"Vehicle: {data['jobcard__vehicle__make']} {data['jobcard__vehicle__model']}", small)
+            ],
+            [
+                '',
+                Paragraph(f"Reg. No: {data['jobcard__vehicle__registration_no']}", small)
+            ],
+        ]
+        invoice_table = Table(invoice_info_data, colWidths=self.info_col_widths)
+        invoice_table.setStyle(self.info_style)
+        story.append(invoice_table)
+        story.append(self.section_gap)
+
+        # --- 3. Line Items Table (Parts and Labor) ---
+        line_items_data = [self.line_items_header]
+
+        # Add parts used
+        parts_used = data['parts']
+        for i, usage in enumerate(parts_used):
+            total_price = usage['quantity_used'] * usage['price_at_time_of_use']
+            line_items_data.append([
+                str(i + 1),
+                usage['name'],
+                str(usage['quantity_used']),
+                f"{usage['price_at_time_of_use']:.2f}",
+                f"{total_price:.2f}"
+            ])
+
+        # Add labor charge
         line_items_data.append([
-            str(i + 1),
-            usage.part.name,
-            str(usage.quantity_used),
-            f"{usage.price_at_time_of_use:.2f}",
-            f"{total_price:.2f}"
+            str(len(parts_used) + 1),
+            "Standard Labor Charge",
+            "1",
+            f"{data['labor_charge']:.2f}",
+            f"{data['labor_charge']:.2f}"
         ])
 
-    # Add labor charge
-    line_items_data.append([
-        str(len(parts_used) + 1),
-        "Standard Labor Charge",
-        "1",
-        f"{invoice.labor_charge:.2f}",
-        f"{invoice.labor_charge:.2f}"
-    ])
-
-    line_items_table = Table(line_items_data, colWidths=[0.4*inch, 3.5*inch, 0.7*inch, 1.2*inch, 1.2*inch])
-    line_items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#FACC15')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#111827')),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-        ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
-        ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    story.append(line_items_table)
-    story.append(Spacer(1, 0.3 * inch))
-
-    # --- 4. Totals Table ---
-    totals_data = [
-        ['Subtotal:', f"{invoice.parts_total + invoice.labor_charge:.2f}"],
-        ['GST (12%):', f"{invoice.tax:.2f}"],
-        ['Discount:', f"{invoice.discount:.2f}"],
-        [Paragraph("<b>Grand Total:</b>", styles['NormalSmall']), Paragraph(f"<b>{invoice.total_amount:.2f}</b>", styles['NormalSmall'])],
-    ]
-    totals_table = Table(totals_data, colWidths=[5.5 * inch, 1.5 * inch])
-    totals_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#FACC15')),
-        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
-        ('LINEBELOW', (0, -1), (-1, -1), 1, colors.black),
-    ]))
-    story.append(totals_table)
-
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+        line_items_table = Table(line_items_data, colWidths=self.line_items_col_widths)
+        line_items_table.setStyle(self.line_items_style)
+        story.append(line_items_table)
+        story.append(self.section_gap)
+
+        # --- 4. Totals Table ---
+        totals_data = [
+            ['Subtotal:', f"{data['parts_total'] + data['labor_charge']:.2f}"],
+            ['GST (12%):', f"{data['tax']:.2f}"],
+            ['Discount:', f"{data['discount']:.2f}"],
+            [self.grand_total_label, Paragraph(f"<b>{data['total_amount']:.2f}</b>", small)],
+        ]
+        totals_table = Table(totals_data, colWidths=self.totals_col_widths)
+        totals_table.setStyle(self.totals_style)
+        story.append(totals_table)
+        return story
+
+    def _build_document(self, output, story):
+        doc = SimpleDocTemplate(
+            output,
+            pagesize=letter,
+            rightMargin=40,
+            leftMargin=40,
+            topMargin=40,
+            bottomMargin=30
+        )
+        doc.build(story)
+
+    def render(self, data):
+        """Renders one invoice's data (see load_invoice_data) and returns the PDF bytes."""
+        buffer = self._buffer
+        buffer.seek(0)
+        buffer.truncate()
+        self._build_document(buffer, self.build_story(data))
+        return buffer.getvalue()
+
+    def render_many(self, invoices, output):
+        """Renders several invoices into one PDF written to `output`, one invoice per page."""
+        story = []
+        for data in invoices:
+            if story:
+                story.append(PageBreak())
+            story.extend(self.build_story(data))
+        self._build_document(output, story)
+
+
+_renderers = threading.local()
+
+
+def get_invoice_renderer():
+    """Returns this thread's InvoiceRenderer, creating it on first use."""
+    renderer = getattr(_renderers, 'renderer', None)
+    if renderer is None:
+        renderer = _renderers.renderer = InvoiceRenderer()
+    return renderer
+
+
+def generate_invoice_pdf(invoice):
+    """
+    Generates a professional PDF for a given invoice object.
+    Accepts an Invoice instance or the render data from load_invoice_data().
+    """
+    data = invoice if isinstance(invoice, dict) else invoice_data_from_instance(invoice)
+    return io.BytesIO(get_invoice_renderer().render(data))
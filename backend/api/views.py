@@ -1,23 +1,55 @@
 # views.py
 from django.utils import timezone
-from datetime import timedelta
-from django.http import HttpResponse
+from django.utils.http import parse_etags
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status,generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.utils.encoders import JSONEncoder
 from django.db import transaction
 from decimal import Decimal 
-from django.db.models import Sum, Count, Avg
-from django.db.models.functions import TruncDate
+from django.db.models import Count, Q
+from django.db.models.functions import Upper
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 import pytz # Import the pytz library for timezone handling
 import time
-
-from .utils import generate_invoice_pdf
-from .models import ServiceTask, User, Vehicle, JobCard, Part, PartUsage,Invoice
+import asyncio
+from asgiref.sync import sync_to_async
+
+from .archive import union_ids
+from .background import EXPORT_FORMATS, encode_filters, enqueue
+from .authentication import issue_token, profile_cache
+from .catalog import parts_catalog
+from .conditional import not_modified, set_validators
+from .earnings import earnings_since, record_earning
+from .events import HEARTBEAT_INTERVAL, format_sse, hub
+from .forecast import np, parts_forecast
+from .fastpath import JOBCARD_LIST_COLUMNS, FastJSONRenderer, invoice_export_rows, jobcard_list_rows
+from .intake import bulk_create_jobcards
+from .metrics import registry as metrics_registry
+from .inventory import IssuePartError, issue_parts
+from .pagination import KeysetPagination
+from .revisions import PARTS_CATALOG, REPORTS, current as current_revision
+from .periods import PERIOD_DAYS, parse_date_param, period_start_day, requested_range
+from .reports import GRANULARITIES, abuild_report, align_range, bucket_start, too_many_buckets
+from .rollups import record_invoice
+from .routing import ReplicaReadsMixin, keep_routing
+from .search import vehicle_index
+from .pdf_cache import pdf_cache
+from .pdf_export import stream_invoice_zip
+from .streaming_export import stream_csv, stream_ndjson
+from .utils import load_invoice_data
+from .workload import mechanics_with_workload, workload_cache, workload_cache_enabled
+from .models import ArchivedInvoice, BackgroundJob, ServiceTask, User, Vehicle, JobCard, Part,Invoice
 from .serializers import( ChangePinSerializer, JobCardStatusUpdateSerializer, LoginSerializer, ServiceTaskUpdateSerializer, UserResponseSerializer,VehicleSerializer, MechanicSerializer, JobCardCreateSerializer,
-                         JobCardListSerializer,IssuePartActionSerializer, JobCardDetailSerializer, PartSerializer,  PartUsageSerializer,InvoiceCreateSerializer,InvoiceDetailSerializer,InvoiceExportSerializer )
+                         JobCardListSerializer,IssuePartActionSerializer, IssuePartsSerializer, JobCardDetailSerializer, PartSerializer,  PartUsageSerializer,InvoiceCreateSerializer,InvoiceDetailSerializer,
+                         BackgroundJobSerializer )
 
 class LoginView(APIView):
     def post(self, request):
@@ -28,6 +60,10 @@ class LoginView(APIView):
         try:
             user = User.objects.get(username=username, pin=pin)
             user_data = UserResponseSerializer(user).data
+            # Later requests send this as "Authorization: Bearer <token>".
+            user_data['token'] = issue_token(user)
+            profile_cache.remember(user)
+            user_data['expires_in'] = settings.API_TOKEN_TTL
             return Response(user_data, status=status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -47,7 +83,10 @@ class VehicleFindAPIView(APIView):
             )
         
         try:
-            vehicle = Vehicle.objects.select_related('customer').get(registration_no__iexact=reg_no)
+            # Matching on UPPER(registration_no) lets the lookup use vehicle_reg_upper_idx.
+            vehicle = Vehicle.objects.select_related('customer').alias(
+                reg_upper=Upper('registration_no')
+            ).get(reg_upper=reg_no.strip().upper())
             serializer = VehicleSerializer(vehicle)
             return Response(serializer.data)
         except Vehicle.DoesNotExist:
@@ -56,17 +95,79 @@ class VehicleFindAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+class VehicleSearchAPIView(APIView):
+    """
+    Type-ahead search for the intake desk.
+    Expects a GET request like: /api/vehicles/search/?q=AB12&limit=10
+    Matches the start or any part of a registration or phone number, or the
+    start of words in the owner's name, from an in-memory index; when nothing
+    matches, registrations and names one typo away.
+    """
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < 2:
+            return Response(
+                {"error": "Type at least 2 characters to search."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(vehicle_index.search(query, limit=limit))
+
+
 # API endpoint to list all users with the 'mechanic' role
 class MechanicListAPIView(generics.ListAPIView):
     """
-    Returns a list of all mechanics along with their pending job counts.
+    Returns a list of all mechanics along with their pending job counts,
+    in total and per status (queue/service/parts/qc).
+    The counts come from one aggregated query, or from the in-process
+    workload cache when MECHANIC_WORKLOAD_CACHE is enabled.
     """
-    queryset = User.objects.filter(role='mechanic')
     serializer_class = MechanicSerializer
 
+    def get_queryset(self):
+        return mechanics_with_workload()
+
+    def list(self, request, *args, **kwargs):
+        if workload_cache_enabled():
+            return Response(workload_cache.snapshot())
+        return super().list(request, *args, **kwargs)
+
 
 class JobCardListCreateAPIView(generics.ListCreateAPIView):
-    queryset = JobCard.objects.select_related('customer', 'vehicle', 'assigned_mechanic').all()
+    """
+    GET lists job cards newest first, keyset-paginated on (created_at, id).
+    Optional filters (all applied in the database):
+      - status: 'open' (default, everything except 'done'), 'all',
+        or a comma-separated list such as 'queue,qc'
+      - mechanic: assigned mechanic id
+      - created_after / created_before: ISO date or datetime; created_before
+        is exclusive, except that a plain date includes that whole day
+      - registration_no: exact vehicle registration, case-insensitive
+      - search: part of the customer name or registration, or a job card id
+      - counts: '1' adds {"counts": {status: n, ..., "all": n}} to the first
+        page, for the other filters (status itself ignored)
+    POST creates a new job card.
+    """
+    queryset = JobCard.objects.all()
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return filter_jobcards(queryset, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        # Plain value rows instead of per-row serializers (see fastpath.py).
+        rows = self.paginate_queryset(self.get_queryset().values_list(*JOBCARD_LIST_COLUMNS, named=True))
+        response = self.get_paginated_response(jobcard_list_rows(rows))
+        if request.query_params.get('counts') == '1' and not request.query_params.get('cursor'):
+            response.data['counts'] = jobcard_status_counts(super().get_queryset(), request.query_params)
+        return response
 
     def get_serializer_class(self):
         """
@@ -78,6 +179,84 @@ class JobCardListCreateAPIView(generics.ListCreateAPIView):
             return JobCardCreateSerializer
         return JobCardListSerializer
 
+def filter_jobcards(queryset, params):
+    """Applies the job board's status/mechanic/date/registration/search filters."""
+    status_param = params.get('status', 'open')
+    if status_param == 'open':
+        queryset = queryset.exclude(status='done')
+    elif status_param != 'all':
+        statuses = [code.strip() for code in status_param.split(',') if code.strip()]
+        valid = {code for code, _ in JobCard.STATUS_CHOICES}
+        unknown = [code for code in statuses if code not in valid]
+        if unknown:
+            raise ValidationError({'status': f"Unknown status: {', '.join(unknown)}."})
+        queryset = queryset.filter(status__in=statuses)
+
+    mechanic = params.get('mechanic')
+    if mechanic:
+        if not mechanic.isdigit():
+            raise ValidationError({'mechanic': 'Expected a mechanic id.'})
+        queryset = queryset.filter(assigned_mechanic_id=int(mechanic))
+
+    created_after = parse_date_param(params, 'created_after')
+    if created_after is not None:
+        queryset = queryset.filter(created_at__gte=created_after)
+    created_before = parse_date_param(params, 'created_before', end_of_day=True)
+    if created_before is not None:
+        queryset = queryset.filter(created_at__lt=created_before)
+
+    registration_no = params.get('registration_no')
+    if registration_no:
+        queryset = queryset.alias(reg_upper=Upper('vehicle__registration_no')).filter(
+            reg_upper=registration_no.strip().upper()
+        )
+
+    search = params.get('search', '').strip()
+    if search:
+        matches = Q(customer__name__icontains=search) | Q(vehicle__registration_no__icontains=search)
+        if search.isdigit():
+            matches |= Q(id=int(search))
+        queryset = queryset.filter(matches)
+    return queryset
+
+
+def jobcard_status_counts(queryset, params):
+    """
+    Job cards per status under every filter but status itself, with the
+    total as "all": one GROUP BY, so the board's counts cover all pages.
+    """
+    params = params.copy()
+    params['status'] = 'all'
+    rows = filter_jobcards(queryset, params).order_by().values_list('status').annotate(total=Count('id'))
+    counts = {code: 0 for code, _ in JobCard.STATUS_CHOICES}
+    counts.update(rows)
+    counts['all'] = sum(counts.values())
+    return counts
+
+
+class JobCardBulkCreateAPIView(APIView):
+    """
+    Creates many job cards in one request (service camps, fleet drop-offs).
+    Expects a JSON list of job card payloads, each shaped like a POST to
+    /api/jobcards/. Items that fail validation are reported by index and
+    skipped; the rest are created.
+    Responds with {"created": [{"index", "id"}], "errors": [{"index", "errors"}]}.
+    """
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {"error": "Expected a non-empty list of job cards."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            created, errors = bulk_create_jobcards(request.data)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        response_status = status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'errors': errors}, status=response_status)
+
 class JobCardDetailAPIView(generics.RetrieveAPIView):
     serializer_class = JobCardDetailSerializer
 
@@ -96,6 +275,16 @@ class JobCardDetailAPIView(generics.RetrieveAPIView):
             'invoice' # Also pre-fetch the invoice if it exists
         ).all()
 
+    def get(self, request, *args, **kwargs):
+        # The revision stamp is one indexed lookup; a tablet holding the
+        # current copy gets a 304 before any prefetching or serializing.
+        stamp = get_object_or_404(JobCard.objects.values('revision', 'updated_at'), pk=kwargs['pk'])
+        etag = f'"jobcard-{kwargs["pk"]}-r{stamp["revision"]}"'
+        cached = not_modified(request, etag, stamp['updated_at'])
+        if cached is not None:
+            return cached
+        return set_validators(super().get(request, *args, **kwargs), etag, stamp['updated_at'])
+
 # --- NEW: API Views for managing Parts inventory ---
 
 # Handles GET (list) and POST (create) for Parts
@@ -103,6 +292,39 @@ class PartListCreateAPIView(generics.ListCreateAPIView):
     queryset = Part.objects.all().order_by('name')
     serializer_class = PartSerializer
 
+    def get(self, request, *args, **kwargs):
+        # Any part edit or stock movement bumps the catalog revision.
+        revision, updated_at = current_revision(PARTS_CATALOG)
+        etag = f'"parts-r{revision}"'
+        cached = not_modified(request, etag, updated_at)
+        if cached is not None:
+            return cached
+        # Served from the in-process catalog copy, reloaded only when the revision moved.
+        return set_validators(Response(parts_catalog.rows(revision)), etag, updated_at)
+
+class PartsForecastAPIView(APIView):
+    """
+    Demand forecast and reorder suggestions for every part, fewest days of
+    stock left first (see forecast.py). ?reorder=1 lists only the parts due
+    for reorder. Recomputed when parts are issued or edited, else daily.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request, *args, **kwargs):
+        if np is None:
+            return Response(
+                {"error": "Parts forecasting needs NumPy installed."}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        revision = current_revision(PARTS_CATALOG)[0]
+        etag = f'"parts-forecast-{timezone.localdate()}-r{revision}"'
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        forecast = parts_forecast.get(revision)
+        if request.query_params.get('reorder') == '1':
+            forecast = {**forecast, 'parts': [row for row in forecast['parts'] if row['reorder']]}
+        return set_validators(Response(forecast), etag)
+
 # Handles GET (detail), PUT/PATCH (update), and DELETE for a single Part
 class PartDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Part.objects.all()
@@ -122,36 +344,41 @@ class IssuePartAPIView(APIView):
         # Use the new action-specific serializer
         serializer = IssuePartActionSerializer(data=request.data)
         if serializer.is_valid():
-            part_id = serializer.validated_data['part_id']
             quantity_to_use = serializer.validated_data['quantity_used']
-            
-            part = get_object_or_404(Part, pk=part_id)
 
             try:
-                with transaction.atomic():
-                    if part.stock_quantity < quantity_to_use:
-                        return Response(
-                            {"error": f"Not enough stock for '{part.name}'. Only {part.stock_quantity} available."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    
-                    part.stock_quantity -= quantity_to_use
-                    part.save()
-
-                    PartUsage.objects.create(
-                        jobcard=jobcard,
-                        part=part,
-                        quantity_used=quantity_to_use,
-                        price_at_time_of_use=part.unit_price
-                    )
-                
-                return Response({"success": f"Successfully issued {quantity_to_use} x {part.name} to JobCard {jobcard.id}"}, status=status.HTTP_201_CREATED)
-
+                [usage] = issue_parts(jobcard, [serializer.validated_data])
+            except IssuePartError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            return Response({"success": f"Successfully issued {quantity_to_use} x {usage.part.name} to JobCard {jobcard.id}"}, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class IssuePartsAPIView(APIView):
+    """
+    Issues several parts to a job card in one request and one transaction.
+    Expects: {"items": [{"part_id": 1, "quantity_used": 2}, ...]}
+    Either every line is issued or, if any part is missing or short on
+    stock, none are.
+    """
+    def post(self, request, pk, *args, **kwargs):
+        jobcard = get_object_or_404(JobCard, pk=pk)
+
+        serializer = IssuePartsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            usages = issue_parts(jobcard, serializer.validated_data['items'])
+        except IssuePartError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(PartUsageSerializer(usages, many=True).data, status=status.HTTP_201_CREATED)
+
 class InvoiceCreateAPIView(APIView):
     """
     Creates an Invoice for a given JobCard.
@@ -187,6 +414,13 @@ class InvoiceCreateAPIView(APIView):
                 # 5. Calculate the final total amount
                 total_amount = subtotal + gst_amount - discount
 
+                # Optional: Update job card status to 'done' if it's not already.
+                # Before the invoice exists, so record_invoice counts the card
+                # as completed once (see rollups.record_jobcard_change).
+                if jobcard.status != 'done':
+                    jobcard.status = 'done'
+                    jobcard.save()
+
                 # 6. Create the Invoice instance
                 invoice = Invoice.objects.create(
                     jobcard=jobcard,
@@ -197,10 +431,16 @@ class InvoiceCreateAPIView(APIView):
                     total_amount=total_amount
                 )
 
-                # Optional: Update job card status to 'done' if it's not already
-                if jobcard.status != 'done':
-                    jobcard.status = 'done'
-                    jobcard.save()
+                # Keep the reporting rollups and the earnings ledger in step with the invoice table
+                record_invoice(invoice)
+                record_earning(invoice)
+
+                hub.publish_on_commit('invoice.created', {
+                    'jobcard_id': jobcard.id,
+                    'invoice_id': invoice.id,
+                    'total_amount': invoice.total_amount,
+                    'status': jobcard.status,
+                })
 
                 serializer = InvoiceDetailSerializer(invoice)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -209,154 +449,236 @@ class InvoiceCreateAPIView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # --- NEW: API View for downloading an Invoice PDF ---
+def job_accepted(request, job):
+    """202 Accepted for a queued background job, pointing at its status endpoint."""
+    data = BackgroundJobSerializer(job, context={'request': request}).data
+    return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['status_url']})
+
 class InvoicePDFView(APIView):
     """
-    Generates and serves a PDF for a specific invoice.
+    Serves the PDF for a specific invoice.
+    Rendered PDFs are kept in the on-disk cache (see pdf_cache.py), so
+    repeat downloads stream the stored file. The ETag is the fingerprint of
+    the rendered data, so a client holding the current copy gets a 304.
+    With BACKGROUND_JOBS on, a PDF that is not cached yet is rendered by a
+    background job instead, and the response is a 202 with the job's status.
     """
     def get(self, request, pk, *args, **kwargs):
-        # The 'pk' here is the JobCard ID.
-        jobcard = get_object_or_404(JobCard.objects.select_related('invoice'), pk=pk)
-        
-        if not hasattr(jobcard, 'invoice'):
+        # The 'pk' here is the JobCard ID. All printed data comes from one query.
+        invoice = load_invoice_data(jobcard_id=pk)
+
+        if invoice is None:
+            get_object_or_404(JobCard, pk=pk)
             return Response({"error": "Invoice not found for this job card."}, status=status.HTTP_404_NOT_FOUND)
 
-        invoice = jobcard.invoice
-        pdf_buffer = generate_invoice_pdf(invoice)
-        
-        response = HttpResponse(pdf_buffer, content_type='application/pdf')
-        # This header tells the browser to open a download dialog
-        response['Content-Disposition'] = f'attachment; filename="invoice-{invoice.id}.pdf"'
-        
+        if settings.BACKGROUND_JOBS:
+            cached = pdf_cache.lookup(invoice)
+            if cached is None:
+                return job_accepted(request, enqueue('invoice_pdf', jobcard_id=pk))
+            path, fingerprint = cached
+        else:
+            path, fingerprint = pdf_cache.get_or_render(invoice)
+        etag = f'"{fingerprint}"'
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            try:
+                pdf = open(path, 'rb')
+            except FileNotFoundError:
+                # Evicted by another request since the lookup; render it again.
+                path, fingerprint = pdf_cache.get_or_render(invoice)
+                pdf = open(path, 'rb')
+            # FileResponse streams the file and sets Content-Length.
+            # as_attachment tells the browser to open a download dialog.
+            response = FileResponse(
+                pdf, as_attachment=True,
+                filename=f"invoice-{invoice['id']}.pdf", content_type='application/pdf'
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
 
-class ReportsAPIView(APIView):
+class ReportsAPIView(ReplicaReadsMixin, View):
     """
     A single endpoint to provide aggregated data for the reports dashboard.
-    Accepts a 'period' query parameter ('today', 'week', 'month').
+    Accepts a 'period' query parameter ('today', 'week', 'month'), or a
+    'from' / 'to' range, and a 'granularity' for the revenue series:
+    'hour', 'day' (default), 'week' or 'month'. The range is widened to
+    whole buckets of that granularity.
+    Finished buckets are cached (see reports.py), so a request only queries
+    the current one, however long the range. The view is async: its
+    queries run concurrently (see abuild_report), natively under asgi.py
+    and in a per-request event loop under WSGI. Reads go to the read
+    replica when one is configured and current enough (see routing.py).
     """
-    def get(self, request, *args, **kwargs):
-        # Determine the time period for filtering
-        period = request.query_params.get('period', 'month') # Default to 'month'
-        end_date = timezone.now()
-        if period == 'today':
-            start_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == 'week':
-            start_date = end_date - timedelta(days=7)
-        else: # 'month'
-            start_date = end_date - timedelta(days=30)
-
-        # Filter invoices and completed jobs within the date range
-        invoices_in_period = Invoice.objects.filter(created_at__range=[start_date, end_date])
-        completed_jobs_in_period = JobCard.objects.filter(status='done', invoice__created_at__range=[start_date, end_date])
-
-        # --- 1. Calculate Financial KPIs ---
-        financial_kpis = invoices_in_period.aggregate(
-            total_revenue=Sum('total_amount', default=Decimal('0.0')),
-            total_parts_cost=Sum('parts_total', default=Decimal('0.0')),
-            total_labor_charge=Sum('labor_charge', default=Decimal('0.0')),
-            avg_invoice_value=Avg('total_amount', default=Decimal('0.0'))
-        )
-        financial_kpis['total_profit'] = financial_kpis['total_revenue'] - financial_kpis['total_parts_cost']
-
-        # --- 2. Calculate Revenue Over Time for the line chart ---
-        revenue_over_time = (
-            invoices_in_period
-            .annotate(date=TruncDate('created_at'))
-            .values('date')
-            .annotate(revenue=Sum('total_amount'))
-            .order_by('date')
-        )
-
-        # --- 3. Calculate Operational KPIs ---
-        operational_kpis = {
-            'jobs_completed': completed_jobs_in_period.count(),
-            'mechanic_performance': list(
-                completed_jobs_in_period
-                .values('assigned_mechanic__full_name')
-                .annotate(count=Count('id'))
-                .order_by('-count')
+    async def get(self, request, *args, **kwargs):
+        granularity = request.GET.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return JsonResponse(
+                {"error": f"granularity must be one of: {', '.join(GRANULARITIES)}."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start, end, _ = requested_range(request.GET)
+        except ValidationError as exc:
+            return JsonResponse({"error": exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+        if start is None:
+            return JsonResponse({"error": {"from": "Required with 'to'."}}, status=status.HTTP_400_BAD_REQUEST)
+        now = timezone.now()
+        start, end = align_range(start, end or now, granularity)
+        if too_many_buckets(start, end, granularity):
+            return JsonResponse(
+                {"error": f"Too many {granularity} buckets; use a shorter range or a coarser granularity."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        }
-        
-        # --- 4. Calculate Inventory & Customer Insights ---
-        most_used_parts = list(
-            PartUsage.objects.filter(jobcard__invoice__in=invoices_in_period)
-            .values('part__name')
-            .annotate(total_quantity=Sum('quantity_used'))
-            .order_by('-total_quantity')[:5] # Top 5 parts
-        )
-
-        # Combine all data into a single response
-        response_data = {
-            'financial_kpis': financial_kpis,
-            'revenue_over_time': list(revenue_over_time),
-            'operational_kpis': operational_kpis,
-            'most_used_parts': most_used_parts,
-        }
-
-        return Response(response_data)
 
-class InvoiceExportAPIView(APIView):
+        # The rollups only change through the rollups.record_* functions / rebuild_rollups, which
+        # bump the reports revision; a named period's window moves a bucket at a time.
+        revision, updated_at = await sync_to_async(current_revision)(REPORTS)
+        etag = f'"reports-{granularity}-{start.isoformat()}-{end.isoformat()}-r{revision}"'
+        current_bucket = bucket_start(now, granularity)
+        last_modified = max(updated_at, current_bucket) if updated_at else current_bucket
+        cached = not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
+        report = await abuild_report(start, end, granularity)
+        report['range'] = {'from': start, 'to': end, 'granularity': granularity}
+        # DRF's encoder, so the payload is the same as from the API views.
+        return set_validators(JsonResponse(report, encoder=JSONEncoder), etag, last_modified)
+
+
+class InvoiceExportAPIView(ReplicaReadsMixin, APIView):
     """
     Provides a list of detailed invoices for a given period for PDF export.
-    Accepts a 'period' query parameter ('today', 'week', 'month').
+    Accepts a 'period' query parameter ('today', 'week', 'month'), or an
+    arbitrary range with 'from' / 'to' (ISO dates or datetimes; a plain
+    'to' date includes that whole day), read like the reports endpoint
+    does (see periods.py).
+    An 'output' query parameter selects another format:
+      - output=csv / output=ndjson: the same rows, streamed in id order
+        with flat memory use, however long the range
+      - output=zip: a ZIP with one PDF per invoice, rendered in a process
+        pool and streamed as each batch finishes
+      - output=pdf: one combined multi-page PDF; it cannot be streamed, so
+        it is only built by a background job (400 with BACKGROUND_JOBS off)
+    With BACKGROUND_JOBS on, zip and pdf exports (and csv / ndjson ones
+    with async=1) are built by a background job instead, and the response
+    is a 202 with the job's status.
+    Reads go to the read replica when one is configured and current enough
+    (see routing.py).
     """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
     def get(self, request, *args, **kwargs):
-        period = request.query_params.get('period', 'month')
-        end_date = timezone.now()
-        if period == 'today':
-            start_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == 'week':
-            start_date = end_date - timedelta(days=7)
-        else: # 'month'
-            start_date = end_date - timedelta(days=30)
-
-        # Filter invoices within the date range and pre-fetch customer name for efficiency
-        invoices = Invoice.objects.filter(created_at__range=[start_date, end_date]).select_related('jobcard__customer')
-        
-        serializer = InvoiceExportSerializer(invoices, many=True)
-        return Response(serializer.data)
+        params = request.query_params
+        start_date, end_date, label = requested_range(params)
+        in_range = {}
+        if start_date is not None:
+            in_range['created_at__gte'] = start_date
+        if end_date is not None:
+            in_range['created_at__lt'] = end_date
+        filename = f"invoices-{label}"
+        # Live and archived invoices alike (see archive.py)
+        tiers = [Invoice.objects.filter(**in_range), ArchivedInvoice.objects.filter(**in_range)]
+
+        output = params.get('output')
+        if output in EXPORT_FORMATS and settings.BACKGROUND_JOBS and (
+            output in ('zip', 'pdf') or params.get('async') == '1'
+        ):
+            job = enqueue('invoice_export', output=output, filters=encode_filters(in_range), filename=filename)
+            return job_accepted(request, job)
+
+        if output in ('csv', 'ndjson'):
+            if output == 'csv':
+                response = StreamingHttpResponse(keep_routing(stream_csv(*tiers)), content_type='text/csv')
+            else:
+                response = StreamingHttpResponse(keep_routing(stream_ndjson(*tiers)), content_type='application/x-ndjson')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+            return response
+
+        if output == 'zip':
+            response = StreamingHttpResponse(
+                keep_routing(stream_invoice_zip(union_ids(tiers))), content_type='application/zip'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+            return response
+        if output == 'pdf':
+            return Response(
+                {"error": "output=pdf is only built by a background job (BACKGROUND_JOBS); use output=zip instead."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # InvoiceExportSerializer's output, built from value rows (see fastpath.py)
+        return Response(invoice_export_rows(*tiers))
 
 # --- THIS VIEW IS NOW FIXED (NO AUTHENTICATION) ---
 class MyJobsAPIView(generics.ListAPIView):
+    """
+    The signed-in mechanic's jobs, paginated like the job board, and their
+    earnings for ?period=today|week|month|all (default all). Takes the job
+    board's filters (every status by default) and its ?counts=1.
+    """
     serializer_class = JobCardListSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_mechanic_id(self):
+        """
+        The mechanic whose jobs are listed: the signed-in mechanic when the
+        request carries a token (no database lookup), else ?mechanic_id=.
+        """
+        if not hasattr(self, '_mechanic_id'):
+            user = self.request.user
+            mechanic_id = None
+            if user.is_authenticated and user.role == 'mechanic':
+                mechanic_id = user.id
+            else:
+                requested = self.request.query_params.get('mechanic_id', None)
+                if requested and requested.isdigit() and User.objects.filter(id=requested, role='mechanic').exists():
+                    mechanic_id = int(requested)
+            self._mechanic_id = mechanic_id
+        return self._mechanic_id
 
     def get_queryset(self):
-        mechanic_id = self.request.query_params.get('mechanic_id', None)
+        mechanic_id = self.get_mechanic_id()
         if mechanic_id:
-            try:
-                mechanic = User.objects.get(id=mechanic_id, role='mechanic')
-                return JobCard.objects.filter(assigned_mechanic=mechanic).select_related(
-                    'customer', 'vehicle'
-                ).order_by('-created_at')
-            except User.DoesNotExist:
-                return JobCard.objects.none()
+            queryset = JobCard.objects.filter(assigned_mechanic_id=mechanic_id)
+            # Same filters as the job board, but every status unless asked otherwise.
+            params = self.request.query_params.copy()
+            params.setdefault('status', 'all')
+            return filter_jobcards(queryset, params)
         return JobCard.objects.none()
 
     def list(self, request, *args, **kwargs):
-        # 1. Get the standard list of jobs for the mechanic
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        jobs_data = serializer.data
+        period = request.query_params.get('period', 'all')
+        if period != 'all' and period not in PERIOD_DAYS:
+            return Response(
+                {"error": "period must be one of: today, week, month, all."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 1. One page of the mechanic's jobs, newest first
+        page = self.paginate_queryset(self.get_queryset().values_list(*JOBCARD_LIST_COLUMNS, named=True))
+        jobs_data = jobcard_list_rows(page)
 
-        # 2. Perform the earnings calculation
-        mechanic_id = request.query_params.get('mechanic_id', None)
+        # 2. Earnings for the period, read from the running totals in the ledger
+        mechanic_id = self.get_mechanic_id()
         mechanic_earnings = Decimal('0.00')
         if mechanic_id:
-            # Find all invoices linked to jobs assigned to this mechanic
-            total_labor = Invoice.objects.filter(
-                jobcard__assigned_mechanic_id=mechanic_id
-            ).aggregate(total=Sum('labor_charge', default=Decimal('0.0')))['total']
-            
-            # Calculate 70% of the total labor
-            mechanic_earnings = total_labor * Decimal('0.70')
-
-        # 3. Combine the jobs list and the earnings into a single response
+            start_day = None if period == 'all' else period_start_day(period, timezone.localdate())
+            mechanic_earnings = earnings_since(mechanic_id, start_day)
+
+        # 3. Combine the jobs page and the earnings into a single response
         response_data = {
             'jobs': jobs_data,
-            'earnings': mechanic_earnings
+            'next': self.paginator.get_next_link(),
+            'earnings': mechanic_earnings,
+            'period': period,
         }
-        
+        if request.query_params.get('counts') == '1' and not request.query_params.get('cursor'):
+            mine = JobCard.objects.filter(assigned_mechanic_id=mechanic_id) if mechanic_id else JobCard.objects.none()
+            response_data['counts'] = jobcard_status_counts(mine, request.query_params)
+
         return Response(response_data)
 
 
@@ -366,6 +688,14 @@ class JobCardStatusUpdateAPIView(generics.UpdateAPIView):
     queryset = JobCard.objects.all() # A mechanic can update any job card now
     # permission_classes has been removed.
 
+    def perform_update(self, serializer):
+        jobcard = serializer.save()
+        hub.publish_on_commit('jobcard.status', {
+            'jobcard_id': jobcard.id,
+            'status': jobcard.status,
+            'assigned_mechanic_id': jobcard.assigned_mechanic_id,
+        })
+
 
 class ServiceTaskUpdateAPIView(generics.UpdateAPIView):
     serializer_class = ServiceTaskUpdateSerializer
@@ -374,12 +704,116 @@ class ServiceTaskUpdateAPIView(generics.UpdateAPIView):
     # The queryset now allows updating any ServiceTask by its ID.
     queryset = ServiceTask.objects.all()
 
+    def perform_update(self, serializer):
+        task = serializer.save()
+        hub.publish_on_commit('task.updated', {
+            'task_id': task.id,
+            'jobcard_id': task.jobcard_id,
+            'completed': task.completed,
+        })
+
+
+# --- NEW: Server-sent events stream for the live job board ---
+class LiveEventsView(View):
+    """
+    Streams job card, task, part and invoice change events as
+    text/event-stream, so a screen can keep one connection open instead of
+    re-polling full lists. Reconnecting clients send Last-Event-ID (or
+    ?last_event_id=) to receive the events they missed.
+    Under ASGI the stream is async and holds no worker thread while idle.
+    """
+    def get(self, request, *args, **kwargs):
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        if isinstance(request, ASGIRequest):
+            stream = self.async_stream(last_event_id)
+        else:
+            stream = self.sync_stream(last_event_id)
+
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+    def sync_stream(self, last_event_id):
+        subscription = hub.subscribe(last_event_id)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=HEARTBEAT_INTERVAL)
+                yield format_sse(event) if event else ': keep-alive\n\n'
+        finally:
+            subscription.close()
+
+    async def async_stream(self, last_event_id):
+        subscription = hub.subscribe(last_event_id, loop=asyncio.get_running_loop())
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = await subscription.aget(timeout=HEARTBEAT_INTERVAL)
+                yield format_sse(event) if event else ': keep-alive\n\n'
+        finally:
+            subscription.close()
+
+class BackgroundJobDetailView(generics.RetrieveAPIView):
+    """
+    Status of a background job (see background.py). Poll it until the status
+    is 'done', then fetch download_url, or 'failed', with the reason in 'error'.
+    """
+    queryset = BackgroundJob.objects.all()
+    serializer_class = BackgroundJobSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.data['status'] in ('queued', 'running'):
+            response['Retry-After'] = str(max(1, round(settings.BACKGROUND_POLL_INTERVAL)))
+        return response
+
+class BackgroundJobDownloadView(APIView):
+    """Serves the file a finished background job produced."""
+    def get(self, request, pk, *args, **kwargs):
+        job = get_object_or_404(BackgroundJob, pk=pk)
+        if job.status != 'done':
+            return Response({"error": f"The job is {job.status}."}, status=status.HTTP_409_CONFLICT)
+        try:
+            result = open(job.result_path, 'rb')
+        except FileNotFoundError:
+            # Evicted from the PDF cache, or purged after BACKGROUND_RESULT_TTL.
+            return Response(
+                {"error": "The result is no longer available; request it again."}, status=status.HTTP_410_GONE
+            )
+        return FileResponse(result, as_attachment=True, filename=job.result_name, content_type=job.content_type)
+
+class MetricsView(View):
+    """
+    Request metrics for this worker in the Prometheus text format. When
+    METRICS_TOKEN is set, scrapers must send it as a Bearer token.
+    """
+    def get(self, request, *args, **kwargs):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse(status=401)
+        return HttpResponse(metrics_registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # --- NEW: A secure endpoint to get the current user's details ---
 class UserProfileView(APIView):
     """
     Provides the details for a specific user by their ID.
     """
     def get(self, request, pk, *args, **kwargs):
+        if request.user.is_authenticated:
+            if request.user.id != pk and request.user.role != 'admin':
+                return Response({"error": "You can only view your own profile."}, status=status.HTTP_403_FORBIDDEN)
+            # Served from the short-lived profile cache rather than the User table.
+            profile = profile_cache.get(pk)
+            if profile is None:
+                return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+            return Response(profile)
         # The user is now fetched by the primary key (pk) from the URL
         user = get_object_or_404(User, pk=pk)
         serializer = UserResponseSerializer(user)
@@ -392,6 +826,8 @@ class ChangePinView(APIView):
     Allows changing a PIN for a specific user by their ID.
     """
     def post(self, request, pk, *args, **kwargs):
+        if request.user.is_authenticated and request.user.id != pk:
+            return Response({"error": "You can only change your own PIN."}, status=status.HTTP_403_FORBIDDEN)
         user = get_object_or_404(User, pk=pk)
         serializer = ChangePinSerializer(data=request.data)
         if serializer.is_valid():
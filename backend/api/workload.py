@@ -0,0 +1,112 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import JobCard, User
+
+# Statuses that count towards a mechanic's open workload ('done' is excluded).
+PENDING_STATUSES = [code for code, _ in JobCard.STATUS_CHOICES if code != 'done']
+
+
+def workload_annotations():
+    """
+    Count annotations that give every mechanic their pending job counts,
+    one per status plus the overall total, in a single GROUP BY query.
+    """
+    annotations = {
+        f'{code}_count': Count('assigned_jobs', filter=Q(assigned_jobs__status=code))
+        for code in PENDING_STATUSES
+    }
+    annotations['pending_jobs_count'] = Count(
+        'assigned_jobs', filter=Q(assigned_jobs__status__in=PENDING_STATUSES)
+    )
+    return annotations
+
+
+def mechanics_with_workload():
+    """Mechanics queryset annotated with their per-status pending counts."""
+    return User.objects.filter(role='mechanic').annotate(**workload_annotations()).order_by('id')
+
+
+def workload_cache_enabled():
+    return getattr(settings, 'MECHANIC_WORKLOAD_CACHE', False)
+
+
+class MechanicWorkloadCache:
+    """
+    In-process map of mechanic id -> {status: pending count}.
+
+    The map is loaded once from the aggregated query and then kept current by
+    the JobCard signal handlers, which apply +1/-1 deltas whenever a card's
+    status or assigned mechanic changes. Because every worker process has its
+    own copy, the map is fully reloaded after MECHANIC_WORKLOAD_CACHE_TTL
+    seconds so changes made by other workers (or by queryset.update(), which
+    fires no signals) are picked up within that window.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None
+        self._names = {}
+        self._loaded_at = 0.0
+
+    def _ttl(self):
+        return getattr(settings, 'MECHANIC_WORKLOAD_CACHE_TTL', 30)
+
+    def _is_stale(self):
+        return self._counts is None or time.monotonic() - self._loaded_at > self._ttl()
+
+    def load(self):
+        counts = {}
+        names = {}
+        for mechanic in mechanics_with_workload():
+            counts[mechanic.id] = {code: getattr(mechanic, f'{code}_count') for code in PENDING_STATUSES}
+            names[mechanic.id] = mechanic.full_name
+        with self._lock:
+            self._counts = counts
+            self._names = names
+            self._loaded_at = time.monotonic()
+
+    def snapshot(self):
+        """Returns the list-endpoint rows, reloading from the database if stale."""
+        if self._is_stale():
+            self.load()
+        with self._lock:
+            return [
+                {
+                    'id': mechanic_id,
+                    'full_name': self._names.get(mechanic_id, ''),
+                    'pending_jobs_count': sum(by_status.values()),
+                    'pending_by_status': dict(by_status),
+                }
+                for mechanic_id, by_status in self._counts.items()
+            ]
+
+    def _adjust(self, mechanic_id, job_status, delta):
+        if mechanic_id is None or job_status not in PENDING_STATUSES:
+            return
+        by_status = self._counts.get(mechanic_id)
+        if by_status is None:
+            # A mechanic we have not loaded yet; force a reload on next read.
+            self._loaded_at = 0.0
+            return
+        by_status[job_status] = max(0, by_status[job_status] + delta)
+
+    def job_changed(self, old_mechanic_id, old_status, new_mechanic_id, new_status):
+        """Moves one job from (old mechanic, old status) to (new mechanic, new status)."""
+        if (old_mechanic_id, old_status) == (new_mechanic_id, new_status):
+            return
+        with self._lock:
+            if self._counts is None:
+                return
+            self._adjust(old_mechanic_id, old_status, -1)
+            self._adjust(new_mechanic_id, new_status, +1)
+
+    def invalidate(self):
+        with self._lock:
+            self._counts = None
+
+
+workload_cache = MechanicWorkloadCache()
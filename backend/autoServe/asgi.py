@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn autoServe.asgi:application``) to
+run the /api/events/ live stream asynchronously, without tying up a worker
+thread per connected screen, and the async /api/reports/ view natively.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autoServe.settings')
 
 application = get_asgi_application()
+
+# Build the vehicle search index now rather than on the first search.
+from api.search import vehicle_index  # noqa: E402
+
+vehicle_index.warm()
@@ -0,0 +1,22 @@
+"""
+Settings for the benchmark suite: the normal settings on a throwaway SQLite
+database under var/, with DEBUG off as in production.
+
+    export DJANGO_SETTINGS_MODULE=autoServe.bench_settings
+    python manage.py migrate
+    python manage.py seed_workshop
+    python manage.py benchmark_endpoints --output var/bench.json
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'var' / 'bench.sqlite3',
+    }
+}
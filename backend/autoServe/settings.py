@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -29,6 +31,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.routing.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'autoServe.urls'
@@ -61,6 +64,25 @@ DATABASES = {
     }
 }
 
+# Optional read replica for the reporting and export endpoints (see
+# api/routing.py). Set DB_REPLICA_HOST to a MySQL replica of the database
+# above; those endpoints then read from it unless it is more than
+# REPLICA_MAX_LAG seconds behind, or the client wrote in the last
+# REPLICA_PIN_SECONDS (read-your-writes). Pins live in the cache, so use a
+# shared CACHES backend when running several workers.
+DATABASE_ROUTERS = ['api.routing.ReplicaRouter']
+REPLICA_DATABASE = None
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASE = 'replica'
+REPLICA_MAX_LAG = 5  # seconds
+REPLICA_LAG_CHECK_INTERVAL = 5  # seconds between lag measurements, per worker
+REPLICA_PIN_SECONDS = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -90,3 +112,83 @@ CORS_ALLOWED_ORIGINS = [
     'http://localhost:1212',
     'http://192.168.0.102:1212',
 ]
+
+REST_FRAMEWORK = {
+    # Signed "Authorization: Bearer" tokens issued by /api/login/.
+    'DEFAULT_AUTHENTICATION_CLASSES': ['api.authentication.SignedTokenAuthentication'],
+}
+API_TOKEN_TTL = 12 * 60 * 60  # seconds a login token stays valid
+API_PROFILE_CACHE_TTL = 60  # seconds a user's profile fields are cached; also how long other workers accept revoked tokens
+
+# Per-route latency, query and response-size metrics, served at /metrics.
+# Requests slower than METRICS_SLOW_REQUEST_MS are logged to
+# 'api.slow_requests' with their SQL; None turns the log off.
+METRICS_SLOW_REQUEST_MS = None
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token required by /metrics when set
+
+# Threads that run the reports endpoint's rollup queries concurrently, each on
+# its own database connection. Below 2, or while the database's CONN_MAX_AGE
+# is 0 (every pooled query would connect anew), the queries run one after
+# another on the request's connection. Measured on SQLite the pool was slower
+# for every period (see benchmark_reports), so it stays off until a MySQL run
+# shows a gain.
+REPORTS_QUERY_WORKERS = 1
+
+# The reports endpoint keeps each finished bucket of its series (an hour, day,
+# week or month wholly in the past) in-process, so a request only queries the
+# current bucket (see api/reports.py). A bucket counts as finished
+# REPORTS_CLOSED_BUCKET_DELAY seconds after it ends, so invoices still
+# committing at the boundary are not missed.
+REPORTS_BUCKET_CACHE_SIZE = 50000  # buckets per worker
+REPORTS_CLOSED_BUCKET_DELAY = 60  # seconds
+REPORTS_MAX_BUCKETS = 10000  # per request
+
+# archive_jobcards moves done job cards older than this into the archive
+# tables (see api/archive.py), this many job cards per transaction.
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# Mechanics' share of the labour charge, recorded per invoice in the earnings ledger.
+MECHANIC_LABOR_SHARE = '0.70'
+
+# Serve the mechanic list from an in-process workload cache that is kept
+# current by JobCard signals. Each worker fully reloads it after the TTL.
+MECHANIC_WORKLOAD_CACHE = False
+MECHANIC_WORKLOAD_CACHE_TTL = 30  # seconds
+
+# In-process type-ahead index behind /api/vehicles/search/, kept current by
+# Vehicle/Customer signals. Each worker fully reloads it after the TTL.
+VEHICLE_SEARCH_INDEX_TTL = 300  # seconds
+
+# Parts demand forecast behind /api/parts/forecast/ (see api/forecast.py):
+# daily demand is the exponentially smoothed usage over the last
+# PARTS_FORECAST_HISTORY_DAYS. A part is due for reorder once its stock
+# covers fewer than PARTS_REORDER_LEAD_DAYS of demand, and the suggested
+# order lasts PARTS_REORDER_COVER_DAYS beyond the lead time.
+PARTS_FORECAST_HISTORY_DAYS = 90
+PARTS_FORECAST_WINDOW_DAYS = 28  # moving average reported alongside
+PARTS_FORECAST_SMOOTHING = 0.2  # smoothing factor; higher follows recent days more closely
+PARTS_REORDER_LEAD_DAYS = 7  # supplier lead time
+PARTS_REORDER_COVER_DAYS = 30
+
+# On-disk cache of rendered invoice PDFs, evicted least-recently-used first.
+INVOICE_PDF_CACHE_DIR = BASE_DIR / 'var' / 'invoice_pdfs'
+INVOICE_PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Batch invoice PDF export (InvoiceExportAPIView ?output=zip|pdf): processes
+# in the shared render pool, started on the first export.
+INVOICE_EXPORT_WORKERS = os.cpu_count() or 2
+INVOICE_EXPORT_BATCH_SIZE = 25  # invoices per worker task
+
+# Background jobs (see api/background.py). With BACKGROUND_JOBS on, invoice
+# PDFs that are not cached yet and invoice exports to files (?output=zip|pdf,
+# or csv|ndjson with ?async=1) are queued instead of built in the request:
+# the view answers 202 with the job's status URL. Jobs only run while
+# `manage.py run_background_worker` does.
+BACKGROUND_JOBS = False
+BACKGROUND_WORKERS = os.cpu_count() or 2  # pool processes per worker command
+BACKGROUND_POLL_INTERVAL = 1.0  # seconds between queue polls when idle
+BACKGROUND_JOB_TIMEOUT = 15 * 60  # seconds before a running job counts as lost and is requeued
+BACKGROUND_MAX_ATTEMPTS = 3
+BACKGROUND_RESULTS_DIR = BASE_DIR / 'var' / 'background_results'
+BACKGROUND_RESULT_TTL = 24 * 60 * 60  # seconds finished jobs and their files are kept
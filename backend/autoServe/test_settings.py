@@ -0,0 +1,23 @@
+"""
+Settings for running the test suite without MySQL: the normal settings on
+two SQLite databases, the second standing in for a read replica.
+
+    DJANGO_SETTINGS_MODULE=autoServe.test_settings python manage.py test
+
+The replica is only read from in tests that enable REPLICA_DATABASE.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'var' / 'test.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'var' / 'test_replica.sqlite3',
+    },
+}
+REPLICA_DATABASE = None
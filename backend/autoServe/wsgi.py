@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autoServe.settings')
 
 application = get_wsgi_application()
+
+# Build the vehicle search index now rather than on the first search.
+from api.search import vehicle_index  # noqa: E402
+
+vehicle_index.warm()
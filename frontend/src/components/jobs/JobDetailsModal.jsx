@@ -66,9 +66,21 @@ export function JobDetailsModal({ isOpen, onClose, jobId, onRefresh }) {
   const handleDownloadPdf = async () => {
     if (!job?.id) return;
     try {
-        const response = await axios.get(`http://127.0.0.1:8000/api/jobcards/${job.id}/invoice-pdf/`, {
+        let response = await axios.get(`http://127.0.0.1:8000/api/jobcards/${job.id}/invoice-pdf/`, {
             responseType: 'blob',
         });
+        if (response.status === 202) {
+            // Not rendered yet: the server queued a background job; wait for it.
+            let backgroundJob = JSON.parse(await response.data.text());
+            while (backgroundJob.status === 'queued' || backgroundJob.status === 'running') {
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                backgroundJob = (await axios.get(backgroundJob.status_url)).data;
+            }
+            if (backgroundJob.status !== 'done') {
+                throw new Error(backgroundJob.error || 'Invoice rendering failed.');
+            }
+            response = await axios.get(backgroundJob.download_url, { responseType: 'blob' });
+        }
         
         const url = window.URL.createObjectURL(new Blob([response.data]));
         const link = document.createElement('a');
@@ -1,5 +1,15 @@
 import React, { createContext, useState, useContext, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import axios from 'axios';
+
+// Sends the login token with every API request.
+const setAuthToken = (token) => {
+    if (token) {
+        axios.defaults.headers.common['Authorization'] = `Bearer ${token}`;
+    } else {
+        delete axios.defaults.headers.common['Authorization'];
+    }
+};
 
 const AuthContext = createContext(null);
 
@@ -13,7 +23,9 @@ export const AuthProvider = ({ children }) => {
             // ✅ Better: store/retrieve a single object instead of 3 separate keys
             const storedUser = localStorage.getItem('user');
             if (storedUser) {
-                setUser(JSON.parse(storedUser));
+                const parsedUser = JSON.parse(storedUser);
+                setAuthToken(parsedUser.token);
+                setUser(parsedUser);
             }
         } catch (error) {
             console.error("Failed to parse user from localStorage", error);
@@ -25,6 +37,7 @@ export const AuthProvider = ({ children }) => {
     const login = (userData) => {
         // ✅ Store complete user object
         localStorage.setItem('user', JSON.stringify(userData));
+        setAuthToken(userData.token);
         setUser(userData);
 
         if (userData.role === 'admin') {
@@ -36,10 +49,25 @@ export const AuthProvider = ({ children }) => {
 
     const logout = () => {
         localStorage.removeItem('user'); // only clear what we set
+        setAuthToken(null);
         setUser(null);
         navigate('/login', { replace: true });
     };
 
+    // An expired or rejected token sends the user back to the login page.
+    useEffect(() => {
+        const interceptor = axios.interceptors.response.use(
+            (response) => response,
+            (error) => {
+                if (error.response?.status === 401 && axios.defaults.headers.common['Authorization']) {
+                    logout();
+                }
+                return Promise.reject(error);
+            }
+        );
+        return () => axios.interceptors.response.eject(interceptor);
+    }, []);
+
     const value = {
         user,
         loading,
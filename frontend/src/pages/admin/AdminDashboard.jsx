@@ -45,6 +45,8 @@ export default function AdminDashboard() {
   
   // State for all dynamic data
   const [jobs, setJobs] = useState([]);
+  const [statusCounts, setStatusCounts] = useState({});
+  const [createdCounts, setCreatedCounts] = useState(null);
   const [inventory, setInventory] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -64,12 +66,36 @@ export default function AdminDashboard() {
   const fetchData = async () => {
     setIsLoading(true);
     try {
-      const [jobsResponse, partsResponse] = await Promise.all([
-        axios.get("http://127.0.0.1:8000/api/jobcards/"),
+      const today = new Date();
+      const yesterday = new Date();
+      yesterday.setDate(today.getDate() - 1);
+      const todayStr = today.toISOString().split('T')[0];
+      const yesterdayStr = yesterday.toISOString().split('T')[0];
+
+      // Stats come from the server's counts (page_size 1: only the counts are
+      // needed); the board follows the open jobs' next links, so nothing is cut off.
+      const jobsUrl = "http://127.0.0.1:8000/api/jobcards/";
+      const createdOn = (day) => axios.get(jobsUrl, {
+        params: { status: "all", created_after: day, created_before: day, counts: 1, page_size: 1 },
+      });
+      const [jobsResponse, todayResponse, yesterdayResponse, partsResponse] = await Promise.all([
+        axios.get(jobsUrl, { params: { status: "open", counts: 1 } }),
+        createdOn(todayStr),
+        createdOn(yesterdayStr),
         axios.get("http://127.0.0.1:8000/api/parts/")
       ]);
 
-      const transformedJobs = jobsResponse.data.map(job => ({
+      const openJobs = [...jobsResponse.data.results];
+      let nextPageUrl = jobsResponse.data.next;
+      while (nextPageUrl) {
+        const page = await axios.get(nextPageUrl);
+        openJobs.push(...page.data.results);
+        nextPageUrl = page.data.next;
+      }
+
+      setStatusCounts(jobsResponse.data.counts);
+      setCreatedCounts({ today: todayResponse.data.counts.all, yesterday: yesterdayResponse.data.counts.all });
+      const transformedJobs = openJobs.map(job => ({
         ...job,
         id: job.id.toString(),
         status: statusMap[job.status] || job.status,
@@ -96,33 +122,24 @@ export default function AdminDashboard() {
 
   // Effect to calculate the percentage change in new jobs
   useEffect(() => {
-    if (jobs.length > 0) {
-        const today = new Date();
-        const yesterday = new Date();
-        yesterday.setDate(today.getDate() - 1);
-
-        const todayStr = today.toISOString().split('T')[0];
-        const yesterdayStr = yesterday.toISOString().split('T')[0];
+    if (createdCounts === null) return;
+    const { today: todayCount, yesterday: yesterdayCount } = createdCounts;
 
-        const todayCount = jobs.filter(job => job.created_at.startsWith(todayStr)).length;
-        const yesterdayCount = jobs.filter(job => job.created_at.startsWith(yesterdayStr)).length;
-        
-        // --- NEW: Set the state for today's job count ---
-        setJobsCreatedToday(todayCount);
+    // --- NEW: Set the state for today's job count ---
+    setJobsCreatedToday(todayCount);
 
-        if (yesterdayCount > 0) {
-            const change = ((todayCount - yesterdayCount) / yesterdayCount) * 100;
-            setActiveJobsChange({
-                value: Math.abs(change),
-                trend: change >= 0 ? 'up' : 'down'
-            });
-        } else if (todayCount > 0) {
-            setActiveJobsChange({ value: 100, trend: 'up' });
-        } else {
-            setActiveJobsChange({ value: 0, trend: 'neutral' });
-        }
+    if (yesterdayCount > 0) {
+        const change = ((todayCount - yesterdayCount) / yesterdayCount) * 100;
+        setActiveJobsChange({
+            value: Math.abs(change),
+            trend: change >= 0 ? 'up' : 'down'
+        });
+    } else if (todayCount > 0) {
+        setActiveJobsChange({ value: 100, trend: 'up' });
+    } else {
+        setActiveJobsChange({ value: 0, trend: 'neutral' });
     }
-  }, [jobs]);
+  }, [createdCounts]);
 
   const handleMoveJob = async (jobId, newStatus) => {
     const backendStatusKey = Object.keys(statusMap).find(key => statusMap[key] === newStatus);
@@ -131,10 +148,20 @@ export default function AdminDashboard() {
         return;
     }
     const originalJobs = [...jobs];
+    const originalCounts = statusCounts;
+    const movedJob = jobs.find(job => job.id === jobId);
+    const oldStatusKey = movedJob && Object.keys(statusMap).find(key => statusMap[key] === movedJob.status);
     const updatedJobs = jobs.map(job => 
         job.id === jobId ? { ...job, status: newStatus } : job
     );
     setJobs(updatedJobs);
+    if (oldStatusKey && oldStatusKey !== backendStatusKey) {
+        setStatusCounts(counts => ({
+            ...counts,
+            [oldStatusKey]: (counts[oldStatusKey] ?? 0) - 1,
+            [backendStatusKey]: (counts[backendStatusKey] ?? 0) + 1,
+        }));
+    }
     try {
         await axios.patch(`http://127.0.0.1:8000/api/jobcards/${jobId}/update-status/`, {
             status: backendStatusKey,
@@ -142,6 +169,7 @@ export default function AdminDashboard() {
         toast.success(`Job #${jobId} moved to "${newStatus}"`);
     } catch (err) {
         setJobs(originalJobs);
+        setStatusCounts(originalCounts);
         toast.error("Failed to update job status.");
         console.error(err);
     }
@@ -149,8 +177,8 @@ export default function AdminDashboard() {
 
   // Calculate stats dynamically from the fetched data
   const lowStockItems = inventory.filter(item => item.stock_quantity <= 5).length;
-  const jobsInQueue = jobs.filter(job => job.status === 'In Queue').length;
-  const jobsAwaitingParts = jobs.filter(job => job.status === 'Awaiting Parts').length;
+  const jobsInQueue = statusCounts.queue ?? 0;
+  const jobsAwaitingParts = statusCounts.parts ?? 0;
 
   return (
     <div className="w-full space-y-8">
@@ -43,12 +43,21 @@ export default function InventoryPage() {
     try {
       const [partsResponse, jobsResponse] = await Promise.all([
         axios.get("http://127.0.0.1:8000/api/parts/"),
-        axios.get("http://127.0.0.1:8000/api/jobcards/")
+        axios.get("http://127.0.0.1:8000/api/jobcards/", { params: { status: "open" } })
       ]);
       
       setInventory(partsResponse.data);
+
+      // Every open job card can have parts issued, so follow the next links.
+      const openJobs = [...jobsResponse.data.results];
+      let nextPageUrl = jobsResponse.data.next;
+      while (nextPageUrl) {
+        const page = await axios.get(nextPageUrl);
+        openJobs.push(...page.data.results);
+        nextPageUrl = page.data.next;
+      }
       
-      const activeJobCards = jobsResponse.data.filter(job => job.status !== 'done').map(job => ({
+      const activeJobCards = openJobs.map(job => ({
           ...job,
           id: job.id.toString(),
           customerName: job.customer?.name || 'N/A',
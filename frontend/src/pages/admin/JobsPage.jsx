@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { JobCard } from "@/components/jobs/JobCard";
 import { JobDetailsModal } from "@/components/jobs/JobDetailsModal";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
@@ -41,9 +41,13 @@ export default function JobsPage() {
   const [jobs, setJobs] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextPageUrl, setNextPageUrl] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   const [searchTerm, setSearchTerm] = useState("");
   const [statusFilter, setStatusFilter] = useState("all");
+  const [statusCounts, setStatusCounts] = useState({});
+  const latestRequest = useRef(0);
   
   const [selectedJobId, setSelectedJobId] = useState(null);
   const [isModalOpen, setIsModalOpen] = useState(false);
@@ -53,21 +57,32 @@ export default function JobsPage() {
     qc: "QC", done: "Completed",
   };
 
+  const transformJob = (job) => ({
+    ...job,
+    id: job.id.toString(),
+    status: statusMap[job.status] || job.status,
+    customerName: job.customer?.name || 'N/A',
+    vehicleNumber: job.vehicle?.registration_no || 'N/A',
+    vehicleBrand: job.vehicle?.make || 'N/A',
+    vehicleModel: job.vehicle?.model || 'N/A',
+    formattedCreatedAt: formatDate(job.created_at),
+  });
+
+  // Status, search and the per-status counts all come from the server, so
+  // they cover every page, not just the ones loaded so far.
   const fetchJobs = async () => {
     // Don't set loading to true here to prevent flashing on refresh
+    const request = ++latestRequest.current;
     try {
-      const response = await axios.get("http://127.0.0.1:8000/api/jobcards/");
-      const transformedData = response.data.map(job => ({
-        ...job,
-        id: job.id.toString(),
-        status: statusMap[job.status] || job.status,
-        customerName: job.customer?.name || 'N/A',
-        vehicleNumber: job.vehicle?.registration_no || 'N/A',
-        vehicleBrand: job.vehicle?.make || 'N/A',
-        vehicleModel: job.vehicle?.model || 'N/A',
-        formattedCreatedAt: formatDate(job.created_at),
-      }));
-      setJobs(transformedData);
+      const params = { status: statusFilter, counts: 1 };
+      if (searchTerm.trim()) params.search = searchTerm.trim();
+      const response = await axios.get("http://127.0.0.1:8000/api/jobcards/", { params });
+      // A slower answer for filters the user has since changed is dropped.
+      if (request !== latestRequest.current) return;
+      setJobs(response.data.results.map(transformJob));
+      setNextPageUrl(response.data.next);
+      setStatusCounts(response.data.counts);
+      setError(null);
     } catch (err) {
       setError("Failed to fetch job cards. Please ensure the server is running.");
     } finally {
@@ -75,10 +90,27 @@ export default function JobsPage() {
     }
   };
 
+  // The job list is paginated by cursor; "Load more" follows the next link.
+  const loadMoreJobs = async () => {
+    if (!nextPageUrl) return;
+    setIsLoadingMore(true);
+    try {
+      const response = await axios.get(nextPageUrl);
+      setJobs(prev => [...prev, ...response.data.results.map(transformJob)]);
+      setNextPageUrl(response.data.next);
+    } catch (err) {
+      setError("Failed to fetch job cards. Please ensure the server is running.");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  // Refetch from the first page when the filters change; typing is debounced.
   useEffect(() => {
     setIsLoading(true);
-    fetchJobs();
-  }, []);
+    const timer = setTimeout(fetchJobs, 300);
+    return () => clearTimeout(timer);
+  }, [statusFilter, searchTerm]);
 
   const handleViewDetails = (jobId) => {
     setSelectedJobId(jobId);
@@ -97,24 +129,6 @@ export default function JobsPage() {
     fetchJobs();
   };
 
-  const filteredJobs = jobs.filter((job) => {
-    const matchesSearch =
-      job.customerName.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      job.vehicleNumber.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      job.id.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesStatus = statusFilter === "all" || job.status === statusFilter;
-    return matchesSearch && matchesStatus;
-  });
-
-  const statusCounts = {
-    all: jobs.length,
-    "In Queue": jobs.filter((job) => job.status === "In Queue").length,
-    "Under Service": jobs.filter((job) => job.status === "Under Service").length,
-    "Awaiting Parts": jobs.filter((job) => job.status === "Awaiting Parts").length,
-    QC: jobs.filter((job) => job.status === "QC").length,
-    Completed: jobs.filter((job) => job.status === "Completed").length,
-  };
-
   return (
     <>
       <JobDetailsModal 
@@ -137,22 +151,23 @@ export default function JobsPage() {
               <Select value={statusFilter} onValueChange={setStatusFilter}>
                 <SelectTrigger className="bg-gray-900 text-white border-gray-700 focus:border-yellow-400"><SelectValue placeholder="Filter by status" /></SelectTrigger>
                 <SelectContent>
-                  <SelectItem value="all">All Status ({statusCounts.all})</SelectItem>
-                  <SelectItem value="In Queue">In Queue ({statusCounts["In Queue"]})</SelectItem>
-                  <SelectItem value="Under Service">Under Service ({statusCounts["Under Service"]})</SelectItem>
-                  <SelectItem value="Awaiting Parts">Awaiting Parts ({statusCounts["Awaiting Parts"]})</SelectItem>
-                  <SelectItem value="QC">QC ({statusCounts["QC"]})</SelectItem>
-                  <SelectItem value="Completed">Completed ({statusCounts["Completed"]})</SelectItem>
+                  <SelectItem value="all">All Status ({statusCounts.all ?? 0})</SelectItem>
+                  <SelectItem value="queue">In Queue ({statusCounts.queue ?? 0})</SelectItem>
+                  <SelectItem value="service">Under Service ({statusCounts.service ?? 0})</SelectItem>
+                  <SelectItem value="parts">Awaiting Parts ({statusCounts.parts ?? 0})</SelectItem>
+                  <SelectItem value="qc">QC ({statusCounts.qc ?? 0})</SelectItem>
+                  <SelectItem value="done">Completed ({statusCounts.done ?? 0})</SelectItem>
                 </SelectContent>
               </Select>
             </div>
           </CardContent>
         </Card>
         <div className="flex items-center justify-between">
-          <div className="flex items-center space-x-2"><h2 className="text-xl font-semibold text-yellow-400">Job Cards</h2><Badge variant="outline" className="border-yellow-400 text-yellow-400">{filteredJobs.length} results</Badge></div>
+          <div className="flex items-center space-x-2"><h2 className="text-xl font-semibold text-yellow-400">Job Cards</h2><Badge variant="outline" className="border-yellow-400 text-yellow-400">{statusCounts[statusFilter] ?? 0} results</Badge></div>
         </div>
         {isLoading ? (<div className="grid grid-cols-1 lg:grid-cols-2 xl:grid-cols-3 gap-6"><JobCardSkeleton /><JobCardSkeleton /><JobCardSkeleton /></div>) : error ? (<Card className="bg-red-500/10 border border-red-500/30"><CardContent className="text-center py-12"><AlertTriangle className="h-12 w-12 text-red-400 mx-auto mb-4" /><h3 className="text-lg font-semibold text-red-400 mb-2">An Error Occurred</h3><p className="text-gray-400">{error}</p></CardContent></Card>) : (<>
-            {filteredJobs.length > 0 ? (<div className="grid grid-cols-1 lg:grid-cols-2 xl:grid-cols-3 gap-6">{filteredJobs.map((job) => (<JobCard key={job.id} job={job} onViewDetails={handleViewDetails} />))}</div>) : (<Card className="bg-gray-800 border border-gray-700"><CardContent className="text-center py-12"><FileText className="h-12 w-12 text-gray-400 mx-auto mb-4" /><h3 className="text-lg font-semibold text-yellow-400 mb-2">No jobs found</h3><p className="text-gray-400">Try adjusting your search or filter criteria.</p></CardContent></Card>)}
+            {jobs.length > 0 ? (<div className="grid grid-cols-1 lg:grid-cols-2 xl:grid-cols-3 gap-6">{jobs.map((job) => (<JobCard key={job.id} job={job} onViewDetails={handleViewDetails} />))}</div>) : (<Card className="bg-gray-800 border border-gray-700"><CardContent className="text-center py-12"><FileText className="h-12 w-12 text-gray-400 mx-auto mb-4" /><h3 className="text-lg font-semibold text-yellow-400 mb-2">No jobs found</h3><p className="text-gray-400">Try adjusting your search or filter criteria.</p></CardContent></Card>)}
+            {nextPageUrl && (<div className="flex justify-center"><Button onClick={loadMoreJobs} disabled={isLoadingMore} variant="outline" className="border-yellow-400 text-yellow-400 hover:bg-yellow-400/10">{isLoadingMore ? "Loading..." : "Load more"}</Button></div>)}
           </>)}
       </div>
     </>
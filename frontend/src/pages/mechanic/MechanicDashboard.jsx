@@ -40,6 +40,7 @@ export default function MechanicDashboard() {
   const { user, loading: authLoading } = useAuth();
 
   const [myJobs, setMyJobs] = useState([]);
+  const [statusCounts, setStatusCounts] = useState({});
   const [mechanicEarnings, setMechanicEarnings] = useState(0); // New state for earnings
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -62,15 +63,31 @@ export default function MechanicDashboard() {
         return;
       }
       try {
-        const response = await axios.get(`http://127.0.0.1:8000/api/my-jobs/?mechanic_id=${user.id}`);
-        
-        const transformedData = response.data.jobs.map(job => ({
+        // Only the open jobs (the mechanic's current work) are followed page
+        // by page; completed ones are the latest page, and the counters come
+        // from the server, so a refresh never walks the whole history.
+        const url = "http://127.0.0.1:8000/api/my-jobs/";
+        const [response, done] = await Promise.all([
+          axios.get(url, { params: { mechanic_id: user.id, status: "open", counts: 1 } }),
+          axios.get(url, { params: { mechanic_id: user.id, status: "done" } }),
+        ]);
+        const jobs = [...response.data.jobs];
+        let nextPageUrl = response.data.next;
+        while (nextPageUrl) {
+          const page = await axios.get(nextPageUrl);
+          jobs.push(...page.data.jobs);
+          nextPageUrl = page.data.next;
+        }
+        jobs.push(...done.data.jobs);
+
+        const transformedData = jobs.map(job => ({
           ...job,
           id: job.id.toString(), status: statusMap[job.status] || job.status,
           customerName: job.customer?.name || 'N/A', vehicleNumber: job.vehicle?.registration_no || 'N/A',
           vehicleBrand: job.vehicle?.make || 'N/A', vehicleModel: job.vehicle?.model || 'N/A',
         }));
         setMyJobs(transformedData);
+        setStatusCounts(response.data.counts);
         setMechanicEarnings(response.data.earnings);
         
         const firstActiveJob = transformedData.find(job => job.status !== "Completed");
@@ -121,10 +138,20 @@ export default function MechanicDashboard() {
         return;
     }
     const originalJobs = [...myJobs];
+    const originalCounts = statusCounts;
+    const movedJob = myJobs.find(job => job.id === jobId);
+    const oldStatusKey = movedJob && Object.keys(statusMap).find(key => statusMap[key] === movedJob.status);
     const updatedJobs = myJobs.map(job => 
         job.id === jobId ? { ...job, status: newStatus } : job
     );
     setMyJobs(updatedJobs);
+    if (oldStatusKey && oldStatusKey !== backendStatusKey) {
+        setStatusCounts(counts => ({
+            ...counts,
+            [oldStatusKey]: (counts[oldStatusKey] ?? 0) - 1,
+            [backendStatusKey]: (counts[backendStatusKey] ?? 0) + 1,
+        }));
+    }
     try {
         await axios.patch(`http://127.0.0.1:8000/api/jobcards/${jobId}/update-status/`, {
             status: backendStatusKey,
@@ -132,15 +159,16 @@ export default function MechanicDashboard() {
         toast.success(`Job #${jobId} moved to "${newStatus}"`);
     } catch (err) {
         setMyJobs(originalJobs);
+        setStatusCounts(originalCounts);
         toast.error("Failed to update job status.");
         console.error(err);
     }
   };
 
-  const activeJobs = myJobs.filter((job) => job.status !== "Completed").length;
-  const completedJobs = myJobs.filter((job) => job.status === "Completed").length;
-  const inProgressJobs = myJobs.filter((job) => job.status === "Under Service").length;
-  const queuedJobs = myJobs.filter((job) => job.status === "In Queue").length;
+  const completedJobs = statusCounts.done ?? 0;
+  const activeJobs = (statusCounts.all ?? 0) - completedJobs;
+  const inProgressJobs = statusCounts.service ?? 0;
+  const queuedJobs = statusCounts.queue ?? 0;
   
   const activeJobsForDropdown = myJobs.filter(job => job.status !== "Completed");
 